@@ -0,0 +1,9 @@
+"""Benchmarks for OneTracker-API."""
+import os
+
+
+def load_fixture(filename):
+    """Load a test fixture."""
+    path = os.path.join(os.path.dirname(__file__), os.pardir, "tests", "fixtures", filename)
+    with open(path) as fptr:
+        return fptr.read()
@@ -0,0 +1,4 @@
+"""Run the model decoding benchmark suite: python -m benchmarks [options]."""
+from .decode import main
+
+main()
@@ -0,0 +1,173 @@
+"""
+Model decoding hot paths.
+
+Times Parcel.from_dict, TrackingEvent.from_dict and ListParcelsResponse.from_dict on synthetic payloads from 10 to 100k parcels with varying event counts. Reports operations per second, the memory blocks and bytes still allocated by the result, and the peak memory of one run. JSON decoding is excluded, payloads are decoded beforehand.
+
+Cases over --max-events tracking events in total, by default only 100k parcels with 20 events each, are skipped and listed at the end of the run and in the JSON results. Pass --max-events 0 to run them, with about 3 GB of memory.
+
+Run with: python -m benchmarks.decode [--sizes 10,100] [--events 0,5] [--max-events 500000] [--output results.json] [--compare baseline.json]
+"""
+import argparse
+import datetime
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+from onetracker_api.__version__ import __version__
+from onetracker_api.models import ListParcelsResponse, Parcel, TrackingEvent, _parse_timestamp
+
+from .fixtures import make_list_parcels_payload
+
+SIZES = (10, 100, 1000, 10000, 100000)
+EVENT_COUNTS = (0, 5, 20)
+# 100k parcels with 5 events each peak at about 1 GB while measured, with 20 events at about 3 GB.
+MAX_EVENTS = 500000
+
+def decode_parcels(payload):
+    """Decode every parcel."""
+    return [Parcel.from_dict(parcel) for parcel in payload["parcels"]]
+
+def decode_events(payload):
+    """Decode every tracking event."""
+    return [TrackingEvent.from_dict(event) for parcel in payload["parcels"] for event in parcel["tracking_events"]]
+
+def decode_list_parcels(payload):
+    """Decode the response, leaving the tracking events undecoded."""
+    return ListParcelsResponse.from_dict(payload)
+
+def decode_list_parcels_with_events(payload):
+    """Decode the response and read every tracking event."""
+    response = ListParcelsResponse.from_dict(payload)
+    for parcel in response.parcels:
+        parcel.tracking_events
+    return response
+
+BENCHMARKS = (
+    ("Parcel.from_dict", decode_parcels, "parcels"),
+    ("TrackingEvent.from_dict", decode_events, "events"),
+    ("ListParcelsResponse.from_dict", decode_list_parcels, "parcels"),
+    ("ListParcelsResponse.from_dict+events", decode_list_parcels_with_events, "parcels"),
+)
+
+def best_seconds(decode, payload, repeat):
+    """Return the fastest of repeat runs, each starting with a cold timestamp cache. The garbage collector is paused, as timeit does."""
+    best = float("inf")
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            _parse_timestamp.cache_clear()
+            start = time.perf_counter()
+            decode(payload)
+            best = min(best, time.perf_counter() - start)
+    finally:
+        gc.enable()
+    return best
+
+def memory(decode, payload):
+    """Return the blocks and bytes held by the result of one run, and the peak bytes of the run."""
+    _parse_timestamp.cache_clear()
+    gc.collect()
+    tracemalloc.start()
+    result = decode(payload)
+    snapshot = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    statistics = snapshot.statistics("filename")
+    del result
+    return sum(stat.count for stat in statistics), sum(stat.size for stat in statistics), peak
+
+def run(sizes=SIZES, event_counts=EVENT_COUNTS, repeat=5, max_events=MAX_EVENTS, log=sys.stderr, skipped=None):
+    """Run every benchmark, returning the results as a list of dictionaries. Cases over max_events tracking events, unless it is 0, are appended to skipped instead."""
+    results = []
+    for event_count in event_counts:
+        for size in sizes:
+            if max_events and size * event_count > max_events:
+                print(f"skipping {size} parcels with {event_count} events, over --max-events {max_events}", file=log)
+                if skipped is not None:
+                    skipped.append({"parcels": size, "events_per_parcel": event_count, "reason": f"over --max-events {max_events}"})
+                continue
+            payload = make_list_parcels_payload(size, event_count)
+            # Repeat small cases more to reduce noise, and large ones less to bound the total work of a case.
+            work = size * (event_count + 1)
+            case_repeat = max(1, min(max(repeat, 100000 // work), 1000000 // work))
+            for name, decode, unit in BENCHMARKS:
+                items = size * event_count if unit == "events" else size
+                if items == 0:
+                    continue
+                seconds = best_seconds(decode, payload, case_repeat)
+                blocks, allocated, peak = memory(decode, payload)
+                results.append({
+                    "benchmark": name,
+                    "parcels": size,
+                    "events_per_parcel": event_count,
+                    "unit": unit,
+                    "items": items,
+                    "seconds": seconds,
+                    "ops_per_sec": items / seconds,
+                    "allocated_blocks": blocks,
+                    "allocated_bytes": allocated,
+                    "peak_bytes": peak,
+                })
+                print(f"{name:<38}{size:>8} parcels {event_count:>3} events {items / seconds:>14,.0f} {unit}/s", file=log)
+    return results
+
+def metadata():
+    """Describe the package version and interpreter the results were measured with."""
+    return {
+        "package_version": __version__,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "date": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+    }
+
+def compare(results, baseline):
+    """Print the throughput and memory of results relative to baseline results."""
+    previous = {(entry["benchmark"], entry["parcels"], entry["events_per_parcel"]): entry for entry in baseline["results"]}
+    print(f"{'benchmark':<38}{'parcels':>8}{'events':>7}{'ops/s':>9}{'peak':>9}")
+    for entry in results:
+        before = previous.get((entry["benchmark"], entry["parcels"], entry["events_per_parcel"]))
+        if before is None:
+            continue
+        speed = entry["ops_per_sec"] / before["ops_per_sec"]
+        peak = entry["peak_bytes"] / before["peak_bytes"] if before["peak_bytes"] else float("nan")
+        print(f"{entry['benchmark']:<38}{entry['parcels']:>8}{entry['events_per_parcel']:>7}{speed:>9.2f}x{peak:>8.2f}x")
+
+def integers(value):
+    """Parse a comma-separated list of integers."""
+    return tuple(int(item) for item in value.split(",") if item)
+
+def main(argv=None):
+    """Run the suite from the command line."""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.decode", description="Benchmark model decoding.")
+    parser.add_argument("--sizes", type=integers, default=SIZES, help="comma-separated parcel counts")
+    parser.add_argument("--events", type=integers, default=EVENT_COUNTS, help="comma-separated tracking event counts per parcel")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per case, the fastest is kept")
+    parser.add_argument("--max-events", type=int, default=MAX_EVENTS, help="skip cases with more tracking events in total, 0 to run every case")
+    parser.add_argument("--output", help="write the results as JSON to this file, - for stdout")
+    parser.add_argument("--compare", help="compare with the JSON results in this file")
+    args = parser.parse_args(argv)
+
+    skipped = []
+    results = run(args.sizes, args.events, args.repeat, args.max_events, skipped=skipped)
+    if skipped:
+        cases = ", ".join(f"{case['parcels']} parcels with {case['events_per_parcel']} events" for case in skipped)
+        print(f"skipped {len(skipped)} case(s) over --max-events {args.max_events} tracking events: {cases}. Pass --max-events 0 to run them.", file=sys.stderr)
+    document = {"metadata": metadata(), "results": results, "skipped": skipped}
+    if args.output == "-":
+        json.dump(document, sys.stdout, indent=2)
+        print()
+    elif args.output:
+        with open(args.output, "w") as fptr:
+            json.dump(document, fptr, indent=2)
+    if args.compare:
+        with open(args.compare) as fptr:
+            compare(results, json.load(fptr))
+    return document
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Generated decoders against hand-written ones.
+
+Compares the from_dict decoders generated from the model annotations with the hand-written keyword-argument decoders they replaced, kept here as the reference.
+
+Run with: python -m benchmarks.decoders [parcel_count] [event_count]
+"""
+import sys
+
+from onetracker_api.models import Parcel, TrackingEvent, _parse_timestamp
+
+from .decode import best_seconds
+from .fixtures import make_list_parcels_payload
+
+def hand_written_tracking_event(data):
+    """Decode a tracking event like TrackingEvent.from_dict did before decoders were generated."""
+    return TrackingEvent(
+        id=data.get("id"),
+        parcel_id=data.get("parcel_id"),
+        carrier_id=data.get("carrier_id"),
+        carrier_name=data.get("carrier_name"),
+        status=data.get("status"),
+        text=data.get("text"),
+        location=data.get("location"),
+        latitude=data.get("latitude"),
+        longitude=data.get("longitude"),
+        time=_parse_timestamp(data.get("time")),
+        time_added=_parse_timestamp(data.get("time_added"))
+    )
+
+def hand_written_parcel(data):
+    """Decode a parcel like Parcel.from_dict did before decoders were generated."""
+    parcel = Parcel(
+        id=data.get("id"),
+        user_id=data.get("user_id"),
+        email_id=data.get("email_id"),
+        email_sender=data.get("email_sender"),
+        retailer_name=data.get("retailer_name"),
+        description=data.get("description"),
+        notification_level=data.get("notification_level"),
+        is_archived=data.get("is_archived"),
+        carrier=data.get("carrier"),
+        carrier_name=data.get("carrier_name"),
+        carrier_redirection_available=data.get("carrier_redirection_available"),
+        tracker_cached=data.get("tracker_cached"),
+        tracking_id=data.get("tracking_id"),
+        tracking_url=data.get("tracking_url"),
+        tracking_status=data.get("tracking_status"),
+        tracking_status_description=data.get("tracking_status_description"),
+        tracking_status_text=data.get("tracking_status_text"),
+        tracking_extra_info=data.get("tracking_extra_info"),
+        tracking_location=data.get("tracking_location"),
+        tracking_time_estimated=_parse_timestamp(data.get("tracking_time_estimated")),
+        tracking_time_delivered=_parse_timestamp(data.get("tracking_time_delivered")),
+        tracking_lock=data.get("tracking_lock"),
+        tracking_events=None,
+        time_added=_parse_timestamp(data.get("time_added")),
+        time_updated=_parse_timestamp(data.get("time_updated"))
+    )
+    object.__setattr__(parcel, "_raw_tracking_events", data.get("tracking_events"))
+    return parcel
+
+def hand_written_parcel_with_events(data):
+    """Decode a parcel and read its tracking events, all with the hand-written decoders."""
+    parcel = hand_written_parcel(data)
+    # Goes through the tracking_events property, like the first read of the events does.
+    object.__setattr__(parcel, "tracking_events", [hand_written_tracking_event(event) for event in data.get("tracking_events") or []])
+    return parcel
+
+def cases(payload):
+    """Return the name, item count and hand-written and generated decode functions of each case."""
+    parcels = payload["parcels"]
+    events = [event for parcel in parcels for event in parcel["tracking_events"]]
+    return (
+        ("TrackingEvent", len(events),
+            lambda: [hand_written_tracking_event(event) for event in events],
+            lambda: [TrackingEvent.from_dict(event) for event in events]),
+        ("Parcel", len(parcels),
+            lambda: [hand_written_parcel(parcel) for parcel in parcels],
+            lambda: [Parcel.from_dict(parcel) for parcel in parcels]),
+        ("Parcel + events", len(parcels),
+            lambda: [hand_written_parcel_with_events(parcel) for parcel in parcels],
+            lambda: [Parcel.from_dict(parcel).tracking_events for parcel in parcels]),
+    )
+
+def main(parcel_count=10000, event_count=5, repeat=5):
+    """Print the throughput of the hand-written and generated decoders."""
+    payload = make_list_parcels_payload(parcel_count, event_count)
+    print(f"{'model':<18}{'hand-written/s':>16}{'generated/s':>14}{'speedup':>9}")
+    for name, items, hand_written, generated in cases(payload):
+        if items == 0:
+            continue
+        before = best_seconds(lambda _: hand_written(), None, repeat)
+        after = best_seconds(lambda _: generated(), None, repeat)
+        print(f"{name:<18}{items / before:>16,.0f}{items / after:>14,.0f}{before / after:>8.2f}x")
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,33 @@
+"""Synthetic OneTracker API payloads for benchmarks."""
+import copy
+import datetime
+import json
+
+from . import load_fixture
+
+def make_parcel(id, event_count, base=None):
+    """Build one parcel payload with event_count tracking events, based on the get_parcel.json fixture."""
+    if base is None:
+        base = json.loads(load_fixture("get_parcel.json"))["parcel"]
+    parcel = copy.deepcopy(base)
+    template = parcel["tracking_events"][0]
+    start = datetime.datetime(2020, 1, 1)
+
+    parcel["id"] = id
+    parcel["tracking_id"] = f"{id:012d}"
+    parcel["tracking_events"] = []
+    for index in range(event_count):
+        event = dict(template)
+        event["id"] = id * 1000 + index
+        event["parcel_id"] = id
+        event["time"] = (start + datetime.timedelta(hours=id + index)).strftime("%Y-%m-%dT%H:%M:%SZ")
+        parcel["tracking_events"].append(event)
+    return parcel
+
+def make_list_parcels_payload(parcel_count, event_count=5):
+    """Build a list parcels response payload."""
+    base = json.loads(load_fixture("get_parcel.json"))["parcel"]
+    return {
+        "message": "ok",
+        "parcels": [make_parcel(id, event_count, base) for id in range(1, parcel_count + 1)],
+    }
@@ -0,0 +1,162 @@
+"""
+End-to-end load test of OneTracker against the local stand-in of the API.
+
+Starts benchmarks.server in process, or targets a running one with --port, then sends requests from many concurrent workers through one OneTracker instance. Reports the throughput, the p50/p99 latencies of each call and the errors, by exception type.
+
+Run with: python -m benchmarks.load [--requests 10000] [--concurrency 100] [--mix get:8,list:1,carriers:1] [--retries 3] [--latency 0.05] [--error-rate 0.01] [--throttle-rate 0.01] [--record traffic.jsonl.gz]
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+
+from onetracker_api import Cassette, OneTracker, RetryPolicy, TTLCache
+
+from .server import add_arguments, from_arguments
+
+OPERATIONS = ("get", "list", "carriers", "delete")
+
+def percentile(ordered, fraction):
+    """Return the nearest-rank percentile of sorted values, None if there are none."""
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+def parse_mix(value):
+    """Parse comma-separated operation:weight pairs."""
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition(":")
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"unknown operation {name!r}, expected one of {', '.join(OPERATIONS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+async def call(onetracker, operation, parcel_ids, draw):
+    """Make one call of operation."""
+    if operation == "get":
+        await onetracker.get_parcel(draw.choice(parcel_ids))
+    elif operation == "list":
+        await onetracker.list_parcels()
+    elif operation == "carriers":
+        await onetracker.list_carriers(use_cache=False)
+    else:
+        await onetracker.delete_parcel(draw.choice(parcel_ids))
+
+async def drive(onetracker, requests, concurrency, mix, parcel_ids, seed=None):
+    """Send requests calls from concurrency workers, returning the latencies by operation, the errors and the elapsed seconds."""
+    draw = random.Random(seed)
+    operations = draw.choices(list(mix), weights=list(mix.values()), k=requests)
+    latencies = defaultdict(list)
+    errors = Counter()
+    queue = iter(operations)
+
+    async def worker():
+        for operation in queue:
+            start = time.perf_counter()
+            try:
+                await call(onetracker, operation, parcel_ids, draw)
+            except Exception as exception:
+                errors[(operation, type(exception).__name__)] += 1
+            else:
+                latencies[operation].append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - start
+
+def report(latencies, errors, elapsed, requests, attempts=1):
+    """Summarize a run as a dictionary."""
+    operations = {}
+    for operation in sorted(set(latencies) | {operation for operation, _ in errors}):
+        ordered = sorted(latencies[operation])
+        operations[operation] = {
+            "ok": len(ordered),
+            "errors": sum(count for (name, _), count in errors.items() if name == operation),
+            "p50_ms": None if not ordered else percentile(ordered, 0.5) * 1000,
+            "p99_ms": None if not ordered else percentile(ordered, 0.99) * 1000,
+            "max_ms": None if not ordered else ordered[-1] * 1000,
+        }
+    return {
+        "requests": requests,
+        "attempts": attempts,
+        "seconds": elapsed,
+        "throughput": requests / elapsed,
+        "operations": operations,
+        "errors": {f"{operation} {name}": count for (operation, name), count in sorted(errors.items())},
+    }
+
+def print_report(result, statuses, file=sys.stdout):
+    """Print a report built by report()."""
+    retries = "retries off" if result["attempts"] <= 1 else f"up to {result['attempts']} attempts per call"
+    print(f"{result['requests']} calls in {result['seconds']:.2f} s, {result['throughput']:,.0f} calls/s, {retries}", file=file)
+    print(f"{'call':<10}{'ok':>8}{'errors':>8}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}", file=file)
+    for operation, entry in result["operations"].items():
+        timings = "".join(f"{'-' if entry[key] is None else format(entry[key], '.1f'):>10}" for key in ("p50_ms", "p99_ms", "max_ms"))
+        print(f"{operation:<10}{entry['ok']:>8}{entry['errors']:>8}{timings}", file=file)
+    for name, count in result["errors"].items():
+        print(f"error {name}: {count}", file=file)
+    if statuses:
+        print("server statuses: " + ", ".join(f"{status}: {count}" for status, count in sorted(statuses.items())), file=file)
+
+async def run(args):
+    """Run the load test described by the command line options."""
+    server = None
+    port = args.port
+    if port is None:
+        server = from_arguments(args)
+        port = await server.start()
+
+    cassette = Cassette(args.record, mode="record") if args.record else None
+    retry_policy = RetryPolicy(max_attempts=args.retries, backoff_factor=0.05, backoff_max=args.retry_after) if args.retries > 1 else None
+    onetracker = OneTracker(
+        limit=args.connections,
+        retry_policy=retry_policy,
+        coalesce_requests=args.coalesce,
+        # Every request reaches the server, as the carrier cache would hide its answers.
+        carrier_cache=TTLCache(maxsize=0),
+        cassette=cassette,
+    )
+    onetracker.scheme = "http"
+    onetracker.host = args.host
+    onetracker.port = port
+    try:
+        await onetracker.login("load@example.com", "password")
+        parcel_ids = list(range(1, args.parcels + 1))
+        latencies, errors, elapsed = await drive(onetracker, args.requests, args.concurrency, args.mix, parcel_ids, args.seed)
+    finally:
+        await onetracker.close_session()
+        if cassette is not None:
+            cassette.close()
+        if server is not None:
+            await server.close()
+
+    result = report(latencies, errors, elapsed, args.requests, args.retries)
+    print_report(result, server.statuses if server is not None else None, file=sys.stderr if args.json else sys.stdout)
+    if args.json:
+        json.dump(result, sys.stdout, indent=2)
+        print()
+    return result
+
+def main(argv=None):
+    """Run the load test from the command line."""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.load", description="Load test OneTracker against a local stand-in of the API.")
+    parser.add_argument("--requests", type=int, default=10000, help="number of calls")
+    parser.add_argument("--concurrency", type=int, default=100, help="number of concurrent workers")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("get:8,list:1,carriers:1"), help="comma-separated call:weight pairs, calls being get, list, carriers and delete")
+    parser.add_argument("--connections", type=int, default=100, help="connection pool size of the client")
+    parser.add_argument("--retries", type=int, default=3, help="attempts per call, 1 to never retry")
+    parser.add_argument("--no-coalesce", dest="coalesce", action="store_false", help="send identical concurrent GET requests separately")
+    parser.add_argument("--host", default="127.0.0.1", help="host of the server")
+    parser.add_argument("--port", type=int, help="port of an already running benchmarks.server, whose --parcels must match")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    parser.add_argument("--record", help="record the traffic to this cassette file, for python -m benchmarks.replay")
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    return asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Memory per model object.
+
+Compares the slotted Parcel and TrackingEvent models with equivalent frozen dataclasses keeping a per-instance __dict__.
+
+Run with: python -m benchmarks.memory [count]
+"""
+import dataclasses
+import json
+import sys
+import tracemalloc
+
+from onetracker_api.models import Parcel, TrackingEvent
+
+from . import load_fixture
+
+def dict_backed(cls):
+    """Build a frozen dataclass with the same fields as cls, without slots."""
+    return dataclasses.make_dataclass(
+        f"DictBacked{cls.__name__}",
+        [(field.name, field.type) for field in dataclasses.fields(cls)],
+        frozen=True,
+    )
+
+def bytes_per_object(cls, values, count):
+    """Measure the memory allocated per instance, attribute values excluded as they are shared."""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    objects = [cls(**values) for _ in range(count)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    # The list holding the objects is not part of the objects.
+    allocated -= sys.getsizeof(objects)
+    return allocated / count
+
+def main(count=100000):
+    """Print the memory per object of each model."""
+    parcel = Parcel.from_dict(json.loads(load_fixture("get_parcel.json"))["parcel"])
+    values = {
+        Parcel: {field.name: getattr(parcel, field.name) for field in dataclasses.fields(Parcel)},
+        TrackingEvent: {field.name: getattr(parcel.tracking_events[0], field.name) for field in dataclasses.fields(TrackingEvent)},
+    }
+
+    print(f"{'model':<16}{'slotted':>12}{'__dict__':>12}{'saved':>8}")
+    for cls, cls_values in values.items():
+        slotted = bytes_per_object(cls, cls_values, count)
+        unslotted = bytes_per_object(dict_backed(cls), cls_values, count)
+        print(f"{cls.__name__:<16}{slotted:>10.0f} B{unslotted:>10.0f} B{1 - slotted / unslotted:>8.0%}")
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
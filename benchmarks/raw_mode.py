@@ -0,0 +1,53 @@
+"""
+Throughput of raw mode versus the model path.
+
+Decodes a list parcels response body the way OneTracker.list_parcels() does, either building the models (with and without reading the tracking events, as an ETL job re-serializing everything would) or returning the validated payload in raw mode.
+
+Run with: python -m benchmarks.raw_mode [parcel_count] [event_count]
+"""
+import json
+import sys
+import time
+
+from onetracker_api import OneTracker
+from onetracker_api.models import ListParcelsResponse
+
+from .fixtures import make_list_parcels_payload
+
+def model_path(body):
+    """Decode into models, leaving the tracking events undecoded."""
+    return ListParcelsResponse.from_dict(json.loads(body))
+
+def model_path_with_events(body):
+    """Decode into models and read every tracking event."""
+    response = ListParcelsResponse.from_dict(json.loads(body))
+    for parcel in response.parcels:
+        parcel.tracking_events
+    return response
+
+def raw_path(body, onetracker=OneTracker()):
+    """Decode and validate the payload only."""
+    return onetracker.__check_response__(json.loads(body))
+
+def parcels_per_second(decode, body, parcel_count, repeat=5):
+    """Return the best throughput of repeat runs."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        decode(body)
+        best = min(best, time.perf_counter() - start)
+    return parcel_count / best
+
+def main(parcel_count=10000, event_count=5):
+    """Print the throughput of each decoding path."""
+    body = json.dumps(make_list_parcels_payload(parcel_count, event_count))
+    raw = parcels_per_second(raw_path, body, parcel_count)
+
+    print(f"{parcel_count} parcels with {event_count} events each, {len(body) / 1e6:.1f} MB")
+    print(f"{'path':<24}{'parcels/s':>12}{'vs raw':>9}")
+    for name, decode in [("raw", raw_path), ("model", model_path), ("model + events", model_path_with_events)]:
+        throughput = raw if decode is raw_path else parcels_per_second(decode, body, parcel_count)
+        print(f"{name:<24}{throughput:>12,.0f}{throughput / raw:>8.0%}")
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
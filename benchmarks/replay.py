@@ -0,0 +1,104 @@
+"""
+Offline throughput of the whole client, replaying recorded traffic.
+
+Every recorded request is made again through the matching OneTracker method, so responses go through the retry, coalescing, JSON decoding and model building layers exactly as they did online, without any connection. Record a cassette with python -m benchmarks.load --record traffic.jsonl.gz, or by giving any client Cassette(path, mode="record").
+
+Login responses are not replayed: the client is given a session that never expires, as recorded sessions may have expired since.
+
+Run with: python -m benchmarks.replay CASSETTE [--speed 1] [--rounds 5] [--concurrency 100]
+"""
+import argparse
+import asyncio
+import datetime
+import time
+from collections import Counter
+
+from yarl import URL
+
+from onetracker_api import Cassette, OneTracker, TTLCache
+from onetracker_api.models import SessionObject
+
+def to_call(interaction):
+    """Return the name of the OneTracker call that sent the recorded request, and a function making it again, None for logins."""
+    url = URL(interaction["url"])
+    method = interaction["method"]
+    if url.path == "/auth/token":
+        return None
+    if url.path == "/parcels":
+        archived = url.query.get("archived") == "true"
+        return "list", lambda onetracker: onetracker.list_parcels(archived=archived)
+    if url.path.startswith("/parcels/"):
+        id = int(url.path.rsplit("/", 1)[1])
+        if method == "DELETE":
+            return "delete", lambda onetracker: onetracker.delete_parcel(id)
+        return "get", lambda onetracker: onetracker.get_parcel(id)
+    if url.path == "/carriers":
+        tracking_id = url.query.get("trackingID")
+        return "carriers", lambda onetracker: onetracker.list_carriers(tracking_id, use_cache=False)
+    raise ValueError(f"unknown request {method} {url}")
+
+async def replay(onetracker, calls, speed, concurrency):
+    """Make the calls, at their recorded offsets divided by speed or as fast as concurrency allows, returning the calls and errors by name and the elapsed seconds."""
+    done = Counter()
+    errors = Counter()
+    semaphore = asyncio.Semaphore(concurrency)
+    start = time.perf_counter()
+
+    async def make(offset, name, call):
+        if speed is not None:
+            await asyncio.sleep(max(0, start + offset / speed - time.perf_counter()))
+        async with semaphore:
+            try:
+                await call(onetracker)
+            except Exception as exception:
+                errors[(name, type(exception).__name__)] += 1
+            else:
+                done[name] += 1
+
+    await asyncio.gather(*(make(offset, name, call) for offset, name, call in calls))
+    return done, errors, time.perf_counter() - start
+
+async def run(args):
+    """Replay the cassette args.rounds times, printing the throughput of each round."""
+    cassette = Cassette(args.cassette, speed=args.speed)
+    calls = []
+    for interaction in cassette.interactions:
+        call = to_call(interaction)
+        if call is not None:
+            calls.append((interaction["offset"], *call))
+
+    onetracker = OneTracker(
+        cassette=cassette,
+        session_object=SessionObject(user_id=0, token="replay", expiration=datetime.datetime.max),
+        coalesce_requests=args.coalesce,
+        # Each recorded response is decoded again rather than served from the carrier cache.
+        carrier_cache=TTLCache(maxsize=0),
+    )
+    best = 0
+    async with onetracker:
+        for number in range(1, args.rounds + 1):
+            cassette.rewind()
+            done, errors, elapsed = await replay(onetracker, calls, args.speed, args.concurrency)
+            throughput = len(calls) / elapsed
+            best = max(best, throughput)
+            print(f"round {number}: {len(calls)} calls in {elapsed:.3f} s, {throughput:,.0f} calls/s, " + ", ".join(f"{name}: {count}" for name, count in sorted(done.items())))
+            for (name, error), count in sorted(errors.items()):
+                print(f"  error {name} {error}: {count}")
+    print(f"best: {best:,.0f} calls/s")
+    return best
+
+def main(argv=None):
+    """Replay a cassette from the command line."""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.replay", description="Measure the client offline by replaying a recorded cassette.")
+    parser.add_argument("cassette", help="path of the cassette")
+    parser.add_argument("--speed", type=float, help="replay the recorded request times and latencies this many times faster, instead of as fast as possible")
+    parser.add_argument("--rounds", type=int, default=5, help="number of times the cassette is replayed")
+    parser.add_argument("--concurrency", type=int, default=100, help="maximum number of calls in flight")
+    parser.add_argument("--no-coalesce", dest="coalesce", action="store_false", help="do not coalesce identical concurrent GET requests")
+    args = parser.parse_args(argv)
+    if args.speed is not None and args.speed <= 0:
+        parser.error("--speed must be positive")
+    return asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Local stand-in for the OneTracker API.
+
+Serves /auth/token, /parcels, /parcels/{id} and /carriers with synthetic payloads, configurable latency, server errors and 429 Too Many Requests answers, so the whole client can be load tested offline.
+
+Run with: python -m benchmarks.server [--port 8080] [--parcels 100] [--events 5] [--latency 0.05] [--error-rate 0.01] [--throttle-rate 0.01]
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import random
+from collections import Counter
+
+from aiohttp import web
+
+from . import load_fixture
+from .fixtures import make_list_parcels_payload
+
+TOKEN = "mock-token"
+
+class MockServer:
+    """
+    aiohttp application answering like the OneTracker API.
+
+    Error and 429 answers are drawn independently for every request, after the latency, and never for /auth/token.
+
+    Args:
+
+    parcel_count: The number of parcels of the account.
+
+    event_count: The number of tracking events per parcel.
+
+    latency: The number of seconds every request waits before being answered.
+
+    jitter: The maximum number of seconds randomly added to latency.
+
+    error_rate: The fraction of requests answered with 500 Internal Server Error.
+
+    throttle_rate: The fraction of requests answered with 429 Too Many Requests.
+
+    retry_after: The Retry-After header of 429 answers, in seconds.
+
+    seed: The seed of the random draws, for reproducible runs.
+    """
+
+    def __init__(
+        self,
+        parcel_count=100,
+        event_count=5,
+        latency=0.0,
+        jitter=0.0,
+        error_rate=0.0,
+        throttle_rate=0.0,
+        retry_after=1,
+        seed=None,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.statuses = Counter()
+        self._runner = None
+
+        payload = make_list_parcels_payload(parcel_count, event_count)
+        self.parcels = {parcel["id"]: parcel for parcel in payload["parcels"]}
+        # Bodies are encoded once, so the server costs as little as possible next to the client.
+        self._list_body = self.__encode__({
+            "message": "ok",
+            "parcels": [dict(parcel, tracking_events=None) for parcel in payload["parcels"]],
+        })
+        self._parcel_bodies = {}
+        self._carriers_body = load_fixture("carriers.json").encode()
+
+    def __encode__(self, payload):
+        return json.dumps(payload).encode()
+
+    def __answer__(self, status, payload=None, body=None, headers=None):
+        self.statuses[status] += 1
+        if body is None:
+            body = self.__encode__(payload)
+        return web.Response(status=status, body=body, headers=headers, content_type="application/json")
+
+    async def __simulate__(self, request):
+        """Wait for the latency, then return an error answer to send instead of the real one, or None."""
+        delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            await asyncio.sleep(delay)
+        if request.path != "/auth/token":
+            if request.headers.get("x-api-token") != TOKEN:
+                return self.__answer__(401, {"message": "Invalid API token"})
+            draw = self.random.random()
+            if draw < self.throttle_rate:
+                return self.__answer__(429, {"message": "Too many requests"}, headers={"Retry-After": str(self.retry_after)})
+            if draw < self.throttle_rate + self.error_rate:
+                return self.__answer__(500, {"message": "Internal server error"})
+        return None
+
+    async def login(self, request):
+        error = await self.__simulate__(request)
+        if error is not None:
+            return error
+        expiration = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(days=1)
+        return self.__answer__(200, {
+            "message": "ok",
+            "session": {"user_id": 1, "token": TOKEN, "expiration": expiration.strftime("%Y-%m-%dT%H:%M:%S.%fZ")},
+        })
+
+    async def list_parcels(self, request):
+        error = await self.__simulate__(request)
+        if error is not None:
+            return error
+        return self.__answer__(200, body=self._list_body)
+
+    async def get_parcel(self, request):
+        error = await self.__simulate__(request)
+        if error is not None:
+            return error
+        id = int(request.match_info["id"])
+        if id not in self.parcels:
+            return self.__answer__(404, {"message": "Parcel not found"})
+        if id not in self._parcel_bodies:
+            self._parcel_bodies[id] = self.__encode__({"message": "ok", "parcel": self.parcels[id]})
+        return self.__answer__(200, body=self._parcel_bodies[id])
+
+    async def delete_parcel(self, request):
+        error = await self.__simulate__(request)
+        if error is not None:
+            return error
+        # Parcels are never really deleted, so a run can be repeated.
+        return self.__answer__(200, {"message": "ok"})
+
+    async def list_carriers(self, request):
+        error = await self.__simulate__(request)
+        if error is not None:
+            return error
+        return self.__answer__(200, body=self._carriers_body)
+
+    def make_app(self):
+        """Build the aiohttp application."""
+        app = web.Application()
+        app.router.add_post("/auth/token", self.login)
+        app.router.add_get("/parcels", self.list_parcels)
+        app.router.add_get("/parcels/{id:\\d+}", self.get_parcel)
+        app.router.add_delete("/parcels/{id:\\d+}", self.delete_parcel)
+        app.router.add_get("/carriers", self.list_carriers)
+        return app
+
+    async def start(self, host="127.0.0.1", port=0):
+        """Start serving in the running event loop, returning the port listened on."""
+        self._runner = web.AppRunner(self.make_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        return self._runner.addresses[0][1]
+
+    async def close(self):
+        """Stop serving."""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+def add_arguments(parser):
+    """Add the options of MockServer to parser."""
+    parser.add_argument("--parcels", type=int, default=100, help="number of parcels of the account")
+    parser.add_argument("--events", type=int, default=5, help="tracking events per parcel")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before every answer")
+    parser.add_argument("--jitter", type=float, default=0.0, help="maximum seconds randomly added to the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After of 429 answers, in seconds")
+    parser.add_argument("--seed", type=int, help="seed of the random draws")
+
+def from_arguments(args):
+    """Build a MockServer from the options added by add_arguments()."""
+    return MockServer(
+        parcel_count=args.parcels,
+        event_count=args.events,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+
+def main(argv=None):
+    """Serve until interrupted."""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.server", description="Serve a local stand-in for the OneTracker API.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=8080, help="port to listen on")
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    web.run_app(from_arguments(args).make_app(), host=args.host, port=args.port, access_log=None)
+
+if __name__ == "__main__":
+    main()
@@ -8,7 +8,21 @@ from .exceptions import (
     OneTrackerAuthenticationSessionError,
     OneTrackerAuthenticationSessionExpiredError,
 )
+from .cache import TTLCache
+from .cassette import Cassette
+from .client import create_connector
+from .codec import JSONCodec, get_codec
+from .instrumentation import Histogram, Instrumentation, RequestTiming
+from .metrics import Metrics
+from .rate_limit import RateLimiter
+from .retry import RetryPolicy
+from .scheduler import PollScheduler
+from .session import SessionManager
+from .session_store import FileSessionStore, MemorySessionStore, SessionStore
+from .store import ParcelStore
+from .sync import ParcelSync
 from .onetracker import (
     Client,
     OneTracker,
 )
+from .pool import AccountPool
@@ -0,0 +1,97 @@
+"""In-memory caches for OneTracker responses."""
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+from .exceptions import OneTrackerError
+
+class TTLCache:
+    """
+    Size-bounded cache whose entries expire after a time to live.
+
+    When full, the least recently used entry is evicted.
+
+    Args:
+
+    maxsize: The maximum number of entries. 0 disables caching.
+
+    ttl: The number of seconds an entry stays valid, None to never expire.
+
+    timer: The monotonic clock used to expire entries.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = 3600, timer: Callable[[], float] = time.monotonic) -> None:
+        """Initialize cache."""
+        if type(maxsize) is not int or maxsize < 0:
+            raise OneTrackerError("Unable to create cache, maxsize must be a non-negative int.")
+        if ttl is not None and ttl <= 0:
+            raise OneTrackerError("Unable to create cache, ttl must be positive.")
+
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.timer = timer
+        self._entries = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Get a cached value.
+
+        Args:
+
+        key: The key of the entry.
+
+        default: The value returned when the entry is missing or expired.
+
+        Returns:
+            The cached value, or default.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        expires, value = entry
+        if expires is not None and expires <= self.timer():
+            del self._entries[key]
+            return default
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Cache a value, evicting the least recently used entry if the cache is full.
+
+        Args:
+
+        key: The key of the entry.
+
+        value: The value to cache.
+        """
+        if self.maxsize == 0:
+            return
+        expires = None if self.ttl is None else self.timer() + self.ttl
+        self._entries[key] = (expires, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        """
+        Remove an entry, if cached.
+
+        Args:
+
+        key: The key of the entry.
+        """
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        self._entries.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        """Return True if key is cached and not expired."""
+        sentinel = object()
+        return self.get(key, sentinel) is not sentinel
+
+    def __len__(self) -> int:
+        """Return the number of entries, expired ones included until they are looked up."""
+        return len(self._entries)
@@ -0,0 +1,189 @@
+"""Record and replay of API traffic."""
+import asyncio
+import collections
+import gzip
+import json
+import time
+from typing import AsyncIterator, Optional
+
+import aiohttp
+from multidict import CIMultiDict, CIMultiDictProxy
+from yarl import URL
+
+from .exceptions import OneTrackerError
+
+MODES = ("record", "replay")
+
+class _CassetteContent:
+    """Body of a replayed response, read as a stream."""
+
+    __slots__ = ("_body",)
+
+    def __init__(self, body: bytes) -> None:
+        self._body = body
+
+    async def iter_chunked(self, size: int) -> AsyncIterator[bytes]:
+        """Yield the body in chunks of at most size bytes."""
+        for start in range(0, len(self._body), size):
+            yield self._body[start:start + size]
+
+class CassetteResponse:
+    """Response recorded in a cassette, with the part of the aiohttp.ClientResponse interface used by the client."""
+
+    __slots__ = ("method", "url", "status", "headers", "content", "_body")
+
+    def __init__(self, method: str, url: URL, status: int, headers: CIMultiDict, body: bytes) -> None:
+        self.method = method
+        self.url = url
+        self.status = status
+        self.headers = CIMultiDictProxy(headers)
+        self.content = _CassetteContent(body)
+        self._body = body
+
+    async def read(self) -> bytes:
+        """Return the body."""
+        return self._body
+
+    def release(self) -> None:
+        """Do nothing, the body is held in memory."""
+        pass
+
+class Cassette:
+    """
+    Request and response pairs recorded to, or replayed from, a gzip-compressed JSON lines file.
+
+    A client given a cassette in record mode sends its requests as usual and appends every response to the cassette. In replay mode, it never opens a connection: each request is answered with the next response recorded for the same method, path and query, in recorded order, the host being ignored. Request headers and bodies are never recorded, so no password or token is written, but response bodies are, the session token of login responses included.
+
+    Use it as a context manager, or call close() once done, to write the end of the file.
+
+    Args:
+
+    path: The path of the cassette file.
+
+    mode: "record" to create or overwrite the file, "replay" to read it.
+
+    speed: In replay mode, how many times faster than recorded responses arrive, None to answer without waiting.
+
+    allow_repeats: In replay mode, if True, the last response recorded for a request is replayed again once every recorded one was. If False, OneTrackerError is raised instead.
+
+    timer: The monotonic clock used to time recorded responses.
+    """
+
+    def __init__(self, path: str, mode: str = "replay", speed: Optional[float] = None, allow_repeats: bool = True, timer=time.monotonic) -> None:
+        """Initialize cassette."""
+        if mode not in MODES:
+            raise OneTrackerError(f"Unable to create cassette, mode must be one of {', '.join(MODES)}.")
+        if speed is not None and speed <= 0:
+            raise OneTrackerError("Unable to create cassette, speed must be positive.")
+
+        self.path = path
+        self.mode = mode
+        self.speed = speed
+        self.allow_repeats = allow_repeats
+        self.timer = timer
+        self.interactions = []
+        self._pending = {}
+        self._file = None
+        self._started = None
+
+        if mode == "record":
+            self._file = gzip.open(path, "wt", encoding="utf-8")
+            self._started = timer()
+        else:
+            with gzip.open(path, "rt", encoding="utf-8") as fptr:
+                self.interactions = [json.loads(line) for line in fptr if line.strip()]
+            self.rewind()
+
+    @staticmethod
+    def __key__(method: str, url: URL) -> tuple:
+        return method.upper(), url.path_qs
+
+    async def record(self, method: str, url: URL, response: aiohttp.ClientResponse, started: float) -> CassetteResponse:
+        """
+        Read and record a response, releasing it.
+
+        Args:
+
+        method: The HTTP method of the request.
+
+        url: The URL of the request.
+
+        response: The response.
+
+        started: The time the request was sent at, according to timer.
+
+        Returns:
+            The CassetteResponse replacing response.
+        """
+        elapsed = self.timer() - started
+        try:
+            body = await response.read()
+        finally:
+            response.release()
+
+        method, path = self.__key__(method, url)
+        interaction = {
+            "method": method,
+            "url": path,
+            "offset": started - self._started,
+            "elapsed": elapsed,
+            "status": response.status,
+            "headers": list(response.headers.items()),
+            # Bodies are JSON text. Invalid UTF-8 survives the round trip as escaped surrogates.
+            "body": body.decode("utf-8", "surrogateescape"),
+        }
+        self.interactions.append(interaction)
+        self._file.write(json.dumps(interaction, separators=(",", ":")) + "\n")
+        return CassetteResponse(method, url, response.status, CIMultiDict(response.headers), body)
+
+    async def replay(self, method: str, url: URL) -> CassetteResponse:
+        """
+        Answer a request with its next recorded response, after its recorded delay divided by speed.
+
+        Args:
+
+        method: The HTTP method of the request.
+
+        url: The URL of the request.
+
+        Returns:
+            The CassetteResponse.
+
+        Raises:
+
+        OneTrackerError: If no response is left for the request.
+        """
+        key = self.__key__(method, url)
+        pending = self._pending.get(key)
+        if not pending:
+            raise OneTrackerError(f"Unable to replay request, no recorded response left for {key[0]} {key[1]}.")
+        elapsed, status, headers, body = pending.popleft() if len(pending) > 1 or not self.allow_repeats else pending[0]
+
+        if self.speed is not None:
+            await asyncio.sleep(elapsed / self.speed)
+        return CassetteResponse(key[0], url, status, headers, body)
+
+    def rewind(self) -> None:
+        """Make every recorded response available again, to replay the cassette once more."""
+        self._pending = {}
+        for interaction in self.interactions:
+            # Responses are decoded once, so replaying costs as little as possible.
+            response = (
+                interaction["elapsed"],
+                interaction["status"],
+                CIMultiDict(interaction["headers"]),
+                interaction["body"].encode("utf-8", "surrogateescape"),
+            )
+            self._pending.setdefault((interaction["method"], interaction["url"]), collections.deque()).append(response)
+
+    def close(self) -> None:
+        """Finish writing a recorded cassette."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> "Cassette":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -1,13 +1,19 @@
 """Internal client for connecting to an OneTracker installation."""
 import asyncio
-import json
+import functools
+import ssl
+import weakref
 import aiohttp
 import async_timeout
 from socket import gaierror as SocketGIAError
 from yarl import URL
-from typing import Any, Dict, Optional
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple, Union
 
 from .__version__ import __version__
+from .cache import TTLCache
+from .cassette import Cassette
+from .codec import JSONCodec, get_codec
+from .instrumentation import Instrumentation, RequestTiming
 from .exceptions import (
     OneTrackerClientError,
     OneTrackerConnectionError,
@@ -16,6 +22,55 @@ from .exceptions import (
     OneTrackerAuthenticationError,
 )
 from .models import SessionObject
+from .rate_limit import RateLimiter
+from .retry import RetryPolicy
+
+def create_connector(
+    limit: int = 100,
+    limit_per_host: int = 0,
+    keepalive_timeout: float = 15,
+    ttl_dns_cache: Optional[int] = 10,
+    ssl_context: ssl.SSLContext = None,
+) -> aiohttp.TCPConnector:
+    """
+    Create a pooled connector that can be shared between many clients.
+
+    Must be called from within a running event loop. Clients given a shared connector never close it, so close it yourself once every client is done.
+
+    Args:
+
+    limit: The maximum number of simultaneous connections, 0 for no limit.
+
+    limit_per_host: The maximum number of simultaneous connections to the same host, 0 for no limit.
+
+    keepalive_timeout: The number of seconds an idle connection is kept open for reuse.
+
+    ttl_dns_cache: The number of seconds resolved DNS entries are cached, None to cache forever.
+
+    ssl_context: The SSL context used for every TLS connection. Reusing one context avoids rebuilding it per connection. None to use aiohttp's default, certificate-verifying context.
+
+    Returns:
+        The aiohttp.TCPConnector.
+    """
+    return aiohttp.TCPConnector(
+        limit=limit,
+        limit_per_host=limit_per_host,
+        keepalive_timeout=keepalive_timeout,
+        ttl_dns_cache=ttl_dns_cache,
+        use_dns_cache=True,
+        ssl=ssl_context,
+    )
+
+class _ValidatedResponse:
+    """Decoded body of a GET response, with the validators needed to revalidate it."""
+
+    __slots__ = ("etag", "last_modified", "data", "decoded", "__weakref__")
+
+    def __init__(self, etag: Optional[str], last_modified: Optional[str], data: Any) -> None:
+        self.etag = etag
+        self.last_modified = last_modified
+        self.data = data
+        self.decoded = {}
 
 class Client:
     def __init__(
@@ -24,11 +79,46 @@ class Client:
         session: aiohttp.client.ClientSession = None,
         user_agent: str = None,
         session_object: SessionObject = None,
+        connector: aiohttp.BaseConnector = None,
+        limit: int = 100,
+        limit_per_host: int = 0,
+        keepalive_timeout: float = 15,
+        ttl_dns_cache: Optional[int] = 10,
+        ssl_context: ssl.SSLContext = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        coalesce_requests: bool = True,
+        json_codec: Union[str, JSONCodec, None] = None,
+        validator_cache: Optional[TTLCache] = None,
+        instrumentation: Optional[Instrumentation] = None,
+        cassette: Optional[Cassette] = None,
     ) -> None:
         """Initialize connection to OneTracker."""
         self._session = session
         self._close_session = False
 
+        self._connector = connector
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.ttl_dns_cache = ttl_dns_cache
+        self.ssl_context = ssl_context
+
+        self.retry_policy = retry_policy
+        self.rate_limiter = rate_limiter
+
+        self.coalesce_requests = coalesce_requests
+        self._inflight = {}
+
+        self.codec = json_codec if isinstance(json_codec, JSONCodec) else get_codec(json_codec)
+
+        self.validator_cache = validator_cache
+        self._validated_payloads = weakref.WeakValueDictionary()
+
+        self.instrumentation = instrumentation
+
+        self.cassette = cassette
+
         self.request_timeout = request_timeout
         self.user_agent = user_agent
 
@@ -39,6 +129,7 @@ class Client:
 
         self.scheme = "https"
         self.host = "api.onetracker.app"
+        self.port = None
 
     async def _request(
         self,
@@ -46,6 +137,7 @@ class Client:
         method: str = 'GET',
         data: Optional[Any] = None,
         headers: Optional[Dict[str, str]] = None,
+        retry_policy: Optional[RetryPolicy] = None,
     ) -> Any:
         """
         Handles a request to the API.
@@ -60,12 +152,94 @@ class Client:
 
         headers: The headers to send.
 
+        retry_policy: The RetryPolicy for this request, overriding the client's retry policy.
+
         Returns:
             The response.
         """
+        url, headers = self._build_request(uri, headers)
+        timing = self.instrumentation.start(method, url) if self.instrumentation is not None else None
+
+        policy = retry_policy if retry_policy is not None else self.retry_policy
+        leader = None
+        try:
+            if not self.coalesce_requests or method.upper() != "GET":
+                return await self._send(method, url, data, headers, policy, timing)
+
+            key = (str(url), tuple(sorted(headers.items())))
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                task = asyncio.ensure_future(self._send(method, url, data, headers, policy, timing))
+                self._inflight[key] = (task, timing)
+                task.add_done_callback(lambda done: self._forget_inflight(key, done))
+            else:
+                task, leader = inflight
+                if timing is not None:
+                    timing.coalesced = True
+            return await asyncio.shield(task)
+        except Exception as exception:
+            if timing is not None:
+                timing.error = type(exception).__name__
+            raise
+        finally:
+            if timing is not None:
+                if leader is not None:
+                    # The joined request received the response this one returns.
+                    timing.status = leader.status
+                self.instrumentation.finish(timing)
 
+    async def _request_stream(
+        self,
+        uri: str = '',
+        method: str = 'GET',
+        headers: Optional[Dict[str, str]] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        chunk_size: int = 65536,
+    ) -> AsyncIterator[bytes]:
+        """
+        Handles a request to the API, streaming the response body.
+
+        Only sending the request is retried, never reading the body. Identical requests are not coalesced.
+
+        Args:
+
+        uri: The URI to request.
+
+        method: The HTTP method to use.
+
+        headers: The headers to send.
+
+        retry_policy: The RetryPolicy for this request, overriding the client's retry policy.
+
+        chunk_size: The maximum size of the yielded chunks.
+
+        Yields:
+            The response body, chunk by chunk.
+        """
+        url, headers = self._build_request(uri, headers)
+        timing = self.instrumentation.start(method, url) if self.instrumentation is not None else None
+        policy = retry_policy if retry_policy is not None else self.retry_policy
+        try:
+            response = await self._dispatch_with_retries(method, url, None, headers, policy, timing)
+            try:
+                if (response.status // 100) in [4, 5]:
+                    await self._handle_response(response, timing)
+                async for chunk in response.content.iter_chunked(chunk_size):
+                    yield chunk
+            finally:
+                response.release()
+        except Exception as exception:
+            if timing is not None:
+                timing.error = type(exception).__name__
+            raise
+        finally:
+            if timing is not None:
+                self.instrumentation.finish(timing)
+
+    def _build_request(self, uri: str, headers: Optional[Dict[str, str]]) -> Tuple[URL, Dict[str, str]]:
+        """Build the URL and headers of a request."""
         url = URL.build(
-            scheme=self.scheme, host=self.host
+            scheme=self.scheme, host=self.host, port=self.port
         ).join(URL(uri))
 
         api_headers = {
@@ -77,20 +251,195 @@ class Client:
             headers.update(api_headers)
         else:
             headers = api_headers
+        return url, headers
+
+    def _forget_inflight(self, key: Tuple, task: "asyncio.Future[Any]") -> None:
+        """Remove a finished request from the in-flight requests."""
+        inflight = self._inflight.get(key)
+        if inflight is not None and inflight[0] is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Retrieve the exception so it is not reported as unhandled when every waiter was cancelled.
+            task.exception()
+
+    async def _send(
+        self,
+        method: str,
+        url: URL,
+        data: Optional[Any],
+        headers: Dict[str, str],
+        policy: Optional[RetryPolicy],
+        timing: Optional[RequestTiming] = None,
+    ) -> Any:
+        """
+        Send a request, retrying it according to policy, and decode the response.
+
+        Raises:
+
+        OneTrackerError: If the request failed.
+        """
+        if method.upper() != "GET" or self.validator_cache is None or self.validator_cache.maxsize == 0:
+            response = await self._dispatch_with_retries(method, url, data, headers, policy, timing)
+            return await self._handle_response(response, timing)
+
+        key = (str(url), tuple(sorted(headers.items())))
+        validated = self.validator_cache.get(key)
+        if validated is not None:
+            headers = dict(headers)
+            if validated.etag is not None:
+                headers["If-None-Match"] = validated.etag
+            if validated.last_modified is not None:
+                headers["If-Modified-Since"] = validated.last_modified
+
+        response = await self._dispatch_with_retries(method, url, data, headers, policy, timing)
+        if response.status == 304 and validated is not None:
+            response.release()
+            self.validator_cache.set(key, validated)
+            return validated.data
+
+        data = await self._handle_response(response, timing)
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if response.status == 200 and (etag is not None or last_modified is not None):
+            validated = _ValidatedResponse(etag, last_modified, data)
+            self.validator_cache.set(key, validated)
+            self._validated_payloads[id(data)] = validated
+        else:
+            self.validator_cache.invalidate(key)
+        return data
+
+    def _decode(self, data: Any, decoder: Callable[[Any], Any]) -> Any:
+        """
+        Decode a response payload with decoder.
+
+        Payloads kept for conditional requests are decoded only once per decoder: when the server answers 304 Not Modified, the object decoded from the cached payload is returned again.
+
+        Args:
+
+        data: The payload returned by _request().
+
+        decoder: The function building the result from the payload, such as a model's from_dict.
+
+        Returns:
+            The decoded result.
+        """
+        build = decoder if self.instrumentation is None else functools.partial(self.instrumentation.build, decoder)
+        validated = self._validated_payloads.get(id(data))
+        if validated is None or validated.data is not data:
+            return build(data)
+        if decoder not in validated.decoded:
+            validated.decoded[decoder] = build(data)
+        return validated.decoded[decoder]
+
+    async def _dispatch_with_retries(
+        self,
+        method: str,
+        url: URL,
+        data: Optional[Any],
+        headers: Dict[str, str],
+        policy: Optional[RetryPolicy],
+        timing: Optional[RequestTiming] = None,
+    ) -> aiohttp.ClientResponse:
+        """
+        Send a request, retrying it according to policy, and return the last response.
 
+        Raises:
+
+        OneTrackerConnectionError: If the last attempt timed out or the connection failed.
+        """
+        attempt = 1
+        while True:
+            if self.rate_limiter is not None:
+                if timing is None:
+                    await self.rate_limiter.acquire()
+                else:
+                    started = self.instrumentation.timer()
+                    await self.rate_limiter.acquire()
+                    timing.add("throttle", self.instrumentation.timer() - started)
+            try:
+                response = await self._dispatch(method, url, data, headers, timing)
+            except OneTrackerConnectionError:
+                if policy is None or not policy.is_retryable(method, attempt):
+                    raise
+                delay = policy.get_delay(attempt)
+            else:
+                if timing is not None:
+                    timing.status = response.status
+                if policy is None or not policy.is_retryable(method, attempt, response.status):
+                    break
+                delay = policy.get_delay(attempt, response.status, response.headers.get("Retry-After"))
+                response.release()
+            if timing is not None:
+                timing.add("retry", delay)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+        return response
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Return the client session, creating the internal one on first use."""
         if self._session is None:
-            self._session = aiohttp.ClientSession()
+            if self._connector is None:
+                connector = create_connector(
+                    limit=self.limit,
+                    limit_per_host=self.limit_per_host,
+                    keepalive_timeout=self.keepalive_timeout,
+                    ttl_dns_cache=self.ttl_dns_cache,
+                    ssl_context=self.ssl_context,
+                )
+                self._session = aiohttp.ClientSession(connector=connector, trace_configs=self.__trace_configs__())
+            else:
+                self._session = aiohttp.ClientSession(connector=self._connector, connector_owner=False, trace_configs=self.__trace_configs__())
             self._close_session = True
+        return self._session
+
+    def __trace_configs__(self) -> Optional[list]:
+        """Return the trace configs of the sessions created by the client."""
+        if self.instrumentation is None:
+            return None
+        return [self.instrumentation.trace_config]
+
+    async def _dispatch(
+        self,
+        method: str,
+        url: URL,
+        data: Optional[Any],
+        headers: Dict[str, str],
+        timing: Optional[RequestTiming] = None,
+    ) -> aiohttp.ClientResponse:
+        """
+        Send a single request and wait for the response headers.
+
+        Raises:
+
+        OneTrackerConnectionError: If the request timed out or the connection failed.
 
+        OneTrackerError: If the request is replayed from the cassette and no response is recorded for it.
+        """
+        if self.cassette is not None and self.cassette.mode == "replay":
+            return await self.cassette.replay(method, url)
+
+        if self.scheme != "https":
+            ssl_option = False
+        else:
+            # None, not True: aiohttp 3.8 skips certificate verification for True.
+            ssl_option = self.ssl_context
+
+        session = self._get_session()
         try:
             async with async_timeout.timeout(self.request_timeout):
-                response = await self._session.request(
+                started = None if self.cassette is None else self.cassette.timer()
+                response = await session.request(
                     method,
                     url,
                     data=data,
                     headers=headers,
-                    ssl=(self.scheme == "https"),
+                    ssl=ssl_option,
+                    trace_request_ctx=timing,
                 )
+                if self.cassette is not None:
+                    response = await self.cassette.record(method, url, response, started)
+                return response
         except asyncio.TimeoutError as exception:
             raise OneTrackerConnectionError(
                 "Timeout occurred while connecting to API"
@@ -100,9 +449,27 @@ class Client:
                 "Error occurred while communicating with API"
             ) from exception
 
+    async def _handle_response(self, response: aiohttp.ClientResponse, timing: Optional[RequestTiming] = None) -> Any:
+        """
+        Raise the matching exception for error responses and decode the JSON body.
+
+        Raises:
+
+        OneTrackerError: If the response is an error or its body is not valid JSON.
+        """
+        if timing is None:
+            body = await response.read()
+        else:
+            started = self.instrumentation.timer()
+            body = await response.read()
+            timing.add("read", self.instrumentation.timer() - started)
+
         if (response.status // 100) in [4, 5]:
-            data = await response.json()
-            error_message = data.get("message", "")
+            try:
+                data = self.codec.loads(body) if body.strip() else {}
+            except self.codec.decode_errors:
+                data = {}
+            error_message = data.get("message", "") if isinstance(data, dict) else ""
             if response.status == 401 and error_message == "Invalid API token":
                 raise OneTrackerAuthenticationError(error_message)
             elif response.status >= 400 and response.status <= 499:
@@ -113,18 +480,24 @@ class Client:
         content_type = response.headers.get("Content-Type", "")
 
 
+        if not body.strip():
+            return None
+
+        started = None if timing is None else self.instrumentation.timer()
         try:
-            data = await response.json()
-            return data
-        except json.JSONDecodeError as e:
+            return self.codec.loads(body)
+        except self.codec.decode_errors as e:
             raise OneTrackerError(
                 "Error decoding JSON response",
                 {
                     "content-type": content_type,
-                    "message": e.msg,
+                    "message": getattr(e, "msg", str(e)),
                     "status-code": response.status,
                 },
             )
+        finally:
+            if started is not None:
+                timing.add("decode", self.instrumentation.timer() - started)
 
     async def close_session(self) -> None:
         """Close open client session."""
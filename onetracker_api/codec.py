@@ -0,0 +1,82 @@
+"""Pluggable JSON codecs for request and response bodies."""
+import importlib
+import json
+from typing import Any, Callable, Optional, Tuple, Type
+
+from .exceptions import OneTrackerError
+
+class JSONCodec:
+    """
+    JSON encoder and decoder backend.
+
+    Args:
+
+    name: The name of the backend.
+
+    loads: Function decoding bytes into Python objects.
+
+    dumps: Function encoding Python objects into a string.
+
+    decode_errors: The exceptions loads raises on malformed JSON.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        loads: Callable[[bytes], Any],
+        dumps: Callable[[Any], str],
+        decode_errors: Tuple[Type[Exception], ...] = (ValueError,),
+    ) -> None:
+        """Initialize codec."""
+        self.name = name
+        self.loads = loads
+        self.dumps = dumps
+        self.decode_errors = decode_errors
+
+    def __repr__(self) -> str:
+        return f"JSONCodec(name={self.name!r})"
+
+def _orjson_codec() -> JSONCodec:
+    orjson = importlib.import_module("orjson")
+    return JSONCodec("orjson", orjson.loads, lambda obj: orjson.dumps(obj).decode(), (orjson.JSONDecodeError,))
+
+def _ujson_codec() -> JSONCodec:
+    ujson = importlib.import_module("ujson")
+    return JSONCodec("ujson", ujson.loads, ujson.dumps, (ValueError,))
+
+def _json_codec() -> JSONCodec:
+    return JSONCodec("json", json.loads, json.dumps, (json.JSONDecodeError, UnicodeDecodeError))
+
+CODECS = {
+    "orjson": _orjson_codec,
+    "ujson": _ujson_codec,
+    "json": _json_codec,
+}
+
+def get_codec(name: Optional[str] = None) -> JSONCodec:
+    """
+    Get a JSON codec by name.
+
+    Args:
+
+    name: "orjson", "ujson" or "json". If None, the fastest installed backend is used, falling back to the standard library.
+
+    Returns:
+        The JSONCodec.
+
+    Raises:
+
+    OneTrackerError: If the backend is unknown or not installed.
+    """
+    if name is None:
+        for candidate in CODECS.values():
+            try:
+                return candidate()
+            except ImportError:
+                continue
+    if name not in CODECS:
+        raise OneTrackerError(f"Unable to use JSON codec {name!r}, expected one of {', '.join(CODECS)}.")
+    try:
+        return CODECS[name]()
+    except ImportError as exception:
+        raise OneTrackerError(f"Unable to use JSON codec {name!r}, it is not installed.") from exception
@@ -0,0 +1,293 @@
+"""Per-phase timing of requests to the OneTracker API."""
+import bisect
+import contextvars
+import functools
+import re
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import aiohttp
+from yarl import URL
+
+PHASES = ("throttle", "queue", "dns", "connect", "first_byte", "retry", "read", "decode", "build")
+
+_NUMERIC_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+_pending_timings = contextvars.ContextVar("onetracker_pending_timings", default=None)
+
+def get_endpoint(url: URL) -> str:
+    """
+    Get the endpoint of a request URL, with the query dropped and numeric IDs replaced by "{id}".
+
+    Args:
+
+    url: The request URL.
+
+    Returns:
+        The endpoint, such as "/parcels/{id}".
+    """
+    return _NUMERIC_SEGMENT.sub("/{id}", url.path)
+
+class RequestTiming:
+    """
+    Timings of one request, from sending it to building the returned objects.
+
+    Attributes:
+
+    method: The HTTP method.
+
+    endpoint: The endpoint, such as "/parcels/{id}".
+
+    status: The HTTP status of the last response, None if none was received. Coalesced requests get the status of the request they joined.
+
+    error: The name of the exception class the request failed with, None if it succeeded.
+
+    coalesced: True if the request joined an identical in-flight request, whose phases are not repeated.
+
+    phases: Dictionary of the seconds spent in each phase, see PHASES. Retried requests add up the phases of every attempt. Time spent in TLS handshakes is part of "connect".
+
+    total: The number of seconds the request took, building the returned objects excluded.
+    """
+
+    __slots__ = ("method", "endpoint", "status", "error", "coalesced", "phases", "total", "started")
+
+    def __init__(self, method: str, endpoint: str, started: float) -> None:
+        self.method = method
+        self.endpoint = endpoint
+        self.status = None
+        self.error = None
+        self.coalesced = False
+        self.phases: Dict[str, float] = {}
+        self.total = None
+        self.started = started
+
+    def add(self, phase: str, seconds: float) -> None:
+        """Add seconds spent in phase."""
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def __repr__(self) -> str:
+        return f"RequestTiming(method={self.method!r}, endpoint={self.endpoint!r}, status={self.status!r}, total={self.total!r}, phases={self.phases!r})"
+
+class Histogram:
+    """
+    In-memory cumulative histogram of durations, per key.
+
+    Args:
+
+    buckets: The upper bounds of the buckets, in seconds, sorted ascending. An unbounded bucket is always added.
+    """
+
+    DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS) -> None:
+        """Initialize histogram."""
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Any, List] = {}
+
+    def observe(self, key: Any, seconds: float) -> None:
+        """
+        Record a duration.
+
+        Args:
+
+        key: The series, such as (endpoint, phase).
+
+        seconds: The duration.
+        """
+        series = self._series.get(key)
+        if series is None:
+            # Bucket counts, then the count and the sum of every observation.
+            series = self._series[key] = [[0] * (len(self.buckets) + 1), 0, 0.0]
+        series[0][bisect.bisect_left(self.buckets, seconds)] += 1
+        series[1] += 1
+        series[2] += seconds
+
+    def snapshot(self) -> Dict[Any, Dict[str, Any]]:
+        """
+        Get every series.
+
+        Returns:
+            Dictionary keyed by series, of dictionaries holding the cumulative "buckets" as (upper bound, count) pairs, the last bound being infinity, the "count" and the "sum" of the durations.
+        """
+        snapshot = {}
+        for key, (counts, count, total) in self._series.items():
+            cumulative = 0
+            buckets = []
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                buckets.append((bound, cumulative))
+            snapshot[key] = {"buckets": buckets, "count": count, "sum": total}
+        return snapshot
+
+    def quantile(self, key: Any, q: float) -> Optional[float]:
+        """
+        Estimate a quantile of a series, interpolating within its bucket.
+
+        Args:
+
+        key: The series.
+
+        q: The quantile, between 0 and 1.
+
+        Returns:
+            The estimated duration, the largest finite bound if it falls in the unbounded bucket, or None if the series is empty.
+        """
+        series = self._series.get(key)
+        if series is None or series[1] == 0:
+            return None
+        rank = q * series[1]
+        cumulative = 0
+        lower = 0.0
+        for bound, bucket_count in zip(self.buckets, series[0]):
+            if bucket_count and cumulative + bucket_count >= rank:
+                return lower + (bound - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+            lower = bound
+        return self.buckets[-1] if self.buckets else None
+
+    def clear(self) -> None:
+        """Remove every series."""
+        self._series.clear()
+
+class Instrumentation:
+    """
+    Records per-phase timings of the requests of the clients it is given to.
+
+    Network phases are measured with an aiohttp TraceConfig, installed on the sessions the client creates. Add trace_config to the trace_configs of sessions passed to the client to measure them too. Every finished RequestTiming is recorded in the histogram, keyed by (endpoint, phase), "total" being the whole request, then passed to the hooks.
+
+    Args:
+
+    hooks: Functions called with each finished RequestTiming.
+
+    histogram: The Histogram recording the timings. Defaults to a new one, pass None to disable it.
+
+    timer: The clock timings are measured with.
+    """
+
+    _DEFAULT = object()
+
+    def __init__(
+        self,
+        hooks: Iterable[Callable[[RequestTiming], None]] = (),
+        histogram: Optional[Histogram] = _DEFAULT,
+        timer: Callable[[], float] = time.perf_counter,
+    ) -> None:
+        """Initialize instrumentation."""
+        self.hooks = list(hooks)
+        self.histogram = Histogram() if histogram is Instrumentation._DEFAULT else histogram
+        self.timer = timer
+        self.trace_config = aiohttp.TraceConfig(trace_config_ctx_factory=self.__trace_context__)
+        self.trace_config.on_connection_queued_start.append(self.__mark__("queue_start"))
+        self.trace_config.on_connection_queued_end.append(self.__measure__("queue_start", "queue"))
+        self.trace_config.on_dns_resolvehost_start.append(self.__mark__("dns_start"))
+        self.trace_config.on_dns_resolvehost_end.append(self.__measure__("dns_start", "dns"))
+        self.trace_config.on_connection_create_start.append(self.__mark__("connect_start"))
+        self.trace_config.on_connection_create_end.append(self.__on_connection_create_end__)
+        self.trace_config.on_request_headers_sent.append(self.__mark__("sent"))
+        self.trace_config.on_request_chunk_sent.append(self.__mark__("sent"))
+        self.trace_config.on_request_end.append(self.__on_request_end__)
+
+    def add_hook(self, hook: Callable[[RequestTiming], None]) -> None:
+        """
+        Add a function called with each finished RequestTiming.
+
+        Args:
+
+        hook: The function.
+        """
+        self.hooks.append(hook)
+
+    def start(self, method: str, url: URL) -> RequestTiming:
+        """Start timing a request. For internal use."""
+        return RequestTiming(method.upper(), get_endpoint(url), self.timer())
+
+    def finish(self, timing: RequestTiming) -> None:
+        """
+        Record a finished request, unless an instrumented OneTracker method is still building its result. For internal use.
+        """
+        if timing.total is None:
+            timing.total = self.timer() - timing.started
+        pending = _pending_timings.get()
+        if pending is not None:
+            pending.append(timing)
+        else:
+            self.emit(timing)
+
+    def emit(self, timing: RequestTiming) -> None:
+        """Record a timing in the histogram and pass it to the hooks. For internal use."""
+        if self.histogram is not None:
+            self.histogram.observe((timing.endpoint, "total"), timing.total)
+            for phase, seconds in timing.phases.items():
+                self.histogram.observe((timing.endpoint, phase), seconds)
+        for hook in self.hooks:
+            hook(timing)
+
+    def build(self, decoder: Callable[[Any], Any], data: Any) -> Any:
+        """Call decoder, adding its time to the build phase of the last request. For internal use."""
+        started = self.timer()
+        try:
+            return decoder(data)
+        finally:
+            pending = _pending_timings.get()
+            if pending:
+                pending[-1].add("build", self.timer() - started)
+
+    def __trace_context__(self, trace_request_ctx: Optional[RequestTiming] = None):
+        """Per-request trace state. For internal use."""
+        return _TraceContext(trace_request_ctx)
+
+    def __mark__(self, name: str):
+        """Build a trace callback remembering when it was called. For internal use."""
+        async def callback(session, context, params) -> None:
+            context.marks[name] = self.timer()
+        return callback
+
+    def __measure__(self, start: str, phase: str):
+        """Build a trace callback adding the time since the start mark to phase. For internal use."""
+        async def callback(session, context, params) -> None:
+            started = context.marks.pop(start, None)
+            if started is not None and context.timing is not None:
+                seconds = self.timer() - started
+                context.timing.add(phase, seconds)
+                context.measured[phase] = context.measured.get(phase, 0.0) + seconds
+        return callback
+
+    async def __on_connection_create_end__(self, session, context, params) -> None:
+        """Add the connection time, DNS excluded and TLS included. For internal use."""
+        started = context.marks.pop("connect_start", None)
+        if started is not None and context.timing is not None:
+            context.timing.add("connect", self.timer() - started - context.measured.get("dns", 0.0))
+
+    async def __on_request_end__(self, session, context, params) -> None:
+        """Add the time waited for the response headers. For internal use."""
+        sent = context.marks.pop("sent", None)
+        if sent is not None and context.timing is not None:
+            context.timing.add("first_byte", self.timer() - sent)
+
+class _TraceContext:
+    """State of one traced request."""
+
+    __slots__ = ("timing", "marks", "measured")
+
+    def __init__(self, timing: Optional[RequestTiming]) -> None:
+        self.timing = timing
+        self.marks: Dict[str, float] = {}
+        self.measured: Dict[str, float] = {}
+
+def instrumented(method: Callable) -> Callable:
+    """
+    Decorate a OneTracker method so the timings of its requests are recorded once it returns, including the time spent building its result.
+    """
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        if self.instrumentation is None:
+            return await method(self, *args, **kwargs)
+        pending = []
+        token = _pending_timings.set(pending)
+        try:
+            return await method(self, *args, **kwargs)
+        finally:
+            _pending_timings.reset(token)
+            for timing in pending:
+                self.instrumentation.emit(timing)
+    return wrapper
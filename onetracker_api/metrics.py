@@ -0,0 +1,145 @@
+"""Prometheus-style metrics of requests to the OneTracker API."""
+from typing import Dict, Iterable, List, Tuple
+
+from .instrumentation import Histogram, Instrumentation, RequestTiming
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def _escape(value: str) -> str:
+    """Escape a label value."""
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _labels(**labels) -> str:
+    """Format labels, in the given order."""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+def _number(value: float) -> str:
+    """Format a sample value or bucket bound."""
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+def _histogram_lines(lines: List[str], name: str, labels: Dict[str, str], series: Dict) -> None:
+    """Append the samples of a histogram series."""
+    for bound, count in series["buckets"]:
+        lines.append(f"{name}_bucket{_labels(**labels, le=_number(bound))} {count}")
+    lines.append(f"{name}_sum{_labels(**labels)} {_number(series['sum'])}")
+    lines.append(f"{name}_count{_labels(**labels)} {series['count']}")
+
+class Metrics(Instrumentation):
+    """
+    Instrumentation counting requests and errors, and tracking latency, in-flight requests and connection pool saturation, rendered in the Prometheus text format.
+
+    Give it to clients as their instrumentation, then serve render() with the CONTENT_TYPE content type from any HTTP server, or scrape it in tests. Connection pool metrics are only collected for sessions created by the clients, or traced with trace_config.
+
+    Args:
+
+    namespace: The prefix of every metric name.
+
+    buckets: The upper bounds of the latency histogram buckets, in seconds.
+
+    hooks: Functions called with each finished RequestTiming.
+    """
+
+    def __init__(self, namespace: str = "onetracker", buckets: Iterable[float] = Histogram.DEFAULT_BUCKETS, hooks=()) -> None:
+        """Initialize metrics."""
+        super().__init__(hooks=hooks, histogram=Histogram(buckets))
+        self.namespace = namespace
+        self.requests: Dict[Tuple[str, str, str], int] = {}
+        self.errors: Dict[Tuple[str, str], int] = {}
+        self.coalesced: Dict[str, int] = {}
+        self.in_flight: Dict[str, int] = {}
+        self.connections_waiting = 0
+        self.connections: Dict[str, int] = {"true": 0, "false": 0}
+        self.trace_config.on_connection_queued_start.append(self.__on_queued_start__)
+        self.trace_config.on_connection_queued_end.append(self.__on_queued_end__)
+        self.trace_config.on_connection_create_end.append(self.__on_connection__("false"))
+        self.trace_config.on_connection_reuseconn.append(self.__on_connection__("true"))
+
+    def start(self, method: str, url) -> RequestTiming:
+        """Start timing a request, counting it as in flight. For internal use."""
+        timing = super().start(method, url)
+        self.in_flight[timing.endpoint] = self.in_flight.get(timing.endpoint, 0) + 1
+        return timing
+
+    def finish(self, timing: RequestTiming) -> None:
+        """Count a finished request. For internal use."""
+        self.in_flight[timing.endpoint] -= 1
+        if timing.coalesced:
+            # Never sent, the request joined is counted instead.
+            self.coalesced[timing.endpoint] = self.coalesced.get(timing.endpoint, 0) + 1
+        else:
+            status_class = "none" if timing.status is None else f"{timing.status // 100}xx"
+            key = (timing.endpoint, timing.method, status_class)
+            self.requests[key] = self.requests.get(key, 0) + 1
+        if timing.error is not None:
+            key = (timing.endpoint, timing.error)
+            self.errors[key] = self.errors.get(key, 0) + 1
+        super().finish(timing)
+
+    async def __on_queued_start__(self, session, context, params) -> None:
+        """Count a request waiting for a free connection. For internal use."""
+        self.connections_waiting += 1
+
+    async def __on_queued_end__(self, session, context, params) -> None:
+        """Count a request done waiting for a free connection. For internal use."""
+        self.connections_waiting -= 1
+
+    def __on_connection__(self, reused: str):
+        """Build a trace callback counting connections by reuse. For internal use."""
+        async def callback(session, context, params) -> None:
+            self.connections[reused] += 1
+        return callback
+
+    def render(self) -> str:
+        """
+        Render every metric.
+
+        Returns:
+            The metrics, in the Prometheus text exposition format.
+        """
+        lines: List[str] = []
+        prefix = self.namespace
+
+        def header(name: str, kind: str, help: str) -> str:
+            lines.append(f"# HELP {prefix}_{name} {help}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            return f"{prefix}_{name}"
+
+        name = header("requests_total", "counter", "Requests sent to the OneTracker API, by endpoint, method and status class.")
+        for (endpoint, method, status_class), value in sorted(self.requests.items()):
+            lines.append(f"{name}{_labels(endpoint=endpoint, method=method, status_class=status_class)} {value}")
+
+        name = header("request_errors_total", "counter", "Failed requests, by endpoint and exception class.")
+        for (endpoint, error), value in sorted(self.errors.items()):
+            lines.append(f"{name}{_labels(endpoint=endpoint, error=error)} {value}")
+
+        name = header("requests_coalesced_total", "counter", "Requests that joined an identical in-flight request, by endpoint.")
+        for endpoint, value in sorted(self.coalesced.items()):
+            lines.append(f"{name}{_labels(endpoint=endpoint)} {value}")
+
+        name = header("requests_in_flight", "gauge", "Requests in progress, by endpoint.")
+        for endpoint, value in sorted(self.in_flight.items()):
+            lines.append(f"{name}{_labels(endpoint=endpoint)} {value}")
+
+        snapshot = sorted(self.histogram.snapshot().items())
+        name = header("request_duration_seconds", "histogram", "Request latency, by endpoint.")
+        for (endpoint, phase), series in snapshot:
+            if phase == "total":
+                _histogram_lines(lines, name, {"endpoint": endpoint}, series)
+
+        name = header("request_phase_seconds", "histogram", "Time spent in each phase of requests, by endpoint and phase.")
+        for (endpoint, phase), series in snapshot:
+            if phase != "total":
+                _histogram_lines(lines, name, {"endpoint": endpoint, "phase": phase}, series)
+
+        name = header("connections_waiting", "gauge", "Requests waiting for a free connection of the pool.")
+        lines.append(f"{name} {self.connections_waiting}")
+
+        name = header("connections_total", "counter", "Connections used by requests, by whether they were reused from the pool.")
+        for reused, value in sorted(self.connections.items()):
+            lines.append(f"{name}{_labels(reused=reused)} {value}")
+
+        return "\n".join(lines) + "\n"
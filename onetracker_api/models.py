@@ -1,14 +1,145 @@
 """Models for OneTracker."""
 
-from dataclasses import dataclass
-import datetime
-from typing import List
+from dataclasses import dataclass, fields, is_dataclass
+from functools import lru_cache
 import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
 
 from .exceptions import OneTrackerError
 
+@lru_cache(maxsize=4096)
+def _parse_timestamp(value: Optional[str]) -> Optional[datetime.datetime]:
+    """
+    Parse an ISO-8601 timestamp from the OneTracker API.
+
+    Timestamps ending in "Z" are UTC and parsed as naive datetimes, timestamps with an explicit offset as aware datetimes. Fractional seconds of any precision are kept, truncated to microseconds. Results are memoized, as many events share the same timestamps.
+
+    Args:
+
+    value: The timestamp, or None.
+
+    Returns:
+        The datetime, or None if value is None.
+    """
+    if value is None:
+        return None
+    if value[-1:] == "Z":
+        value = value[:-1]
+    if value[19:20] == ".":
+        end = 20
+        while end < len(value) and value[end].isdigit():
+            end += 1
+        if end != 26:
+            # datetime.fromisoformat() only accepts 3 or 6 fractional digits before Python 3.11.
+            value = value[:20] + value[20:end][:6].ljust(6, "0") + value[end:]
+    return datetime.datetime.fromisoformat(value)
+
+class _SlottedModel:
+    """
+    Base class of the slotted models.
+
+    Instances keep their attributes in __slots__ instead of a per-instance __dict__. Frozen dataclasses refuse setattr, so pickling is handled here.
+    """
+
+    __slots__ = ()
+
+    def __getstate__(self):
+        return tuple(getattr(self, field.name) for field in fields(self))
+
+    def __setstate__(self, state):
+        for field, value in zip(fields(self), state):
+            object.__setattr__(self, field.name, value)
+
+def _parse_expiration(value: str) -> datetime.datetime:
+    """Parse the expiration of a session, dropping fractional seconds and the time zone."""
+    return datetime.datetime.fromisoformat(value.split(".")[0])
+
+def _compile_decoder(cls, converters: Optional[Dict[str, Callable[[Any], Any]]] = None, lazy: Iterable[str] = ()) -> Callable[[dict], Any]:
+    """
+    Generate the function building a model from its JSON payload.
+
+    The function is specialized once, from the dataclass fields and their annotations, into straight-line code: each value is read with one dict lookup and stored in its slot, without building keyword arguments or calling __init__. Depending on the annotation, values are:
+    - datetime: parsed with _parse_timestamp(),
+    - bool: converted with bool(), as the API sends some flags as 0 and 1,
+    - a model: decoded with its from_dict,
+    - a list of models: decoded item by item, a missing list giving an empty one,
+    - anything else: kept as is.
+    None is kept for datetime and bool values.
+
+    Args:
+
+    cls: The slotted model class.
+
+    converters: Functions decoding the values of some fields, overriding their annotations.
+
+    lazy: The fields whose raw value is kept in the _raw_<name> slot, for a property to decode it on first access.
+
+    Returns:
+        The decode function.
+    """
+    converters = converters or {}
+    lazy = set(lazy)
+    namespace = {"new": object.__new__, "cls": cls, "parse_timestamp": _parse_timestamp, "bool": bool}
+    lines = ["def decode(data):", "    get = data.get", "    self = new(cls)"]
+
+    def setter(slot: str) -> str:
+        namespace[f"set_{slot}"] = cls.__dict__[slot].__set__
+        return f"set_{slot}"
+
+    for field in fields(cls):
+        name = field.name
+        value = f"get({name!r})"
+        if name in lazy:
+            lines.append(f"    {setter('_' + name)}(self, None)")
+            lines.append(f"    {setter('_raw_' + name)}(self, {value})")
+            continue
+
+        annotation = field.type
+        arguments = getattr(annotation, "__args__", None) or ()
+        # Optional[X] is Union[X, None].
+        if getattr(annotation, "__origin__", None) is Union and len(arguments) == 2 and type(None) in arguments:
+            annotation = arguments[0] if arguments[1] is type(None) else arguments[1]
+            arguments = getattr(annotation, "__args__", None) or ()
+
+        if name in converters:
+            namespace[f"convert_{name}"] = converters[name]
+            value = f"convert_{name}({value})"
+        elif annotation is datetime.datetime:
+            value = f"parse_timestamp({value})"
+        elif annotation is bool:
+            lines.append(f"    value = {value}")
+            value = "value if value is None or value.__class__ is bool else bool(value)"
+        elif is_dataclass(annotation) and hasattr(annotation, "from_dict"):
+            namespace[f"decode_{name}"] = annotation.from_dict
+            value = f"decode_{name}({value})"
+        elif getattr(annotation, "__origin__", None) is list and len(arguments) == 1 and is_dataclass(arguments[0]) and hasattr(arguments[0], "from_dict"):
+            namespace[f"decode_{name}"] = arguments[0].from_dict
+            value = f"[decode_{name}(item) for item in {value} or ()]"
+        lines.append(f"    {setter(name)}(self, {value})")
+    lines.append("    return self")
+
+    exec(compile("\n".join(lines), f"<{cls.__name__} decoder>", "exec"), namespace)
+    decode = namespace["decode"]
+    decode.__name__ = decode.__qualname__ = f"decode_{cls.__name__}"
+    return decode
+
+def _decoded(converters: Optional[Dict[str, Callable[[Any], Any]]] = None, lazy: Iterable[str] = ()):
+    """
+    Class decorator giving a model the decoder generated by _compile_decoder() as _decode, and as from_dict unless the class defines its own, such as one validating the response first.
+
+    Must be applied after @dataclass, and to a model only once the models it contains are decorated.
+    """
+    def decorate(cls):
+        decode = _compile_decoder(cls, converters, lazy)
+        cls._decode = staticmethod(decode)
+        if "from_dict" not in cls.__dict__:
+            cls.from_dict = staticmethod(decode)
+        return cls
+    return decorate
+
+@_decoded(converters={"expiration": _parse_expiration})
 @dataclass(frozen=True)
-class SessionObject:
+class SessionObject(_SlottedModel):
     """
     Object holding session information from the OneTracker API.
 
@@ -21,20 +152,15 @@ class SessionObject:
     expiration: Expiration time and date of the authentication token.
     """
 
+    __slots__ = ("user_id", "token", "expiration")
+
     user_id: int
     token: str
     expiration: datetime.datetime
 
-    @staticmethod
-    def from_dict(data: dict):
-        return SessionObject(
-            user_id=data.get("user_id"),
-            token=data.get("token"),
-            expiration=datetime.datetime.fromisoformat(data.get("expiration").split(".")[0])
-        )
-
+@_decoded()
 @dataclass(frozen=True)
-class AuthenticationTokenResponse:
+class AuthenticationTokenResponse(_SlottedModel):
     """
     Object holding authentication token response from the OneTracker API.
 
@@ -45,23 +171,23 @@ class AuthenticationTokenResponse:
     session: SessionObject.
     """
 
+    __slots__ = ("message", "session")
+
     message: str
     session: SessionObject
 
     @staticmethod
     def from_dict(data: dict):
         if data is not {} and data is not None and data.get("message") == "ok":
-            return AuthenticationTokenResponse(
-                message=data.get("message"),
-                session=SessionObject.from_dict(data.get("session"))
-            )
+            return AuthenticationTokenResponse._decode(data)
         if data.get("message"):
             raise OneTrackerError(data.get("message"))
         else:
             raise OneTrackerError("Unable to convert data to GetParcelResponse.")
 
+@_decoded()
 @dataclass(frozen=True)
-class TrackingEvent:
+class TrackingEvent(_SlottedModel):
     """
     Object holding a tracking event
 
@@ -90,6 +216,20 @@ class TrackingEvent:
     time_added: Time added.
     """
 
+    __slots__ = (
+        "id",
+        "parcel_id",
+        "carrier_id",
+        "carrier_name",
+        "status",
+        "text",
+        "location",
+        "latitude",
+        "longitude",
+        "time",
+        "time_added",
+    )
+
     id: int
     parcel_id: int
     carrier_id: int
@@ -102,25 +242,9 @@ class TrackingEvent:
     time: datetime.datetime
     time_added: datetime.datetime
 
-    @staticmethod
-    def from_dict(data: dict):
-        return TrackingEvent(
-            id=data.get("id"),
-            parcel_id=data.get("parcel_id"),
-            carrier_id=data.get("carrier_id"),
-            carrier_name=data.get("carrier_name"),
-            status=data.get("status"),
-            text=data.get("text"),
-            location=data.get("location"),
-            latitude=data.get("latitude"),
-            longitude=data.get("longitude"),
-            time=datetime.datetime.fromisoformat(data.get("time").split("Z")[0]),
-            time_added=datetime.datetime.fromisoformat(data.get("time_added").split("Z")[0])
-        )
-
-
+@_decoded(lazy=["tracking_events"])
 @dataclass(frozen=True)
-class Parcel:
+class Parcel(_SlottedModel):
     """
     Object holding parcel information from the OneTracker API.
 
@@ -170,13 +294,42 @@ class Parcel:
 
     tracking_lock: Whether the tracking is locked or not.
 
-    tracking_events: List of TrackingEvent objects.
+    tracking_events: List of TrackingEvent objects. When decoded with from_dict, they are only built on first access.
 
     time_added: Time added of the parcel.
 
     time_updated: Time updated of the parcel.
     """
 
+    __slots__ = (
+        "id",
+        "user_id",
+        "email_id",
+        "email_sender",
+        "retailer_name",
+        "description",
+        "notification_level",
+        "is_archived",
+        "carrier",
+        "carrier_name",
+        "carrier_redirection_available",
+        "tracker_cached",
+        "tracking_id",
+        "tracking_url",
+        "tracking_status",
+        "tracking_status_description",
+        "tracking_status_text",
+        "tracking_extra_info",
+        "tracking_location",
+        "tracking_time_estimated",
+        "tracking_time_delivered",
+        "tracking_lock",
+        "time_added",
+        "time_updated",
+        "_tracking_events",
+        "_raw_tracking_events",
+    )
+
     id: int
     user_id: int
     email_id: int
@@ -203,38 +356,25 @@ class Parcel:
     time_added: datetime.datetime
     time_updated: datetime.datetime
 
-    @staticmethod
-    def from_dict(data: dict):
-        return Parcel(
-            id=data.get("id"),
-            user_id=data.get("user_id"),
-            email_id=data.get("email_id"),
-            email_sender=data.get("email_sender"),
-            retailer_name=data.get("retailer_name"),
-            description=data.get("description"),
-            notification_level=data.get("notification_level"),
-            is_archived=data.get("is_archived"),
-            carrier=data.get("carrier"),
-            carrier_name=data.get("carrier_name"),
-            carrier_redirection_available=data.get("carrier_redirection_available"),
-            tracker_cached=data.get("tracker_cached"),
-            tracking_id=data.get("tracking_id"),
-            tracking_url=data.get("tracking_url"),
-            tracking_status=data.get("tracking_status"),
-            tracking_status_description=data.get("tracking_status_description"),
-            tracking_status_text=data.get("tracking_status_text"),
-            tracking_extra_info=data.get("tracking_extra_info"),
-            tracking_location=data.get("tracking_location"),
-            tracking_time_estimated=datetime.datetime.fromisoformat(data.get("tracking_time_estimated").split("Z")[0]),
-            tracking_time_delivered=datetime.datetime.fromisoformat(data.get("tracking_time_delivered").split("Z")[0]),
-            tracking_lock=data.get("tracking_lock"),
-            tracking_events=[TrackingEvent.from_dict(tracking_event) for tracking_event in data.get("tracking_events") or []],
-            time_added=datetime.datetime.fromisoformat(data.get("time_added").split("Z")[0]),
-            time_updated=datetime.datetime.fromisoformat(data.get("time_updated").split("Z")[0])
-        )
+    def _get_tracking_events(self) -> List[TrackingEvent]:
+        tracking_events = self._tracking_events
+        if tracking_events is None:
+            tracking_events = [TrackingEvent.from_dict(tracking_event) for tracking_event in self._raw_tracking_events or []]
+            object.__setattr__(self, "_tracking_events", tracking_events)
+            object.__setattr__(self, "_raw_tracking_events", None)
+        return tracking_events
+
+    def _set_tracking_events(self, tracking_events: List[TrackingEvent]) -> None:
+        object.__setattr__(self, "_tracking_events", tracking_events)
+        object.__setattr__(self, "_raw_tracking_events", None)
 
+# Installed after the dataclass is built, so tracking_events stays a regular field of the generated
+# __init__, __repr__ and __eq__ while the raw events are only decoded when it is first read.
+Parcel.tracking_events = property(Parcel._get_tracking_events, Parcel._set_tracking_events)
+
+@_decoded()
 @dataclass(frozen=True)
-class ListParcelsResponse:
+class ListParcelsResponse(_SlottedModel):
     """
     Object representing the response of List Parcels.
 
@@ -245,23 +385,23 @@ class ListParcelsResponse:
     parcels: List of Parcel objects.
     """
 
+    __slots__ = ("message", "parcels")
+
     message: str
     parcels: List[Parcel]
 
     @staticmethod
     def from_dict(data: dict):
         if data is not {} and data is not None and data.get("message") == "ok":
-            return ListParcelsResponse(
-                message=data.get("message"),
-                parcels=[Parcel.from_dict(parcel) for parcel in data.get("parcels") or []]
-            )
+            return ListParcelsResponse._decode(data)
         if data.get("message"):
             raise OneTrackerError(data.get("message"))
         else:
             raise OneTrackerError("Unable to convert data to GetParcelResponse.")
 
+@_decoded()
 @dataclass(frozen=True)
-class GetParcelResponse:
+class GetParcelResponse(_SlottedModel):
     """
     Object representing the response of List Parcel.
 
@@ -272,23 +412,86 @@ class GetParcelResponse:
     parcel: Parcel object.
     """
 
+    __slots__ = ("message", "parcel")
+
     message: str
     parcel: Parcel
 
     @staticmethod
     def from_dict(data: dict):
         if data is not {} and data is not None and data.get("message") == "ok":
-            return GetParcelResponse(
-                message=data.get("message"),
-                parcel=Parcel.from_dict(data.get("parcel"))
-            )
+            return GetParcelResponse._decode(data)
         if data.get("message"):
             raise OneTrackerError(data.get("message"))
         else:
             raise OneTrackerError("Unable to convert data to GetParcelResponse.")
 
 @dataclass(frozen=True)
-class DeleteParcelResponse:
+class GetParcelsResponse(_SlottedModel):
+    """
+    Object representing the response of Get Parcels.
+
+    Attributes:
+
+    parcels: Dictionary of Parcel objects, keyed by parcel ID.
+
+    errors: Dictionary of OneTrackerError exceptions, keyed by the parcel ID that could not be fetched.
+    """
+
+    __slots__ = ("parcels", "errors")
+
+    parcels: Dict[int, Parcel]
+    errors: Dict[int, OneTrackerError]
+
+@dataclass(frozen=True)
+class ListAccountParcelsResponse(_SlottedModel):
+    """
+    Object representing the response of List Parcels across the accounts of an AccountPool.
+
+    Attributes:
+
+    parcels: Dictionary of lists of Parcel objects, keyed by account name.
+
+    errors: Dictionary of OneTrackerError exceptions, keyed by the name of the account whose parcels could not be listed.
+    """
+
+    __slots__ = ("parcels", "errors")
+
+    parcels: Dict[str, List[Parcel]]
+    errors: Dict[str, OneTrackerError]
+
+@dataclass(frozen=True)
+class SyncDelta(_SlottedModel):
+    """
+    Object representing the changes found by one ParcelSync.sync().
+
+    Attributes:
+
+    added: List of the Parcel objects that appeared since the previous sync.
+
+    changed: List of the Parcel objects whose time_updated changed since the previous sync.
+
+    removed: List of the IDs of the parcels that disappeared since the previous sync.
+
+    events: Dictionary of the TrackingEvent objects not seen before, keyed by parcel ID.
+
+    errors: Dictionary of OneTrackerError exceptions, keyed by the ID of the parcel whose tracking events could not be fetched. These parcels are left out of the delta and reported again by the next sync.
+
+    watermark: The latest time_updated of the account's parcels, None before any parcel was seen.
+    """
+
+    __slots__ = ("added", "changed", "removed", "events", "errors", "watermark")
+
+    added: List[Parcel]
+    changed: List[Parcel]
+    removed: List[int]
+    events: Dict[int, List[TrackingEvent]]
+    errors: Dict[int, OneTrackerError]
+    watermark: Optional[datetime.datetime]
+
+@_decoded()
+@dataclass(frozen=True)
+class DeleteParcelResponse(_SlottedModel):
     """
     Object representing the response of Delete Parcel.
 
@@ -297,21 +500,22 @@ class DeleteParcelResponse:
     message: Response message.
     """
 
+    __slots__ = ("message",)
+
     message: str
 
     @staticmethod
     def from_dict(data: dict):
         if data is not {} and data is not None and data.get("message") == "ok":
-            return DeleteParcelResponse(
-                message=data.get("message")
-            )
+            return DeleteParcelResponse._decode(data)
         if data.get("message"):
             raise OneTrackerError(data.get("message"))
         else:
             raise OneTrackerError("Unable to convert data to GetParcelResponse.")
 
+@_decoded()
 @dataclass(frozen=True)
-class Carrier:
+class Carrier(_SlottedModel):
     """
     Object representing a carrier.
 
@@ -324,20 +528,15 @@ class Carrier:
     frequently_used: If the carrier is frequently used or not.
     """
 
+    __slots__ = ("id", "name", "frequently_used")
+
     id: str
     name: str
     frequently_used: bool
 
-    @staticmethod
-    def from_dict(data: dict):
-        return Carrier(
-            id=data.get("id"),
-            name=data.get("name"),
-            frequently_used=data.get("frequently_used"),
-        )
-
+@_decoded()
 @dataclass(frozen=True)
-class ListCarriersResponse:
+class ListCarriersResponse(_SlottedModel):
     """
     Object representing the response of List Carriers.
 
@@ -348,16 +547,15 @@ class ListCarriersResponse:
     carriers: List of Carrier objects.
     """
 
+    __slots__ = ("message", "carriers")
+
     message: str
     carriers: List[Carrier]
 
     @staticmethod
     def from_dict(data: dict):
         if data is not {} and data is not None and data.get("message") == "ok":
-            return ListCarriersResponse(
-                message=data.get("message"),
-                carriers=[Carrier.from_dict(carrier) for carrier in data.get("carriers") or []]
-            )
+            return ListCarriersResponse._decode(data)
         if data.get("message"):
             raise OneTrackerError(data.get("message"))
         else:
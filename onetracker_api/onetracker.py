@@ -1,12 +1,21 @@
 """Asynchronous Python client for OneTracker."""
-from typing import Dict, List, Optional, Type
+from typing import Any, AsyncIterator, Dict, Iterable, Optional, Union
 from aiohttp.client import ClientSession
-import json
+from aiohttp.connector import BaseConnector
+import asyncio
 import datetime
+import ssl
 
+from .cache import TTLCache
+from .cassette import Cassette
 from .client import Client
+from .codec import JSONCodec
+from .instrumentation import Instrumentation, instrumented
+from .rate_limit import RateLimiter
+from .retry import RetryPolicy
 from .exceptions import (
     OneTrackerError,
+    OneTrackerAuthenticationError,
     OneTrackerAuthenticationSessionError,
     OneTrackerAuthenticationSessionExpiredError
 )
@@ -14,10 +23,15 @@ from .models import (
     AuthenticationTokenResponse,
     ListParcelsResponse,
     GetParcelResponse,
+    GetParcelsResponse,
     SessionObject,
     DeleteParcelResponse,
     ListCarriersResponse,
+    Parcel,
 )
+from .session import SessionManager
+from .store import ParcelStore
+from .streaming import iter_json_array
 
 class OneTracker(Client):
     """
@@ -34,6 +48,42 @@ class OneTracker(Client):
     session: The aiohttp.ClientSession to use.
 
     user_agent: The user agent to use.
+
+    session_object: A previously obtained SessionObject, to skip login.
+
+    connector: A pooled connector shared with other instances, see create_connector(). Ignored when session is given.
+
+    limit: The maximum number of simultaneous connections of the internal connection pool.
+
+    limit_per_host: The maximum number of simultaneous connections per host of the internal connection pool.
+
+    keepalive_timeout: The number of seconds idle connections of the internal connection pool are kept open.
+
+    ttl_dns_cache: The number of seconds DNS entries are cached by the internal connection pool.
+
+    ssl_context: The SSL context reused for every TLS connection.
+
+    retry_policy: The RetryPolicy applied to every request, None to never retry. Each method accepts a retry_policy overriding it for one call.
+
+    rate_limiter: The RateLimiter consulted before every request, possibly shared with other instances.
+
+    coalesce_requests: If True, identical GET requests made while one is already in flight wait for and share its result instead of being sent again.
+
+    json_codec: The JSON backend name ("orjson", "ujson" or "json") or JSONCodec used for request and response bodies. Defaults to the fastest installed backend.
+
+    validator_cache: The TTLCache keeping the ETag and Last-Modified validators and decoded bodies of GET responses, so repeated GET requests are sent as conditional requests and a 304 Not Modified answer returns the previous result without decoding anything. Each entry keeps a whole JSON payload, and every model object built from it, alive until it expires or is evicted, so bound it with maxsize and ttl. None, the default, to not send conditional requests.
+
+    instrumentation: The Instrumentation recording per-phase timings of every request, building the returned objects included, in its histogram and hooks.
+
+    raw: If True, list_parcels(), get_parcel() and list_carriers() return the validated JSON payload as a dict instead of building model objects. Each of them accepts a raw argument overriding it for one call. Raw payloads are not copied: the same dict is returned to coalesced requests, kept by validator_cache and carrier_cache and returned again later, so treat it as read-only and copy it before changing it.
+
+    parcel_store: The ParcelStore that parcels are written behind to by list_parcels() and get_parcel(), and that get_parcel() reads through. Stored parcels are listed offline by list_stored_parcels().
+
+    carrier_cache: The TTLCache holding list_carriers() responses, keyed by tracking ID. Defaults to a cache of 1024 entries valid for one hour, pass TTLCache(maxsize=0) to disable caching.
+
+    session_manager: The SessionManager logging in again before the session expires and when a request is rejected with "Invalid API token". Without one, login() must be called again when the session expires.
+
+    cassette: The Cassette that responses are recorded to, or replayed from without any connection, to measure the whole client offline and reproducibly.
     """
 
     def __init__(
@@ -42,6 +92,23 @@ class OneTracker(Client):
         session: ClientSession = None,
         user_agent: str = None,
         session_object: SessionObject = None,
+        connector: BaseConnector = None,
+        limit: int = 100,
+        limit_per_host: int = 0,
+        keepalive_timeout: float = 15,
+        ttl_dns_cache: Optional[int] = 10,
+        ssl_context: ssl.SSLContext = None,
+        retry_policy: RetryPolicy = None,
+        rate_limiter: RateLimiter = None,
+        coalesce_requests: bool = True,
+        json_codec: Union[str, JSONCodec, None] = None,
+        validator_cache: TTLCache = None,
+        instrumentation: Instrumentation = None,
+        raw: bool = False,
+        parcel_store: ParcelStore = None,
+        carrier_cache: TTLCache = None,
+        session_manager: SessionManager = None,
+        cassette: Cassette = None,
     ) -> None:
         """Initilize connection with OneTracker"""
         super().__init__(
@@ -49,7 +116,25 @@ class OneTracker(Client):
             session=session,
             user_agent=user_agent,
             session_object=session_object,
+            connector=connector,
+            limit=limit,
+            limit_per_host=limit_per_host,
+            keepalive_timeout=keepalive_timeout,
+            ttl_dns_cache=ttl_dns_cache,
+            ssl_context=ssl_context,
+            retry_policy=retry_policy,
+            rate_limiter=rate_limiter,
+            coalesce_requests=coalesce_requests,
+            json_codec=json_codec,
+            validator_cache=validator_cache,
+            instrumentation=instrumentation,
+            cassette=cassette,
         )
+        self.raw = raw
+        self.parcel_store = parcel_store
+        self._store_writes = set()
+        self.carrier_cache = carrier_cache if carrier_cache is not None else TTLCache(maxsize=1024, ttl=3600)
+        self.session_manager = session_manager
 
     def __check_session_object__(self) -> None:
         """
@@ -64,6 +149,44 @@ class OneTracker(Client):
         if self.session_object.expiration < datetime.datetime.now():
             raise OneTrackerAuthenticationSessionExpiredError("Unable to authenticate to the API, the authentication session has expired. Please call the onetracker.login() method again.")
 
+    async def __ensure_session__(self) -> None:
+        """
+        Refresh the session with the session manager, if any, then check it. For internal use.
+
+        Raises:
+
+        OneTrackerAuthenticationSessionError: If there is no session.
+
+        OneTrackerAuthenticationSessionExpiredError: If the session has expired.
+        """
+        if self.session_manager is not None:
+            await self.session_manager.ensure_session(self)
+        self.__check_session_object__()
+
+    async def __authenticated_request__(self, uri: str, method: str, retry_policy: Optional[RetryPolicy]) -> Any:
+        """
+        Send a request with the session token. With a session manager, a request rejected with "Invalid API token" is sent once more with a new session. For internal use.
+
+        Args:
+
+        uri: The request URI.
+
+        method: The HTTP method.
+
+        retry_policy: The RetryPolicy for this call.
+
+        Returns:
+            The decoded JSON response.
+        """
+        token = self.session_object.token
+        try:
+            return await self._request(uri, method=method, headers={"x-api-token": token}, retry_policy=retry_policy)
+        except OneTrackerAuthenticationError:
+            if self.session_manager is None:
+                raise
+        await self.session_manager.refresh(self, token)
+        return await self._request(uri, method=method, headers={"x-api-token": self.session_object.token}, retry_policy=retry_policy)
+
     def __check_parcel_id__(self, id) -> None:
         """
         Check if parcel_id is not None and is a string. For internal use.
@@ -96,7 +219,60 @@ class OneTracker(Client):
         if type(tracking_id) is not str:
             raise OneTrackerError("Unable to perform that method, tracking_id must be a string.")
 
-    async def login(self, email, password) -> AuthenticationTokenResponse:
+    def __check_response__(self, results) -> Dict[str, Any]:
+        """
+        Check a raw API response is successful. For internal use.
+
+        Args:
+
+        results: The decoded JSON payload.
+
+        Returns:
+            The payload.
+
+        Raises:
+
+        OneTrackerError: If the payload is not a successful response.
+        """
+        if isinstance(results, dict) and results.get("message") == "ok":
+            return results
+        if isinstance(results, dict) and results.get("message"):
+            raise OneTrackerError(results.get("message"))
+        raise OneTrackerError("Unable to validate response.")
+
+    def __store_call__(self, function, *args) -> "asyncio.Future[Any]":
+        """Run a parcel store operation on the store's worker thread. For internal use."""
+        return asyncio.get_running_loop().run_in_executor(self.parcel_store.executor, function, *args)
+
+    def __store_write_behind__(self, function, *args) -> None:
+        """Schedule a parcel store write without waiting for it. For internal use."""
+        write = self.__store_call__(function, *args)
+        self._store_writes.add(write)
+        write.add_done_callback(self.__store_write_done__)
+
+    def __store_parcels__(self, results, key: str) -> None:
+        """Write the parcels of a successful response behind to the parcel store, if any. For internal use."""
+        if self.parcel_store is None or not isinstance(results, dict) or results.get("message") != "ok":
+            return
+        parcels = results.get(key)
+        if isinstance(parcels, dict):
+            parcels = [parcels]
+        if parcels:
+            self.__store_write_behind__(self.parcel_store.put, parcels)
+
+    def __store_write_done__(self, write: "asyncio.Future[Any]") -> None:
+        """Forget a finished write. The store is a cache, so failed writes are dropped. For internal use."""
+        self._store_writes.discard(write)
+        if not write.cancelled():
+            write.exception()
+
+    async def flush_store(self) -> None:
+        """Wait until every pending parcel store write is done."""
+        if self._store_writes:
+            await asyncio.gather(*self._store_writes, return_exceptions=True)
+
+    @instrumented
+    async def login(self, email, password, retry_policy: RetryPolicy = None) -> AuthenticationTokenResponse:
         """
         Create authentication token.
 
@@ -106,6 +282,8 @@ class OneTracker(Client):
 
         password: The password of the user.
 
+        retry_policy: The RetryPolicy for this call, overriding the client's retry policy.
+
         Returns:
             AuthenticationTokenResponse: Authentication Token Response Object.
 
@@ -114,14 +292,15 @@ class OneTracker(Client):
         OneTrackerError: If login failed.
         """
         try:
-            results = await self._request("/auth/token", method='POST', data=json.dumps({"email": email, "password": password}))
+            results = await self._request("/auth/token", method='POST', data=self.codec.dumps({"email": email, "password": password}), retry_policy=retry_policy)
             authentication_token_response = AuthenticationTokenResponse.from_dict(results)
             self.session_object = authentication_token_response.session
             return authentication_token_response
         except OneTrackerError as e:
             raise OneTrackerError(f"Unable to authenticate with OneTracker API: {e}")
 
-    async def list_parcels(self, archived = False) -> ListParcelsResponse:
+    @instrumented
+    async def list_parcels(self, archived = False, retry_policy: RetryPolicy = None, raw: Optional[bool] = None) -> Union[ListParcelsResponse, Dict[str, Any]]:
         """
         List parcels.
 
@@ -129,27 +308,81 @@ class OneTracker(Client):
 
         archived: If True, archived parcels will be returned.
 
+        retry_policy: The RetryPolicy for this call, overriding the client's retry policy.
+
+        raw: If True, the validated JSON payload is returned instead of model objects. It may be shared with other calls, so treat it as read-only. Defaults to the client's raw setting.
+
         Returns:
-            ListParcelsResponse: List Parcels Response Object.
+            ListParcelsResponse: List Parcels Response Object. The JSON payload dict in raw mode.
 
         Raises:
 
         OneTrackerError: If list parcels failed.
         """
-        self.__check_session_object__()
+        await self.__ensure_session__()
         archived_str = "true" if archived else "false"
-        results = await self._request(
-            f"/parcels?archived={archived_str}",
-            method='GET',
-            headers={"x-api-token": self.session_object.token},
-        )
+        results = await self.__authenticated_request__(f"/parcels?archived={archived_str}", 'GET', retry_policy)
+
+        self.__store_parcels__(results, "parcels")
 
         try:
-            return ListParcelsResponse.from_dict(results)
+            if (self.raw if raw is None else raw):
+                return self.__check_response__(results)
+            return self._decode(results, ListParcelsResponse.from_dict)
         except OneTrackerError as e:
             raise OneTrackerError(f"Unable to list parcels: {e}")
 
-    async def get_parcel(self, id) -> GetParcelResponse:
+    async def iter_parcels(self, archived = False, retry_policy: RetryPolicy = None) -> AsyncIterator[Parcel]:
+        """
+        Iterate over parcels, parsing the response incrementally as it is received.
+
+        Unlike list_parcels(), the response is never held in memory as a whole: only the parcel being yielded is, whatever the size of the account.
+
+        Args:
+
+        archived: If True, archived parcels will be returned.
+
+        retry_policy: The RetryPolicy for this call, overriding the client's retry policy. Only sending the request is retried.
+
+        Yields:
+            Parcel: Parcel Object.
+
+        Raises:
+
+        OneTrackerError: If list parcels failed.
+        """
+        await self.__ensure_session__()
+        archived_str = "true" if archived else "false"
+        for attempt in range(2):
+            token = self.session_object.token
+            chunks = self._request_stream(
+                f"/parcels?archived={archived_str}",
+                method='GET',
+                headers={"x-api-token": token},
+                retry_policy=retry_policy,
+            )
+            members = {}
+            parcels = iter_json_array(chunks, "parcels", members)
+            yielded = False
+            try:
+                async for parcel in parcels:
+                    yielded = True
+                    yield Parcel.from_dict(parcel)
+                break
+            except OneTrackerAuthenticationError:
+                # Nothing was yielded yet, so the listing can start over with a new session.
+                if yielded or attempt or self.session_manager is None:
+                    raise
+                await self.session_manager.refresh(self, token)
+            finally:
+                await parcels.aclose()
+                await chunks.aclose()
+
+        if members.get("message") != "ok":
+            raise OneTrackerError(f"Unable to list parcels: {members.get('message') or 'Unable to convert data to Parcel.'}")
+
+    @instrumented
+    async def get_parcel(self, id, retry_policy: RetryPolicy = None, raw: Optional[bool] = None, use_store: bool = True) -> Union[GetParcelResponse, Dict[str, Any]]:
         """
         Get one parcel.
 
@@ -157,27 +390,100 @@ class OneTracker(Client):
 
         id: The id of the parcel.
 
+        retry_policy: The RetryPolicy for this call, overriding the client's retry policy.
+
+        raw: If True, the validated JSON payload is returned instead of model objects. It may be shared with other calls, so treat it as read-only. Defaults to the client's raw setting.
+
+        use_store: If False, the parcel store is bypassed and the parcel is requested, then stored. Parcels only stored by list_parcels() are always requested, as they lack tracking events.
+
         Returns:
-            GetParcelResponse: Parcel Response Object.
+            GetParcelResponse: Parcel Response Object. The JSON payload dict in raw mode.
 
         Raises:
 
         OneTrackerError: If get parcel failed.
         """
-        self.__check_session_object__()
+        await self.__ensure_session__()
         self.__check_parcel_id__(id)
-        results = await self._request(
-            f"/parcels/{id}",
-            method='GET',
-            headers={"x-api-token": self.session_object.token},
-        )
+        raw = self.raw if raw is None else raw
+        if use_store and self.parcel_store is not None:
+            parcel = await self.__store_call__(self.parcel_store.get, id, self.parcel_store.max_age)
+            # Parcels stored from list_parcels() come without their tracking events.
+            if parcel is not None and parcel.get("tracking_events") is not None:
+                results = {"message": "ok", "parcel": parcel}
+                return results if raw else GetParcelResponse.from_dict(results)
+
+        results = await self.__authenticated_request__(f"/parcels/{id}", 'GET', retry_policy)
+        self.__store_parcels__(results, "parcel")
 
         try:
-            return GetParcelResponse.from_dict(results)
+            if raw:
+                return self.__check_response__(results)
+            return self._decode(results, GetParcelResponse.from_dict)
         except OneTrackerError as e:
             raise OneTrackerError(f"Unable to get parcel: {e}")
 
-    async def delete_parcel(self, id) -> DeleteParcelResponse:
+    async def get_parcels(self, ids: Iterable[int], concurrency: int = 10, retry_policy: RetryPolicy = None) -> GetParcelsResponse:
+        """
+        Get many parcels concurrently.
+
+        Args:
+
+        ids: The ids of the parcels. Duplicate ids are only fetched once.
+
+        concurrency: The maximum number of parcels fetched at the same time.
+
+        retry_policy: The RetryPolicy for this call, overriding the client's retry policy.
+
+        Returns:
+            GetParcelsResponse: Get Parcels Response Object. Parcels that could not be fetched or decoded are reported in its errors, as OneTrackerError, instead of aborting the whole batch.
+
+        Raises:
+
+        OneTrackerError: If an id or the concurrency is invalid.
+        """
+        ids = list(ids)
+        for id in ids:
+            self.__check_parcel_id__(id)
+        if type(concurrency) is not int or concurrency < 1:
+            raise OneTrackerError("Unable to perform that method, concurrency must be a positive int.")
+        ids = list(dict.fromkeys(ids))
+        await self.__ensure_session__()
+
+        semaphore = asyncio.Semaphore(concurrency)
+        results = {}
+
+        async def fetch(id):
+            async with semaphore:
+                try:
+                    results[id] = (await self.get_parcel(id, retry_policy=retry_policy, raw=False)).parcel
+                except OneTrackerError as e:
+                    results[id] = e
+                except Exception as e:
+                    # A malformed response only fails its own parcel.
+                    error = OneTrackerError(f"Unable to get parcel {id}, {type(e).__name__}: {e}")
+                    error.__cause__ = e
+                    results[id] = error
+
+        tasks = [asyncio.ensure_future(fetch(id)) for id in ids]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+        parcels = {}
+        errors = {}
+        for id in ids:
+            if isinstance(results[id], OneTrackerError):
+                errors[id] = results[id]
+            else:
+                parcels[id] = results[id]
+        return GetParcelsResponse(parcels=parcels, errors=errors)
+
+    @instrumented
+    async def delete_parcel(self, id, retry_policy: RetryPolicy = None) -> DeleteParcelResponse:
         """
         Delete one parcel.
 
@@ -185,6 +491,8 @@ class OneTracker(Client):
 
         id: The id of the parcel.
 
+        retry_policy: The RetryPolicy for this call, overriding the client's retry policy.
+
         Returns:
             DeleteParcelResponse: Delete Parcel Response Object.
 
@@ -192,20 +500,45 @@ class OneTracker(Client):
 
         OneTrackerError: If delete parcel failed.
         """
-        self.__check_session_object__()
+        await self.__ensure_session__()
         self.__check_parcel_id__(id)
-        results = await self._request(
-            f"/parcels/{id}",
-            method='DELETE',
-            headers={"x-api-token": self.session_object.token},
-        )
+        results = await self.__authenticated_request__(f"/parcels/{id}", 'DELETE', retry_policy)
 
         try:
-            return DeleteParcelResponse.from_dict(results)
+            delete_parcel_response = DeleteParcelResponse.from_dict(results)
         except OneTrackerError as e:
             raise OneTrackerError(f"Unable to delete parcel: {e}")
+        if self.parcel_store is not None:
+            self.__store_write_behind__(self.parcel_store.delete, id)
+        return delete_parcel_response
 
-    async def list_carriers(self, tracking_id=None) -> ListCarriersResponse:
+    async def list_stored_parcels(self, archived = False, raw: Optional[bool] = None) -> Union[ListParcelsResponse, Dict[str, Any]]:
+        """
+        List the parcels in the parcel store, without any request. Works offline and without a session.
+
+        Args:
+
+        archived: If True, archived parcels will be returned as well, as list_parcels(archived=True) does.
+
+        raw: If True, the JSON payload is returned instead of model objects. Defaults to the client's raw setting.
+
+        Returns:
+            ListParcelsResponse: List Parcels Response Object. The JSON payload dict in raw mode.
+
+        Raises:
+
+        OneTrackerError: If there is no parcel store.
+        """
+        if self.parcel_store is None:
+            raise OneTrackerError("Unable to perform that method, no parcel store is set.")
+        parcels = await self.__store_call__(self.parcel_store.list, None if archived else False)
+        results = {"message": "ok", "parcels": parcels}
+        if (self.raw if raw is None else raw):
+            return results
+        return ListParcelsResponse.from_dict(results)
+
+    @instrumented
+    async def list_carriers(self, tracking_id=None, retry_policy: RetryPolicy = None, use_cache: bool = True, raw: Optional[bool] = None) -> Union[ListCarriersResponse, Dict[str, Any]]:
         """
         List carriers with tracking_id.
 
@@ -213,28 +546,58 @@ class OneTracker(Client):
 
         tracking_id: If given, the OneTracker API will return carriers that the given tracking ID is most likely to be carried by. Optional argument, will return all carriers if unspecified.
 
+        retry_policy: The RetryPolicy for this call, overriding the client's retry policy.
+
+        use_cache: If False, the carrier cache is bypassed and refreshed with the response.
+
+        raw: If True, the validated JSON payload is returned instead of model objects. It may be shared with other calls, so treat it as read-only. Defaults to the client's raw setting.
+
         Returns:
-            ListCarrierResponse: List Carrier Response Object.
+            ListCarrierResponse: List Carrier Response Object. The JSON payload dict in raw mode.
 
         Raises:
 
         OneTrackerError: If list carriers failed.
         """
-        self.__check_session_object__()
+        await self.__ensure_session__()
         if tracking_id is not None:
             self.__check_tracking_id__(tracking_id)
-            results = await self._request(
-                f"/carriers?trackingID={tracking_id}",
-                method='GET',
-                headers={"x-api-token": self.session_object.token},
-            )
 
+        raw = self.raw if raw is None else raw
+        cache_key = (tracking_id, "raw") if raw else tracking_id
+        if use_cache:
+            cached = self.carrier_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        if tracking_id is not None:
+            results = await self.__authenticated_request__(f"/carriers?trackingID={tracking_id}", 'GET', retry_policy)
         else:
-            results = await self._request("/carriers", method='GET', headers={"x-api-token": self.session_object.token})
+            results = await self.__authenticated_request__("/carriers", 'GET', retry_policy)
         try:
-            return ListCarriersResponse.from_dict(results)
+            if raw:
+                response = self.__check_response__(results)
+            else:
+                response = self._decode(results, ListCarriersResponse.from_dict)
         except OneTrackerError as e:
             raise OneTrackerError(f"Unable to list carriers: {e}")
+        self.carrier_cache.set(cache_key, response)
+        return response
+
+    def invalidate_carriers(self, tracking_id=None) -> None:
+        """
+        Remove one list_carriers() response from the carrier cache.
+
+        Args:
+
+        tracking_id: The tracking ID of the cached response, None for the full carrier list.
+        """
+        self.carrier_cache.invalidate(tracking_id)
+        self.carrier_cache.invalidate((tracking_id, "raw"))
+
+    def clear_carrier_cache(self) -> None:
+        """Remove every list_carriers() response from the carrier cache."""
+        self.carrier_cache.clear()
 
     async def __aenter__(self) -> "OneTracker":
         """Async enter."""
@@ -242,4 +605,7 @@ class OneTracker(Client):
 
     async def __aexit__(self, *exc_info) -> None:
         """Async exit."""
+        if self.session_manager is not None:
+            await self.session_manager.close()
+        await self.flush_store()
         await self.close_session()
@@ -0,0 +1,241 @@
+"""Many OneTracker accounts sharing one connection pool."""
+import asyncio
+from collections import deque
+from typing import Any, Deque, Dict, Iterator, Optional
+
+from aiohttp.connector import BaseConnector
+
+from .client import create_connector
+from .exceptions import OneTrackerError
+from .models import ListAccountParcelsResponse, SessionObject
+from .onetracker import OneTracker
+from .session import SessionManager
+
+class _FairQueue:
+    """Concurrency limit granting waiting accounts their turn round-robin."""
+
+    def __init__(self, concurrency: int) -> None:
+        self.free = concurrency
+        self.waiters: Dict[str, Deque[asyncio.Future]] = {}
+        self.ring: Deque[str] = deque()
+
+    async def acquire(self, name: str) -> None:
+        """Wait for a turn of account name."""
+        if self.free > 0 and not self.ring:
+            self.free -= 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        queue = self.waiters.get(name)
+        if queue is None:
+            queue = self.waiters[name] = deque()
+            self.ring.append(name)
+        queue.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            # The turn was granted just before the cancellation, pass it on.
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+
+    def release(self) -> None:
+        """End a turn and grant the next one."""
+        self.free += 1
+        while self.free > 0 and self.ring:
+            name = self.ring.popleft()
+            queue = self.waiters[name]
+            waiter = queue.popleft()
+            if queue:
+                self.ring.append(name)
+            else:
+                del self.waiters[name]
+            if not waiter.done():
+                self.free -= 1
+                waiter.set_result(None)
+
+class _Turn:
+    """Async context manager holding one turn of an account."""
+
+    def __init__(self, queue: _FairQueue, name: str) -> None:
+        self.queue = queue
+        self.name = name
+
+    async def __aenter__(self) -> None:
+        await self.queue.acquire(self.name)
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.queue.release()
+
+class AccountPool:
+    """
+    Pool of OneTracker clients, one per account, multiplexed over one connection pool.
+
+    Calls made through the pool take turns: at most concurrency of them run at once and waiting accounts are served round-robin, one call each, so an account with many pending calls cannot starve the others. Calls made directly on an account's client bypass the turns.
+
+    Args:
+
+    concurrency: The maximum number of calls running at once, across every account.
+
+    connector: The connector shared by every account. Defaults to one created with create_connector() and closed with the pool, in which case the pool must be created within a running event loop.
+
+    client_options: Keyword arguments passed to the OneTracker of every account.
+    """
+
+    def __init__(self, concurrency: int = 10, connector: Optional[BaseConnector] = None, **client_options) -> None:
+        """Initialize pool."""
+        if type(concurrency) is not int or concurrency < 1:
+            raise OneTrackerError("Unable to create account pool, concurrency must be a positive int.")
+
+        self.concurrency = concurrency
+        self._owns_connector = connector is None
+        self.connector = connector if connector is not None else create_connector()
+        self.client_options = client_options
+        self._clients: Dict[str, OneTracker] = {}
+        self._queue = _FairQueue(concurrency)
+
+    def add_account(
+        self,
+        name: str,
+        email: Optional[str] = None,
+        password: Optional[str] = None,
+        session_object: Optional[SessionObject] = None,
+        **client_options,
+    ) -> OneTracker:
+        """
+        Add an account to the pool.
+
+        Args:
+
+        name: The name the account is referred to by.
+
+        email: The email address of the user. With password, a SessionManager keeps the account's session valid.
+
+        password: The password of the user.
+
+        session_object: The session of the account, if already logged in.
+
+        client_options: Keyword arguments passed to the account's OneTracker, overriding the pool's.
+
+        Returns:
+            The account's OneTracker client.
+
+        Raises:
+
+        OneTrackerError: If the account name is already used.
+        """
+        if name in self._clients:
+            raise OneTrackerError(f"Unable to add account {name!r}, it is already in the pool.")
+        options = dict(self.client_options, **client_options)
+        if email is not None and password is not None and "session_manager" not in options:
+            options["session_manager"] = SessionManager(email, password)
+        client = OneTracker(connector=self.connector, session_object=session_object, **options)
+        self._clients[name] = client
+        return client
+
+    async def remove_account(self, name: str) -> None:
+        """
+        Remove an account from the pool and close its client.
+
+        Args:
+
+        name: The name of the account.
+        """
+        client = self._clients.pop(name, None)
+        if client is not None:
+            await client.__aexit__(None, None, None)
+
+    def __getitem__(self, name: str) -> OneTracker:
+        """Return the client of an account."""
+        return self._clients[name]
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the account names."""
+        return iter(list(self._clients))
+
+    def __len__(self) -> int:
+        """Return the number of accounts."""
+        return len(self._clients)
+
+    def turn(self, name: str) -> _Turn:
+        """
+        Wait for a turn of an account, to run calls on its client directly.
+
+        Args:
+
+        name: The name of the account.
+
+        Returns:
+            An async context manager holding the turn.
+        """
+        return _Turn(self._queue, name)
+
+    async def call(self, name: str, method: str, *args, **kwargs) -> Any:
+        """
+        Call a method of an account's client during one of its turns.
+
+        Args:
+
+        name: The name of the account.
+
+        method: The name of the OneTracker method, for example "get_parcel".
+
+        args: The positional arguments of the method.
+
+        kwargs: The keyword arguments of the method.
+
+        Returns:
+            The method's result.
+
+        Raises:
+
+        OneTrackerError: If the account is unknown, or the method failed.
+        """
+        client = self._clients.get(name)
+        if client is None:
+            raise OneTrackerError(f"Unable to perform that method, unknown account {name!r}.")
+        async with self.turn(name):
+            return await getattr(client, method)(*args, **kwargs)
+
+    async def list_parcels(self, archived = False) -> ListAccountParcelsResponse:
+        """
+        List the parcels of every account.
+
+        Args:
+
+        archived: If True, archived parcels will be returned.
+
+        Returns:
+            ListAccountParcelsResponse: List Account Parcels Response Object. Accounts whose parcels could not be listed are reported in its errors instead of aborting the whole listing.
+        """
+        names = list(self._clients)
+        results = await asyncio.gather(
+            *(self.call(name, "list_parcels", archived=archived, raw=False) for name in names),
+            return_exceptions=True,
+        )
+
+        parcels = {}
+        errors = {}
+        for name, result in zip(names, results):
+            if isinstance(result, OneTrackerError):
+                errors[name] = result
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                parcels[name] = result.parcels
+        return ListAccountParcelsResponse(parcels=parcels, errors=errors)
+
+    async def close(self) -> None:
+        """Close every account's client, and the connector if the pool created it."""
+        for name in list(self._clients):
+            await self.remove_account(name)
+        if self._owns_connector:
+            await self.connector.close()
+
+    async def __aenter__(self) -> "AccountPool":
+        """Async enter."""
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        """Async exit."""
+        await self.close()
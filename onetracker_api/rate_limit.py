@@ -0,0 +1,54 @@
+"""Client-side rate limiting for requests to the OneTracker API."""
+import asyncio
+import time
+from typing import Callable
+
+from .exceptions import OneTrackerError
+
+class RateLimiter:
+    """
+    Token bucket rate limiter.
+
+    One instance can be shared between any number of clients running in the same event loop, for example every OneTracker instance of a process, so together they never exceed the configured rate.
+
+    Args:
+
+    rate: The sustained number of requests allowed per second.
+
+    burst: The number of requests that may be sent at once after a quiet period.
+
+    timer: The monotonic clock used to refill the bucket.
+    """
+
+    def __init__(self, rate: float, burst: int = 1, timer: Callable[[], float] = time.monotonic) -> None:
+        """Initialize rate limiter."""
+        if rate <= 0:
+            raise OneTrackerError("Unable to create rate limiter, rate must be positive.")
+        if type(burst) is not int or burst < 1:
+            raise OneTrackerError("Unable to create rate limiter, burst must be a positive int.")
+
+        self.rate = rate
+        self.burst = burst
+        self.timer = timer
+        self._tokens = float(burst)
+        self._updated = timer()
+        self._lock = None
+
+    def _refill(self) -> None:
+        """Add the tokens earned since the last refill."""
+        now = self.timer()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        """Wait until a request may be sent. Waiters are served in arrival order."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
@@ -0,0 +1,129 @@
+"""Retry policies for requests to the OneTracker API."""
+import datetime
+import random
+from email.utils import parsedate_to_datetime
+from typing import Iterable, Optional
+
+from .exceptions import OneTrackerError
+
+class RetryPolicy:
+    """
+    Retry policy with capped exponential backoff and jitter.
+
+    Subclass it and override is_retryable() or get_delay() to plug in a different strategy.
+
+    Args:
+
+    max_attempts: The maximum number of attempts, including the first one. 1 disables retrying.
+
+    backoff_factor: The delay in seconds before the first retry, doubled on every following retry.
+
+    backoff_max: The maximum delay in seconds between two attempts.
+
+    jitter: If True, each delay is drawn uniformly between 0 and the computed backoff ("full jitter"), so many clients failing at once do not retry in lockstep.
+
+    retry_statuses: The HTTP status codes that are retried.
+
+    retry_methods: The HTTP methods that are retried. Only idempotent methods are retried by default.
+
+    respect_retry_after: If True, the Retry-After header of 429 and 503 responses is honored, capped at backoff_max.
+    """
+
+    DEFAULT_RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+    DEFAULT_RETRY_METHODS = frozenset(["GET", "HEAD", "OPTIONS", "PUT", "DELETE"])
+    RETRY_AFTER_STATUSES = frozenset([429, 503])
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        backoff_factor: float = 0.5,
+        backoff_max: float = 30,
+        jitter: bool = True,
+        retry_statuses: Iterable[int] = DEFAULT_RETRY_STATUSES,
+        retry_methods: Iterable[str] = DEFAULT_RETRY_METHODS,
+        respect_retry_after: bool = True,
+    ) -> None:
+        """Initialize retry policy."""
+        if type(max_attempts) is not int or max_attempts < 1:
+            raise OneTrackerError("Unable to create retry policy, max_attempts must be a positive int.")
+        if backoff_factor < 0 or backoff_max < 0:
+            raise OneTrackerError("Unable to create retry policy, backoff_factor and backoff_max must not be negative.")
+
+        self.max_attempts = max_attempts
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+        self.jitter = jitter
+        self.retry_statuses = frozenset(retry_statuses)
+        self.retry_methods = frozenset(method.upper() for method in retry_methods)
+        self.respect_retry_after = respect_retry_after
+
+    def is_retryable(self, method: str, attempt: int, status: Optional[int] = None) -> bool:
+        """
+        Decide whether a failed attempt is retried.
+
+        Args:
+
+        method: The HTTP method of the request.
+
+        attempt: The number of the attempt that failed, starting at 1.
+
+        status: The HTTP status code of the response, or None if no response was received (timeout or connection error).
+
+        Returns:
+            True if the request should be sent again.
+        """
+        if attempt >= self.max_attempts or method.upper() not in self.retry_methods:
+            return False
+        return status is None or status in self.retry_statuses
+
+    def get_delay(self, attempt: int, status: Optional[int] = None, retry_after: Optional[str] = None) -> float:
+        """
+        Compute the delay before the next attempt.
+
+        Args:
+
+        attempt: The number of the attempt that failed, starting at 1.
+
+        status: The HTTP status code of the response, or None if no response was received.
+
+        retry_after: The value of the Retry-After response header, if any.
+
+        Returns:
+            The delay in seconds.
+        """
+        if self.respect_retry_after and status in self.RETRY_AFTER_STATUSES:
+            delay = self.parse_retry_after(retry_after)
+            if delay is not None:
+                return min(delay, self.backoff_max)
+
+        backoff = min(self.backoff_max, self.backoff_factor * (2 ** (attempt - 1)))
+        if self.jitter:
+            return random.uniform(0, backoff)
+        return backoff
+
+    @staticmethod
+    def parse_retry_after(value: Optional[str]) -> Optional[float]:
+        """
+        Parse a Retry-After header value.
+
+        Args:
+
+        value: Either a number of seconds or an HTTP date.
+
+        Returns:
+            The number of seconds to wait, or None if the value is missing or invalid.
+        """
+        if not value:
+            return None
+        value = value.strip()
+        if value.isdigit():
+            return float(value)
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError, IndexError):
+            return None
+        if retry_at is None:
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=datetime.timezone.utc)
+        return max(0.0, (retry_at - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
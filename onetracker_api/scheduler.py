@@ -0,0 +1,258 @@
+"""Adaptive polling of parcels."""
+import asyncio
+import datetime
+import heapq
+import itertools
+import time
+from typing import AsyncIterator, Callable, Dict, Optional, Set
+
+from .exceptions import OneTrackerError
+from .models import Parcel
+from .rate_limit import RateLimiter
+from .retry import RetryPolicy
+
+DELIVERED_STATUSES = frozenset({"delivered"})
+
+def _is_set(value: Optional[datetime.datetime]) -> bool:
+    """Return True if value is a real timestamp. The API sends 1001-01-01T00:00:00Z for unknown ones."""
+    return value is not None and value.year > 1001
+
+def _utcnow(value: datetime.datetime) -> datetime.datetime:
+    """Return the current UTC time, naive if value is naive, like the API's "Z" timestamps."""
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return now if value.tzinfo is not None else now.replace(tzinfo=None)
+
+class PollScheduler:
+    """
+    Adaptive parcel poller.
+
+    Each parcel gets its own refresh interval from its tracking status and ETA: parcels close to, or past, their estimated delivery are polled often, parcels in transit without news for days rarely, and delivered or archived parcels not at all. Due parcels are refreshed with get_parcel() earliest first, each as soon as one of concurrency refreshes is free, within an optional global request budget.
+
+    Args:
+
+    onetracker: The OneTracker client.
+
+    budget: The RateLimiter every refresh waits for, shared with other schedulers to bound their total request rate. None to only be limited by concurrency and the client's own rate limiter.
+
+    concurrency: The maximum number of parcels refreshed at the same time.
+
+    near_eta_interval: The number of seconds between refreshes of parcels whose ETA is within near_eta_window.
+
+    near_eta_window: The number of seconds before and after the ETA during which near_eta_interval applies. Parcels past their ETA but not delivered are always polled at near_eta_interval.
+
+    interval: The number of seconds between refreshes of the other parcels in transit.
+
+    dormant_after: The number of seconds without update after which a parcel is considered dormant.
+
+    dormant_interval: The number of seconds between refreshes of dormant parcels.
+
+    error_interval: The number of seconds before a parcel whose refresh failed is tried again.
+
+    timer: The monotonic clock used to schedule refreshes.
+    """
+
+    def __init__(
+        self,
+        onetracker,
+        budget: Optional[RateLimiter] = None,
+        concurrency: int = 4,
+        near_eta_interval: float = 900,
+        near_eta_window: float = 6 * 3600,
+        interval: float = 3 * 3600,
+        dormant_after: float = 3 * 86400,
+        dormant_interval: float = 12 * 3600,
+        error_interval: float = 900,
+        timer: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Initialize scheduler."""
+        if type(concurrency) is not int or concurrency < 1:
+            raise OneTrackerError("Unable to create poll scheduler, concurrency must be a positive int.")
+        for name, value in (("near_eta_interval", near_eta_interval), ("interval", interval), ("dormant_interval", dormant_interval), ("error_interval", error_interval)):
+            if value < 0:
+                raise OneTrackerError(f"Unable to create poll scheduler, {name} must not be negative.")
+
+        self.onetracker = onetracker
+        self.budget = budget
+        self.concurrency = concurrency
+        self.near_eta_interval = near_eta_interval
+        self.near_eta_window = datetime.timedelta(seconds=near_eta_window)
+        self.interval = interval
+        self.dormant_after = datetime.timedelta(seconds=dormant_after)
+        self.dormant_interval = dormant_interval
+        self.error_interval = error_interval
+        self.timer = timer
+        self.errors: Dict[int, OneTrackerError] = {}
+        self._queue = []
+        self._due: Dict[int, float] = {}
+        self._polled: Set[int] = set()
+        self._counter = itertools.count()
+        self._wake: Optional[asyncio.Event] = None
+
+    def get_interval(self, parcel: Parcel, now: Optional[datetime.datetime] = None) -> Optional[float]:
+        """
+        Get the number of seconds until a parcel should be refreshed.
+
+        Args:
+
+        parcel: The Parcel.
+
+        now: The current time, defaults to the current UTC time.
+
+        Returns:
+            The interval in seconds, or None if the parcel no longer needs polling.
+        """
+        if parcel.is_archived or _is_set(parcel.tracking_time_delivered) or parcel.tracking_status in DELIVERED_STATUSES:
+            return None
+
+        eta = parcel.tracking_time_estimated
+        if _is_set(eta) and eta - (now or _utcnow(eta)) <= self.near_eta_window:
+            return self.near_eta_interval
+
+        updated = parcel.time_updated
+        if _is_set(updated) and (now or _utcnow(updated)) - updated >= self.dormant_after:
+            return self.dormant_interval
+        return self.interval
+
+    def add(self, parcel: Parcel, delay: Optional[float] = None) -> bool:
+        """
+        Schedule a parcel, replacing its previous schedule.
+
+        Args:
+
+        parcel: The Parcel.
+
+        delay: The number of seconds before the first refresh. Defaults to the parcel's interval, 0 to refresh it right away.
+
+        Returns:
+            True if the parcel was scheduled, False if it no longer needs polling.
+        """
+        if delay is None:
+            delay = self.get_interval(parcel)
+            if delay is None:
+                self.remove(parcel.id)
+                return False
+        self._polled.add(parcel.id)
+        self.__schedule__(parcel.id, delay)
+        return True
+
+    def remove(self, id: int) -> None:
+        """
+        Stop polling a parcel.
+
+        Args:
+
+        id: The id of the parcel.
+        """
+        self._polled.discard(id)
+        self._due.pop(id, None)
+        self.errors.pop(id, None)
+        if self._wake is not None:
+            self._wake.set()
+
+    def __schedule__(self, id: int, delay: float) -> None:
+        """Push a refresh of a parcel. Earlier entries for it become stale. For internal use."""
+        due = self.timer() + delay
+        self._due[id] = due
+        heapq.heappush(self._queue, (due, next(self._counter), id))
+        if self._wake is not None:
+            self._wake.set()
+
+    def __pop_due__(self, now: float, limit: Optional[int] = None):
+        """Pop the ids of up to limit due parcels, concurrency by default. For internal use."""
+        limit = self.concurrency if limit is None else limit
+        ids = []
+        while self._queue and len(ids) < limit:
+            due, _, id = self._queue[0]
+            if self._due.get(id) != due:
+                heapq.heappop(self._queue)
+                continue
+            if due > now:
+                break
+            heapq.heappop(self._queue)
+            del self._due[id]
+            ids.append(id)
+        return ids
+
+    def __len__(self) -> int:
+        """Return the number of polled parcels."""
+        return len(self._polled)
+
+    def next_due(self) -> Optional[float]:
+        """
+        Get the number of seconds until the next refresh.
+
+        Returns:
+            The number of seconds, 0 if a refresh is overdue, or None if no parcel is scheduled.
+        """
+        while self._queue and self._due.get(self._queue[0][2]) != self._queue[0][0]:
+            heapq.heappop(self._queue)
+        if not self._queue:
+            return None
+        return max(0.0, self._queue[0][0] - self.timer())
+
+    async def __refresh__(self, id: int, retry_policy: Optional[RetryPolicy]) -> Optional[Parcel]:
+        """Refresh one parcel and reschedule it. For internal use."""
+        if self.budget is not None:
+            await self.budget.acquire()
+        try:
+            parcel = (await self.onetracker.get_parcel(id, retry_policy=retry_policy, raw=False, use_store=False)).parcel
+        except OneTrackerError as e:
+            # Removed or rescheduled while refreshing: keep the caller's decision.
+            if id in self._polled and id not in self._due:
+                self.errors[id] = e
+                self.__schedule__(id, self.error_interval)
+            return None
+        if id in self._polled and id not in self._due:
+            self.errors.pop(id, None)
+            self.add(parcel)
+        return parcel
+
+    async def run(self, retry_policy: RetryPolicy = None) -> AsyncIterator[Parcel]:
+        """
+        Refresh parcels as they become due, until none is left to poll.
+
+        Up to concurrency parcels are refreshed at the same time, the next due one starting as soon as any refresh finishes. Parcels added or removed while running are picked up right away. Parcels whose refresh failed are rescheduled after error_interval, their error being kept in errors until a refresh succeeds.
+
+        Args:
+
+        retry_policy: The RetryPolicy for the refreshes, overriding the client's retry policy.
+
+        Yields:
+            Parcel: Each refreshed Parcel Object.
+        """
+        self._wake = wake = asyncio.Event()
+        running: Dict[asyncio.Future, int] = {}
+        try:
+            while True:
+                # Cleared before looking at the queue, so changes made from here on cut the wait short.
+                wake.clear()
+                for id in self.__pop_due__(self.timer(), self.concurrency - len(running)):
+                    running[asyncio.ensure_future(self.__refresh__(id, retry_policy))] = id
+                delay = self.next_due()
+                if not running and delay is None:
+                    return
+
+                waiter = asyncio.ensure_future(wake.wait())
+                try:
+                    # With every refresh slot taken, only a finished refresh lets another start.
+                    await asyncio.wait(
+                        [waiter, *running],
+                        timeout=delay if len(running) < self.concurrency else None,
+                        return_when=asyncio.FIRST_COMPLETED,
+                    )
+                finally:
+                    waiter.cancel()
+
+                for task in [task for task in running if task.done()]:
+                    del running[task]
+                    parcel = task.result()
+                    if parcel is not None:
+                        yield parcel
+        finally:
+            if self._wake is wake:
+                self._wake = None
+            for task, id in running.items():
+                task.cancel()
+                # Interrupted refreshes are due again, for the next run.
+                if id in self._polled and id not in self._due:
+                    self.__schedule__(id, 0)
@@ -0,0 +1,184 @@
+"""Automatic management of OneTracker authentication sessions."""
+import asyncio
+import datetime
+import logging
+from typing import Optional
+
+from .exceptions import OneTrackerError
+from .models import SessionObject
+from .session_store import SessionStore
+
+_LOGGER = logging.getLogger(__name__)
+
+class SessionManager:
+    """
+    Keeps the authentication session of a OneTracker client valid.
+
+    The session is refreshed by logging in again shortly before it expires, both before requests and, once started, by a background task. Requests rejected with "Invalid API token" are retried once with a new session. Concurrent refreshes are serialized, so a burst of requests only logs in once.
+
+    Args:
+
+    email: The email address of the user.
+
+    password: The password of the user.
+
+    refresh_margin: The number of seconds before expiration at which the session is refreshed.
+
+    retry_interval: The number of seconds the background task waits after a failed refresh, and at least between two refreshes. Failed refreshes are logged and never stop the task.
+
+    background: If True, the background task is started with the first request.
+
+    session_store: The SessionStore sharing sessions with other processes, keyed by email. A saved session that is still fresh is used instead of logging in, and only one process logs in at a time.
+    """
+
+    def __init__(
+        self,
+        email: str,
+        password: str,
+        refresh_margin: float = 3600,
+        retry_interval: float = 60,
+        background: bool = True,
+        session_store: Optional[SessionStore] = None,
+    ) -> None:
+        """Initialize session manager."""
+        if refresh_margin < 0:
+            raise OneTrackerError("Unable to create session manager, refresh_margin must not be negative.")
+        if retry_interval <= 0:
+            raise OneTrackerError("Unable to create session manager, retry_interval must be positive.")
+
+        self.email = email
+        self.password = password
+        self.refresh_margin = datetime.timedelta(seconds=refresh_margin)
+        self.retry_interval = retry_interval
+        self.background = background
+        self.session_store = session_store
+        self._lock = None
+        self._task = None
+
+    def is_fresh(self, session_object: Optional[SessionObject]) -> bool:
+        """
+        Check a session can still be used without refreshing it.
+
+        Args:
+
+        session_object: The session, or None.
+
+        Returns:
+            True if the session expires in more than refresh_margin.
+        """
+        return session_object is not None and session_object.expiration - self.refresh_margin > datetime.datetime.now()
+
+    async def ensure_session(self, onetracker) -> SessionObject:
+        """
+        Refresh the session of a client if it is missing or about to expire.
+
+        Args:
+
+        onetracker: The OneTracker client.
+
+        Returns:
+            SessionObject: The valid session.
+
+        Raises:
+
+        OneTrackerError: If login failed.
+        """
+        if self.background and (self._task is None or self._task.done()):
+            self.start(onetracker)
+        session_object = onetracker.session_object
+        if self.is_fresh(session_object):
+            return session_object
+        return await self.refresh(onetracker, None if session_object is None else session_object.token)
+
+    async def refresh(self, onetracker, stale_token: Optional[str] = None) -> SessionObject:
+        """
+        Log in again, unless another task already replaced the stale session.
+
+        Args:
+
+        onetracker: The OneTracker client.
+
+        stale_token: The token known to be expired or rejected.
+
+        Returns:
+            SessionObject: The new session.
+
+        Raises:
+
+        OneTrackerError: If login failed.
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            session_object = onetracker.session_object
+            if self.__is_replacement__(session_object, stale_token):
+                return session_object
+            if self.session_store is None:
+                await onetracker.login(self.email, self.password)
+                return onetracker.session_object
+
+            loop = asyncio.get_running_loop()
+            session_object = await loop.run_in_executor(None, self.session_store.load, self.email)
+            if self.__is_replacement__(session_object, stale_token):
+                onetracker.session_object = session_object
+                return session_object
+            # Only one waiter per lock blocks a worker thread, so the holder always gets one to load, save and release.
+            async with self.session_store.async_lock(self.email):
+                await loop.run_in_executor(None, self.session_store.acquire, self.email)
+                try:
+                    # Another process or client may have logged in while the lock was awaited.
+                    session_object = await loop.run_in_executor(None, self.session_store.load, self.email)
+                    if self.__is_replacement__(session_object, stale_token):
+                        onetracker.session_object = session_object
+                        return session_object
+                    await onetracker.login(self.email, self.password)
+                    await loop.run_in_executor(None, self.session_store.save, self.email, onetracker.session_object)
+                    return onetracker.session_object
+                finally:
+                    await loop.run_in_executor(None, self.session_store.release, self.email)
+
+    def __is_replacement__(self, session_object: Optional[SessionObject], stale_token: Optional[str]) -> bool:
+        """Check a session is fresh and differs from the stale one. For internal use."""
+        return session_object is not None and session_object.token != stale_token and self.is_fresh(session_object)
+
+    def start(self, onetracker) -> None:
+        """
+        Start refreshing the session of a client in the background.
+
+        Args:
+
+        onetracker: The OneTracker client.
+        """
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self.__refresh_loop__(onetracker))
+
+    async def close(self) -> None:
+        """Stop the background task."""
+        task, self._task = self._task, None
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def __refresh_loop__(self, onetracker) -> None:
+        """Refresh the session refresh_margin before it expires, forever. For internal use."""
+        minimum = 0
+        while True:
+            session_object = onetracker.session_object
+            delay = 0
+            if session_object is not None:
+                delay = (session_object.expiration - self.refresh_margin - datetime.datetime.now()).total_seconds()
+            await asyncio.sleep(max(delay, minimum))
+            minimum = self.retry_interval
+            try:
+                await self.refresh(onetracker, None if session_object is None else session_object.token)
+            except asyncio.CancelledError:
+                raise
+            except OneTrackerError as e:
+                _LOGGER.warning("Unable to refresh session, retrying in %s seconds: %s", self.retry_interval, e)
+            except Exception:
+                # Session store and connection errors must not stop the task for good.
+                _LOGGER.exception("Unable to refresh session, retrying in %s seconds", self.retry_interval)
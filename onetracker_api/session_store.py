@@ -0,0 +1,195 @@
+"""Persistence of authentication sessions, shared between processes."""
+import abc
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import weakref
+from typing import Dict, Hashable, Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+from .models import SessionObject
+
+# The asyncio locks of every store, by event loop.
+_ASYNC_LOCKS = weakref.WeakKeyDictionary()
+
+class SessionStore(abc.ABC):
+    """
+    Base class of session persistence backends used by SessionManager. Backends implement load() and save().
+
+    Sessions are keyed by account, so one store can hold the sessions of many accounts. SessionManager holds the login lock of an account while it logs in and saves the new session, so that only one process logs in at a time, the others picking up the saved session. Methods may block and are run on a worker thread.
+
+    Within one event loop, SessionManager first waits on async_lock(), so that a burst of logins never ties up more than one worker thread per lock waiting in acquire().
+    """
+
+    def __lock_key__(self, key: str) -> Hashable:
+        """Return the key of the lock acquire() takes for an account. For internal use."""
+        return (self, key)
+
+    def async_lock(self, key: str) -> asyncio.Lock:
+        """
+        Get the asyncio lock serializing the logins of an account within the running event loop.
+
+        Args:
+
+        key: The account.
+
+        Returns:
+            The asyncio.Lock, shared by every account and store guarded by the same login lock.
+        """
+        locks = _ASYNC_LOCKS.setdefault(asyncio.get_running_loop(), {})
+        lock_key = self.__lock_key__(key)
+        if lock_key not in locks:
+            locks[lock_key] = asyncio.Lock()
+        return locks[lock_key]
+
+    @abc.abstractmethod
+    def load(self, key: str) -> Optional[SessionObject]:
+        """
+        Load a saved session.
+
+        Args:
+
+        key: The account the session belongs to.
+
+        Returns:
+            The SessionObject, or None if none is saved.
+        """
+
+    @abc.abstractmethod
+    def save(self, key: str, session_object: SessionObject) -> None:
+        """
+        Save a session. Called with the login lock of key held.
+
+        Args:
+
+        key: The account the session belongs to.
+
+        session_object: The session.
+        """
+
+    def acquire(self, key: str) -> None:
+        """
+        Wait until the login lock of an account is held.
+
+        Args:
+
+        key: The account.
+        """
+        pass
+
+    def release(self, key: str) -> None:
+        """
+        Release the login lock of an account.
+
+        Args:
+
+        key: The account.
+        """
+        pass
+
+def _to_dict(session_object: SessionObject) -> Dict[str, object]:
+    """Serialize a session the way the API sends it."""
+    return {"user_id": session_object.user_id, "token": session_object.token, "expiration": session_object.expiration.isoformat()}
+
+class MemorySessionStore(SessionStore):
+    """Session store shared by the clients of one process."""
+
+    def __init__(self) -> None:
+        """Initialize store."""
+        self._sessions: Dict[str, SessionObject] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._guard = threading.Lock()
+
+    def load(self, key: str) -> Optional[SessionObject]:
+        return self._sessions.get(key)
+
+    def save(self, key: str, session_object: SessionObject) -> None:
+        self._sessions[key] = session_object
+
+    def acquire(self, key: str) -> None:
+        with self._guard:
+            lock = self._locks.setdefault(key, threading.Lock())
+        lock.acquire()
+
+    def release(self, key: str) -> None:
+        self._locks[key].release()
+
+class FileSessionStore(SessionStore):
+    """
+    Session store kept in a JSON file, shared by every process using the same path.
+
+    The file is only readable by its owner and is replaced atomically on save. Logins are serialized with an exclusive flock on a "<path>.lock" file, one lock for every account of the file. On platforms without fcntl, logins are only serialized within the process.
+
+    Args:
+
+    path: The path of the sessions file.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Initialize store."""
+        self.path = path
+        self.lock_path = f"{path}.lock"
+        self._threads = threading.Lock()
+        self._lock_file = None
+
+    def __lock_key__(self, key: str) -> Hashable:
+        # Every account, and every store of the same file, shares the lock file.
+        return (FileSessionStore, os.path.abspath(self.lock_path))
+
+    def __read__(self) -> Dict[str, dict]:
+        """Read every saved session. For internal use."""
+        try:
+            with open(self.path, encoding="utf-8") as fp:
+                data = json.load(fp)
+        except (OSError, ValueError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def load(self, key: str) -> Optional[SessionObject]:
+        data = self.__read__().get(key)
+        if not isinstance(data, dict):
+            return None
+        try:
+            return SessionObject.from_dict(data)
+        except (AttributeError, TypeError, ValueError):
+            return None
+
+    def save(self, key: str, session_object: SessionObject) -> None:
+        data = self.__read__()
+        data[key] = _to_dict(session_object)
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temporary_path = tempfile.mkstemp(prefix=".sessions-", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as fp:
+                json.dump(data, fp)
+            os.replace(temporary_path, self.path)
+        except BaseException:
+            os.unlink(temporary_path)
+            raise
+
+    def acquire(self, key: str) -> None:
+        # flock is held per open file, so threads of this process take turns first.
+        self._threads.acquire()
+        try:
+            lock_file = open(self.lock_path, "a")
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        except BaseException:
+            self._threads.release()
+            raise
+        self._lock_file = lock_file
+
+    def release(self, key: str) -> None:
+        lock_file, self._lock_file = self._lock_file, None
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            lock_file.close()
+        finally:
+            self._threads.release()
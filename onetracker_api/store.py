@@ -0,0 +1,139 @@
+"""Persistent SQLite store of parcels."""
+import json
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional
+
+from .exceptions import OneTrackerError
+
+class ParcelStore:
+    """
+    SQLite-backed store of parcel payloads, as returned by the API, keyed by parcel ID.
+
+    A parcel is only rewritten when its time_updated changes, or when it was stored without tracking events, as list_parcels() returns it, and comes with them, as get_parcel() returns it. Every access runs on one dedicated worker thread, so OneTracker can write behind without blocking the event loop while reads always see earlier writes. Use one store per account.
+
+    Args:
+
+    path: The path of the database file, ":memory:" for a store living as long as the process.
+
+    max_age: The number of seconds a stored parcel is served by OneTracker.get_parcel() without a request, None to serve it until the next list_parcels() refreshes it.
+    """
+
+    def __init__(self, path: str = ":memory:", max_age: Optional[float] = None) -> None:
+        """Initialize store."""
+        if max_age is not None and max_age < 0:
+            raise OneTrackerError("Unable to create parcel store, max_age must not be negative.")
+
+        self.path = path
+        self.max_age = max_age
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="onetracker-store")
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS parcels (
+                    id INTEGER PRIMARY KEY,
+                    user_id INTEGER,
+                    is_archived INTEGER NOT NULL,
+                    time_updated TEXT,
+                    stored_at REAL NOT NULL,
+                    data TEXT NOT NULL,
+                    has_events INTEGER NOT NULL DEFAULT 0
+                )
+                """
+            )
+
+    def put(self, parcels: Iterable[Dict[str, Any]]) -> int:
+        """
+        Store parcel payloads, as returned by the API.
+
+        Args:
+
+        parcels: The parcel payloads.
+
+        Returns:
+            The number of parcels written, unchanged parcels excluded.
+        """
+        now = time.time()
+        rows = [
+            (
+                parcel.get("id"),
+                parcel.get("user_id"),
+                1 if parcel.get("is_archived") else 0,
+                parcel.get("time_updated"),
+                now,
+                json.dumps(parcel),
+                0 if parcel.get("tracking_events") is None else 1,
+            )
+            for parcel in parcels
+        ]
+        with self._connection:
+            before = self._connection.total_changes
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO parcels (id, user_id, is_archived, time_updated, stored_at, data, has_events) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._connection.executemany(
+                "UPDATE parcels SET user_id = ?, is_archived = ?, time_updated = ?, stored_at = ?, data = ?, has_events = ?"
+                " WHERE id = ? AND (time_updated IS NOT ? OR (has_events = 0 AND ? = 1))",
+                [
+                    (user_id, is_archived, time_updated, stored_at, data, has_events, id, time_updated, has_events)
+                    for id, user_id, is_archived, time_updated, stored_at, data, has_events in rows
+                ],
+            )
+            written = self._connection.total_changes - before
+            # Parcels that did not change are still fresh.
+            self._connection.executemany("UPDATE parcels SET stored_at = ? WHERE id = ?", [(now, row[0]) for row in rows])
+        return written
+
+    def get(self, id: int, max_age: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Get a stored parcel payload.
+
+        Args:
+
+        id: The id of the parcel.
+
+        max_age: If given, parcels stored more than max_age seconds ago are ignored.
+
+        Returns:
+            The parcel payload, or None if it is not stored or too old.
+        """
+        row = self._connection.execute("SELECT stored_at, data FROM parcels WHERE id = ?", (id,)).fetchone()
+        if row is None or (max_age is not None and time.time() - row[0] > max_age):
+            return None
+        return json.loads(row[1])
+
+    def list(self, archived: Optional[bool] = None) -> List[Dict[str, Any]]:
+        """
+        List stored parcel payloads, ordered by id.
+
+        Args:
+
+        archived: If True or False, only archived or only active parcels are listed. If None, every parcel is.
+
+        Returns:
+            The list of parcel payloads.
+        """
+        if archived is None:
+            rows = self._connection.execute("SELECT data FROM parcels ORDER BY id")
+        else:
+            rows = self._connection.execute("SELECT data FROM parcels WHERE is_archived = ? ORDER BY id", (1 if archived else 0,))
+        return [json.loads(data) for data, in rows]
+
+    def delete(self, id: int) -> None:
+        """
+        Remove a stored parcel.
+
+        Args:
+
+        id: The id of the parcel.
+        """
+        with self._connection:
+            self._connection.execute("DELETE FROM parcels WHERE id = ?", (id,))
+
+    def close(self) -> None:
+        """Wait for pending operations and close the database."""
+        self.executor.shutdown(wait=True)
+        self._connection.close()
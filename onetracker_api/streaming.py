@@ -0,0 +1,121 @@
+"""Incremental parsing of streamed JSON response bodies."""
+import codecs
+import json
+from typing import Any, AsyncIterator, Dict
+
+from .exceptions import OneTrackerError
+
+_WHITESPACE = " \t\n\r"
+
+class _Incomplete(Exception):
+    """More input is needed to parse the next token."""
+
+    pass
+
+class _Buffer:
+    """Text buffer filled from a stream of byte chunks."""
+
+    def __init__(self, chunks: AsyncIterator[bytes]) -> None:
+        self.chunks = chunks.__aiter__()
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.json = json.JSONDecoder()
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    async def fill(self) -> None:
+        """Read the next chunk, dropping the text already consumed."""
+        if self.eof:
+            raise OneTrackerError("Error decoding JSON response", {"message": "Unexpected end of data"})
+        try:
+            chunk = await self.chunks.__anext__()
+        except StopAsyncIteration:
+            self.eof = True
+            chunk = b""
+        self.text = self.text[self.pos:] + self.decoder.decode(chunk, final=self.eof)
+        self.pos = 0
+
+    async def peek(self) -> str:
+        """Return the next non-whitespace character, without consuming it."""
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            await self.fill()
+
+    async def expect(self, character: str) -> None:
+        """Consume the next non-whitespace character, which must be character."""
+        found = await self.peek()
+        if found != character:
+            raise OneTrackerError("Error decoding JSON response", {"message": f"Expected {character!r}, found {found!r}"})
+        self.pos += 1
+
+    async def value(self) -> Any:
+        """Consume and decode the next JSON value."""
+        await self.peek()
+        while True:
+            try:
+                value, end = self.json.raw_decode(self.text, self.pos)
+                # A number or literal ending the buffer may continue in the next chunk.
+                if end == len(self.text) and not self.eof:
+                    raise _Incomplete()
+            except (json.JSONDecodeError, _Incomplete) as exception:
+                if self.eof:
+                    raise OneTrackerError("Error decoding JSON response", {"message": getattr(exception, "msg", "Unexpected end of data")})
+                await self.fill()
+                continue
+            self.pos = end
+            return value
+
+async def iter_json_array(chunks: AsyncIterator[bytes], key: str, members: Dict[str, Any]) -> AsyncIterator[Any]:
+    """
+    Decode the items of an array member of a streamed JSON object one at a time.
+
+    Only one item, plus the chunk being read, is held in memory at once.
+
+    Args:
+
+    chunks: The response body, as an async iterator of byte chunks.
+
+    key: The name of the top-level member holding the array. A null member is treated as an empty array.
+
+    members: Dictionary filled with the other top-level members as they are decoded.
+
+    Yields:
+        The decoded array items.
+
+    Raises:
+
+    OneTrackerError: If the body is not a valid JSON object.
+    """
+    buffer = _Buffer(chunks)
+    await buffer.expect("{")
+    if await buffer.peek() == "}":
+        buffer.pos += 1
+        return
+
+    while True:
+        name = await buffer.value()
+        if type(name) is not str:
+            raise OneTrackerError("Error decoding JSON response", {"message": "Expected an object key"})
+        await buffer.expect(":")
+
+        if name == key and await buffer.peek() == "[":
+            buffer.pos += 1
+            if await buffer.peek() == "]":
+                buffer.pos += 1
+            else:
+                while True:
+                    yield await buffer.value()
+                    if await buffer.peek() == "]":
+                        buffer.pos += 1
+                        break
+                    await buffer.expect(",")
+        else:
+            members[name] = await buffer.value()
+
+        if await buffer.peek() == "}":
+            buffer.pos += 1
+            return
+        await buffer.expect(",")
@@ -0,0 +1,148 @@
+"""Incremental synchronization of the parcels of OneTracker accounts."""
+import asyncio
+from typing import Dict, Optional, Set, Tuple
+
+from .exceptions import OneTrackerError
+from .models import Parcel, SyncDelta, _parse_timestamp
+from .retry import RetryPolicy
+
+class _AccountState:
+    """What the previous syncs of one account have seen."""
+
+    __slots__ = ("watermark", "parcels", "events")
+
+    def __init__(self) -> None:
+        self.watermark = None
+        # Parcel ID to (time_updated as sent by the API, Parcel).
+        self.parcels: Dict[int, Tuple[Optional[str], Parcel]] = {}
+        # Parcel ID to the IDs of the tracking events already reported.
+        self.events: Dict[int, Set[int]] = {}
+
+class ParcelSync:
+    """
+    Incremental synchronization of the parcels listed by a OneTracker client.
+
+    Each sync() lists the parcels as raw JSON and compares their time_updated with the previous sync of the same account, so only the parcels that changed are decoded into Parcel objects. State is kept per account, keyed by the user ID of the client's session.
+
+    Args:
+
+    onetracker: The OneTracker client.
+
+    archived: If True, archived parcels are synced as well.
+
+    fetch_events: If True, added and changed parcels are requested with get_parcels() to report their new tracking events, as listed parcels carry none. If False, only the tracking events included in the listing are reported.
+
+    concurrency: The maximum number of parcels requested at the same time when fetching tracking events.
+    """
+
+    def __init__(self, onetracker, archived: bool = False, fetch_events: bool = True, concurrency: int = 10) -> None:
+        """Initialize sync."""
+        if type(concurrency) is not int or concurrency < 1:
+            raise OneTrackerError("Unable to create parcel sync, concurrency must be a positive int.")
+
+        self.onetracker = onetracker
+        self.archived = archived
+        self.fetch_events = fetch_events
+        self.concurrency = concurrency
+        self._accounts: Dict[int, _AccountState] = {}
+        self._lock = None
+
+    def watermark(self, user_id: Optional[int] = None):
+        """
+        Get the watermark of an account.
+
+        Args:
+
+        user_id: The user ID of the account. Defaults to the account of the client's session.
+
+        Returns:
+            The latest time_updated seen for the account, or None if it was never synced.
+        """
+        state = self._accounts.get(self.__user_id__(user_id))
+        return None if state is None else state.watermark
+
+    def reset(self, user_id: Optional[int] = None) -> None:
+        """
+        Forget what was synced, so the next sync() reports every parcel as added.
+
+        Args:
+
+        user_id: The user ID of the account. If None, every account is reset.
+        """
+        if user_id is None:
+            self._accounts.clear()
+        else:
+            self._accounts.pop(user_id, None)
+
+    def __user_id__(self, user_id: Optional[int]) -> Optional[int]:
+        """Default user_id to the account of the client's session. For internal use."""
+        if user_id is None and self.onetracker.session_object is not None:
+            return self.onetracker.session_object.user_id
+        return user_id
+
+    async def sync(self, retry_policy: RetryPolicy = None) -> SyncDelta:
+        """
+        List the parcels of the client's account and compute what changed since the previous sync.
+
+        Args:
+
+        retry_policy: The RetryPolicy for this sync's requests, overriding the client's retry policy.
+
+        Returns:
+            SyncDelta: Sync Delta Object.
+
+        Raises:
+
+        OneTrackerError: If listing the parcels failed. The sync state is left untouched.
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            results = await self.onetracker.list_parcels(archived=self.archived, retry_policy=retry_policy, raw=True)
+            state = self._accounts.setdefault(self.onetracker.session_object.user_id, _AccountState())
+
+            listed = {}
+            updated = {}
+            for data in results.get("parcels") or []:
+                id = data.get("id")
+                listed[id] = data
+                previous = state.parcels.get(id)
+                if previous is None or previous[0] != data.get("time_updated"):
+                    updated[id] = data
+
+            removed = [id for id in state.parcels if id not in listed]
+            parcels = {}
+            errors = {}
+            if self.fetch_events:
+                # Fetched parcels replace the listed ones, which are never decoded.
+                if updated:
+                    response = await self.onetracker.get_parcels(updated, concurrency=self.concurrency, retry_policy=retry_policy)
+                    errors = response.errors
+                    parcels = {id: response.parcels[id] for id in updated if id in response.parcels}
+            else:
+                try:
+                    for id, data in updated.items():
+                        parcels[id] = Parcel.from_dict(data)
+                except OneTrackerError as e:
+                    raise OneTrackerError(f"Unable to sync parcels: {e}")
+
+            added = []
+            changed = []
+            events = {}
+            for id, parcel in parcels.items():
+                (changed if id in state.parcels else added).append(parcel)
+                state.parcels[id] = (updated[id].get("time_updated"), parcel)
+                known = state.events.setdefault(id, set())
+                new_events = [event for event in parcel.tracking_events or () if event.id not in known]
+                if new_events:
+                    known.update(event.id for event in new_events)
+                    events[id] = new_events
+                timestamp = _parse_timestamp(updated[id].get("time_updated"))
+                if timestamp is not None and (state.watermark is None or timestamp > state.watermark):
+                    state.watermark = timestamp
+            for id in removed:
+                del state.parcels[id]
+                state.events.pop(id, None)
+
+            return SyncDelta(added=added, changed=changed, removed=removed, events=events, errors=errors, watermark=state.watermark)
@@ -37,6 +37,7 @@ setup(
         "Topic :: Software Development :: Libraries :: Python Modules",
     ],
     description="Asynchronous Python client for OneTracker.",
+    extras_require={"fast": ["orjson"]},
     include_package_data=True,
     version=get_version(),
     install_requires=[val.strip() for val in open("requirements.txt")],
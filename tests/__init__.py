@@ -1,9 +1,16 @@
 """Test suite for OneTracker-API."""
+import datetime
 import os
 
+from onetracker_api.models import SessionObject
+
 
 def load_fixture(filename):
     """Load a fixture."""
     path = os.path.join(os.path.dirname(__file__), "fixtures", filename)
     with open(path) as fptr:
         return fptr.read()
+
+def make_session_object(token="eP0FUZhN76Wu7igUkCPigR2wEMBDtzaW", expires_in=datetime.timedelta(days=30), user_id=156):
+    """Build a session object, valid for 30 days by default."""
+    return SessionObject.from_dict({"user_id": user_id, "token": token, "expiration": (datetime.datetime.now() + expires_in).strftime('%Y-%m-%dT%H:%M:%S.%f%z')})
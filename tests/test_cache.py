@@ -0,0 +1,72 @@
+"""Tests for OneTracker-API Caches."""
+import pytest
+
+from onetracker_api import TTLCache, OneTrackerError
+
+class FakeTimer:
+    """Manually advanced clock."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_get_set() -> None:
+    """Test caching values."""
+    cache = TTLCache(maxsize=2, ttl=None)
+    assert cache.get("a") is None
+    assert cache.get("a", "missing") == "missing"
+    cache.set("a", 1)
+    cache.set(None, 2)
+    assert cache.get("a") == 1
+    assert cache.get(None) == 2
+    assert "a" in cache
+    assert len(cache) == 2
+
+def test_ttl_expiry() -> None:
+    """Test entries expire after their time to live."""
+    timer = FakeTimer()
+    cache = TTLCache(maxsize=10, ttl=60, timer=timer)
+    cache.set("a", 1)
+    timer.now = 59
+    assert cache.get("a") == 1
+    timer.now = 60
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+def test_lru_eviction() -> None:
+    """Test the least recently used entry is evicted first."""
+    cache = TTLCache(maxsize=2, ttl=None)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert "a" in cache
+    assert "b" not in cache
+    assert "c" in cache
+
+def test_invalidate_and_clear() -> None:
+    """Test explicit invalidation."""
+    cache = TTLCache()
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.invalidate("a")
+    cache.invalidate("missing")
+    assert "a" not in cache
+    assert "b" in cache
+    cache.clear()
+    assert len(cache) == 0
+
+def test_disabled_cache() -> None:
+    """Test a cache of size 0 never stores anything."""
+    cache = TTLCache(maxsize=0)
+    cache.set("a", 1)
+    assert cache.get("a") is None
+
+def test_invalid_cache() -> None:
+    """Test invalid cache arguments."""
+    with pytest.raises(OneTrackerError):
+        TTLCache(maxsize=-1)
+    with pytest.raises(OneTrackerError):
+        TTLCache(ttl=0)
@@ -0,0 +1,125 @@
+"""Tests for OneTracker-API Cassette."""
+import gzip
+import json
+
+import pytest
+
+from onetracker_api import Cassette, OneTracker, OneTrackerError
+
+from . import load_fixture, make_session_object
+
+MATCH_HOST = "api.onetracker.app"
+
+def add_responses(aresponses) -> None:
+    """Stub the list parcels and get parcel endpoints."""
+    aresponses.add(
+        MATCH_HOST,
+        "/parcels",
+        "GET",
+        aresponses.Response(status=200, headers={"Content-Type": "application/json"}, text=load_fixture("list_parcels.json")),
+        match_querystring=False,
+    )
+    aresponses.add(
+        MATCH_HOST,
+        "/parcels/938",
+        "GET",
+        aresponses.Response(status=200, headers={"Content-Type": "application/json", "X-Recorded": "yes"}, text=load_fixture("get_parcel.json")),
+    )
+
+async def record(path, aresponses, **options) -> None:
+    """Record a list parcels and a get parcel call."""
+    add_responses(aresponses)
+    with Cassette(path, mode="record", **options) as cassette:
+        async with OneTracker(session_object=make_session_object(), cassette=cassette) as onetracker:
+            await onetracker.list_parcels()
+            await onetracker.get_parcel(938)
+
+@pytest.mark.asyncio
+async def test_record_and_replay(aresponses, tmp_path) -> None:
+    """Test recorded responses are replayed without any connection."""
+    path = str(tmp_path / "cassette.jsonl.gz")
+    await record(path, aresponses)
+
+    with gzip.open(path, "rt") as fptr:
+        interactions = [json.loads(line) for line in fptr]
+    assert [(interaction["method"], interaction["url"], interaction["status"]) for interaction in interactions] == [
+        ("GET", "/parcels?archived=false", 200),
+        ("GET", "/parcels/938", 200),
+    ]
+    assert ["X-Recorded", "yes"] in interactions[1]["headers"]
+    # Request headers, and the session token they hold, are not recorded.
+    assert "token" not in json.dumps(interactions)
+
+    cassette = Cassette(path)
+    async with OneTracker(session_object=make_session_object(), cassette=cassette) as onetracker:
+        onetracker.host = "replay.invalid"
+        parcels = await onetracker.list_parcels()
+        parcel = await onetracker.get_parcel(938)
+        assert onetracker._session is None
+    assert len(parcels.parcels) == len(json.loads(load_fixture("list_parcels.json"))["parcels"])
+    assert parcel.parcel.id == 938
+    assert parcel.parcel.tracking_events
+
+@pytest.mark.asyncio
+async def test_replay_order_and_repeats(aresponses, tmp_path) -> None:
+    """Test responses to the same request are replayed in order, the last one repeating."""
+    path = str(tmp_path / "cassette.jsonl.gz")
+    for text in ('{"message": "first"}', '{"message": "second"}'):
+        aresponses.add(MATCH_HOST, "/carriers", "GET", aresponses.Response(status=200, headers={"Content-Type": "application/json"}, text=text))
+    with Cassette(path, mode="record") as cassette:
+        async with OneTracker(cassette=cassette) as onetracker:
+            assert (await onetracker._request("/carriers"))["message"] == "first"
+            assert (await onetracker._request("/carriers"))["message"] == "second"
+
+    async with OneTracker(cassette=Cassette(path)) as onetracker:
+        messages = [(await onetracker._request("/carriers"))["message"] for _ in range(3)]
+    assert messages == ["first", "second", "second"]
+
+    cassette = Cassette(path, allow_repeats=False)
+    async with OneTracker(cassette=cassette) as onetracker:
+        await onetracker._request("/carriers")
+        await onetracker._request("/carriers")
+        with pytest.raises(OneTrackerError):
+            await onetracker._request("/carriers")
+        with pytest.raises(OneTrackerError):
+            await onetracker._request("/parcels")
+        cassette.rewind()
+        assert (await onetracker._request("/carriers"))["message"] == "first"
+
+@pytest.mark.asyncio
+async def test_replay_speed(aresponses, tmp_path, monkeypatch) -> None:
+    """Test responses are delayed by their recorded time divided by speed."""
+    path = str(tmp_path / "cassette.jsonl.gz")
+    clock = iter([0.0, 10.0, 12.0, 20.0, 21.0])
+    await record(path, aresponses, timer=lambda: next(clock))
+
+    delays = []
+    async def sleep(delay):
+        delays.append(delay)
+    monkeypatch.setattr("onetracker_api.cassette.asyncio.sleep", sleep)
+
+    async with OneTracker(session_object=make_session_object(), cassette=Cassette(path, speed=4)) as onetracker:
+        await onetracker.list_parcels()
+        await onetracker.get_parcel(938)
+    assert delays == [0.5, 0.25]
+
+    async with OneTracker(session_object=make_session_object(), cassette=Cassette(path)) as onetracker:
+        await onetracker.list_parcels()
+    assert delays == [0.5, 0.25]
+
+@pytest.mark.asyncio
+async def test_replay_stream(aresponses, tmp_path) -> None:
+    """Test streamed responses are replayed."""
+    path = str(tmp_path / "cassette.jsonl.gz")
+    await record(path, aresponses)
+
+    async with OneTracker(session_object=make_session_object(), cassette=Cassette(path)) as onetracker:
+        ids = [parcel.id async for parcel in onetracker.iter_parcels()]
+    assert ids == [parcel["id"] for parcel in json.loads(load_fixture("list_parcels.json"))["parcels"]]
+
+def test_invalid_arguments(tmp_path) -> None:
+    """Test invalid arguments are rejected."""
+    with pytest.raises(OneTrackerError):
+        Cassette(str(tmp_path / "cassette.jsonl.gz"), mode="append")
+    with pytest.raises(OneTrackerError):
+        Cassette(str(tmp_path / "cassette.jsonl.gz"), mode="record", speed=0)
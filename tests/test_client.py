@@ -1,11 +1,15 @@
 """Tests for OneTracker-API Client."""
 import asyncio
+import os
+import ssl
 import pytest
 
-from aiohttp import ClientSession, ClientError
+from aiohttp import ClientSession, ClientError, web
 
 from onetracker_api import (
     Client,
+    TTLCache,
+    create_connector,
     OneTrackerError,
     OneTrackerConnectionError,
     OneTrackerInternalServerError,
@@ -173,4 +177,234 @@ async def test_malformed_json(aresponses):
     async with ClientSession() as session:
         client = Client(session=session)
         with pytest.raises(OneTrackerError):
-            assert await client._request("/auth/token", "POST", {"email": "", "password": ""})
\ No newline at end of file
+            assert await client._request("/auth/token", "POST", {"email": "", "password": ""})
+
+@pytest.mark.asyncio
+async def test_internal_session_connector_settings(aresponses):
+    """Test the internal session uses the configured connection pool."""
+    aresponses.add(
+        MATCH_HOST,
+        "/carriers",
+        "GET",
+        aresponses.Response(
+            status=200,
+            headers={"Content-Type": "application/json"},
+            text='{"message": "ok", "carriers": []}',
+        ),
+    )
+
+    async with Client(limit=5, limit_per_host=2, keepalive_timeout=30, ttl_dns_cache=300) as client:
+        response = await client._request("/carriers")
+        assert response.get("message") == "ok"
+        connector = client._session.connector
+        assert connector.limit == 5
+        assert connector.limit_per_host == 2
+    assert connector.closed
+
+@pytest.mark.asyncio
+async def test_shared_connector(aresponses):
+    """Test a shared connector is reused and left open by its clients."""
+    for _ in range(2):
+        aresponses.add(
+            MATCH_HOST,
+            "/carriers",
+            "GET",
+            aresponses.Response(
+                status=200,
+                headers={"Content-Type": "application/json"},
+                text='{"message": "ok", "carriers": []}',
+            ),
+        )
+
+    connector = create_connector(limit=10)
+    async with Client(connector=connector) as first, Client(connector=connector) as second:
+        assert (await first._request("/carriers")).get("message") == "ok"
+        assert (await second._request("/carriers")).get("message") == "ok"
+        assert first._session.connector is connector
+        assert second._session.connector is connector
+    assert not connector.closed
+    await connector.close()
+
+@pytest.mark.asyncio
+async def test_coalesce_identical_get_requests(aresponses):
+    """Test concurrent identical GET requests share one upstream request."""
+    calls = []
+
+    async def response_handler(request):
+        calls.append(request.headers.get("x-api-token"))
+        await asyncio.sleep(0.1)
+        return aresponses.Response(
+            status=200,
+            headers={"Content-Type": "application/json"},
+            text='{"message": "ok", "carriers": []}',
+        )
+
+    aresponses.add(MATCH_HOST, "/carriers", "GET", response_handler, repeat=aresponses.INFINITY)
+
+    async with ClientSession() as session:
+        client = Client(session=session)
+        responses = await asyncio.gather(
+            client._request("/carriers", headers={"x-api-token": "a"}),
+            client._request("/carriers", headers={"x-api-token": "a"}),
+            client._request("/carriers", headers={"x-api-token": "a"}),
+            client._request("/carriers", headers={"x-api-token": "b"}),
+        )
+        assert responses[0] is responses[1] is responses[2]
+        assert responses[3] is not responses[0]
+        assert sorted(calls) == ["a", "b"]
+        assert not client._inflight
+
+        await client._request("/carriers", headers={"x-api-token": "a"})
+        assert len(calls) == 3
+
+@pytest.mark.asyncio
+async def test_coalesce_requests_disabled(aresponses):
+    """Test GET requests are all sent when coalescing is disabled."""
+    calls = []
+
+    async def response_handler(request):
+        calls.append(request)
+        await asyncio.sleep(0.05)
+        return aresponses.Response(
+            status=200,
+            headers={"Content-Type": "application/json"},
+            text='{"message": "ok", "carriers": []}',
+        )
+
+    aresponses.add(MATCH_HOST, "/carriers", "GET", response_handler, repeat=aresponses.INFINITY)
+
+    async with ClientSession() as session:
+        client = Client(session=session, coalesce_requests=False)
+        await asyncio.gather(client._request("/carriers"), client._request("/carriers"))
+        assert len(calls) == 2
+
+@pytest.mark.asyncio
+async def test_coalesce_shares_errors(aresponses):
+    """Test every waiter of a coalesced request receives its error."""
+    async def response_handler(_):
+        await asyncio.sleep(0.05)
+        return aresponses.Response(
+            status=500,
+            headers={"Content-Type": "application/json"},
+            text='{"message":"Internal server error."}',
+        )
+
+    aresponses.add(MATCH_HOST, "/carriers", "GET", response_handler)
+
+    async with ClientSession() as session:
+        client = Client(session=session)
+        results = await asyncio.gather(
+            client._request("/carriers"),
+            client._request("/carriers"),
+            return_exceptions=True,
+        )
+        assert all(isinstance(result, OneTrackerInternalServerError) for result in results)
+
+@pytest.mark.asyncio
+async def test_conditional_requests(aresponses):
+    """Test repeated GET requests are revalidated with the stored validators."""
+    seen = []
+
+    async def response_handler(request):
+        seen.append((request.headers.get("If-None-Match"), request.headers.get("If-Modified-Since")))
+        if request.headers.get("If-None-Match") == '"v1"':
+            return aresponses.Response(status=304, headers={"ETag": '"v1"'})
+        return aresponses.Response(
+            status=200,
+            headers={"Content-Type": "application/json", "ETag": '"v1"', "Last-Modified": "Sat, 18 Aug 2018 20:01:23 GMT"},
+            text='{"message": "ok", "carriers": []}',
+        )
+
+    aresponses.add(MATCH_HOST, "/carriers", "GET", response_handler, repeat=aresponses.INFINITY)
+
+    async with ClientSession() as session:
+        client = Client(session=session, validator_cache=TTLCache(maxsize=16))
+        first = await client._request("/carriers", headers={"x-api-token": "a"})
+        second = await client._request("/carriers", headers={"x-api-token": "a"})
+        other_token = await client._request("/carriers", headers={"x-api-token": "b"})
+        assert first == {"message": "ok", "carriers": []}
+        assert second is first
+        assert other_token is not first
+        assert seen == [(None, None), ('"v1"', "Sat, 18 Aug 2018 20:01:23 GMT"), (None, None)]
+
+        decoded = client._decode(second, dict)
+        assert client._decode(first, dict) is decoded
+        assert client._decode({"message": "ok"}, dict) is not client._decode({"message": "ok"}, dict)
+
+@pytest.mark.asyncio
+async def test_conditional_requests_disabled(aresponses):
+    """Test no validators are sent without a validator cache, the default, or with an empty one."""
+    seen = []
+
+    async def response_handler(request):
+        seen.append(request.headers.get("If-None-Match"))
+        return aresponses.Response(
+            status=200,
+            headers={"Content-Type": "application/json", "ETag": '"v1"'},
+            text='{"message": "ok", "carriers": []}',
+        )
+
+    aresponses.add(MATCH_HOST, "/carriers", "GET", response_handler, repeat=aresponses.INFINITY)
+
+    async with ClientSession() as session:
+        for client in (Client(session=session), Client(session=session, validator_cache=TTLCache(maxsize=0))):
+            await client._request("/carriers")
+            await client._request("/carriers")
+        assert seen == [None, None, None, None]
+
+@pytest.mark.asyncio
+async def test_port(aresponses):
+    """Test requests are sent to the configured port."""
+    aresponses.add(
+        f"{MATCH_HOST}:8080",
+        "/carriers",
+        "GET",
+        aresponses.Response(status=200, headers={"Content-Type": "application/json"}, text='{"message": "ok"}'),
+    )
+
+    async with Client() as client:
+        client.scheme = "http"
+        client.port = 8080
+        assert str(client._build_request("/carriers", None)[0]) == "http://api.onetracker.app:8080/carriers"
+        response = await client._request("/carriers")
+        assert response == {"message": "ok"}
+
+@pytest.mark.asyncio
+async def test_certificates_verified():
+    """Test the default and shared connectors verify server certificates."""
+    certificate = os.path.join(os.path.dirname(__file__), "fixtures", "self_signed.pem")
+    server_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    server_context.load_cert_chain(certificate)
+    async def carriers(request):
+        return web.json_response({"message": "ok"})
+
+    app = web.Application()
+    app.router.add_get("/carriers", carriers)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0, ssl_context=server_context)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    def make_client(**options):
+        client = Client(**options)
+        client.host = "127.0.0.1"
+        client.port = port
+        return client
+
+    try:
+        async with make_client() as client:
+            with pytest.raises(OneTrackerConnectionError):
+                await client._request("/carriers")
+
+        connector = create_connector()
+        async with make_client(connector=connector) as client:
+            with pytest.raises(OneTrackerConnectionError):
+                await client._request("/carriers")
+        await connector.close()
+
+        # Trusting the certificate lets the same request through.
+        async with make_client(ssl_context=ssl.create_default_context(cafile=certificate)) as client:
+            assert await client._request("/carriers") == {"message": "ok"}
+    finally:
+        await runner.cleanup()
@@ -0,0 +1,110 @@
+"""Tests for OneTracker-API JSON Codecs."""
+import json
+import pytest
+
+from aiohttp import ClientSession
+
+from onetracker_api import (
+    Client,
+    JSONCodec,
+    get_codec,
+    OneTrackerError,
+    OneTrackerClientError,
+)
+
+MATCH_HOST = "api.onetracker.app"
+
+def test_get_codec() -> None:
+    """Test selecting codecs by name."""
+    codec = get_codec("json")
+    assert codec.name == "json"
+    assert codec.loads(b'{"message": "ok"}') == {"message": "ok"}
+    assert json.loads(codec.dumps({"email": "demo@onetracker.app"})) == {"email": "demo@onetracker.app"}
+    assert get_codec().name in ("orjson", "ujson", "json")
+
+def test_get_unknown_codec() -> None:
+    """Test unknown codecs are rejected."""
+    with pytest.raises(OneTrackerError):
+        get_codec("simplejson")
+
+@pytest.mark.parametrize("name", ["orjson", "ujson", "json"])
+def test_codec_backends(name) -> None:
+    """Test every installed backend encodes to str and rejects malformed JSON."""
+    try:
+        codec = get_codec(name)
+    except OneTrackerError:
+        pytest.skip(f"{name} is not installed")
+
+    assert codec.loads(b'{"latitude": 35.149536, "name": "Colis Priv\\u00e9"}') == {"latitude": 35.149536, "name": "Colis Privé"}
+    assert type(codec.dumps({"password": "P@S5W0RD!"})) == str
+    with pytest.raises(codec.decode_errors):
+        codec.loads(b"not_json")
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("name", ["orjson", "ujson", "json"])
+async def test_client_codec_malformed_json(aresponses, name):
+    """Test malformed JSON raises OneTrackerError whatever the backend."""
+    try:
+        codec = get_codec(name)
+    except OneTrackerError:
+        pytest.skip(f"{name} is not installed")
+
+    aresponses.add(
+        MATCH_HOST,
+        "/carriers",
+        "GET",
+        aresponses.Response(
+            status=200,
+            headers={"Content-Type": "application/json"},
+            text='not_json',
+        ),
+    )
+
+    async with ClientSession() as session:
+        client = Client(session=session, json_codec=codec)
+        with pytest.raises(OneTrackerError):
+            await client._request("/carriers")
+
+@pytest.mark.asyncio
+async def test_client_custom_codec(aresponses):
+    """Test a custom codec decodes responses."""
+    decoded = []
+
+    def loads(body):
+        decoded.append(body)
+        return json.loads(body)
+
+    aresponses.add(
+        MATCH_HOST,
+        "/carriers",
+        "GET",
+        aresponses.Response(
+            status=200,
+            headers={"Content-Type": "application/json"},
+            text='{"message": "ok", "carriers": []}',
+        ),
+    )
+
+    async with ClientSession() as session:
+        client = Client(session=session, json_codec=JSONCodec("custom", loads, json.dumps))
+        assert await client._request("/carriers") == {"message": "ok", "carriers": []}
+        assert decoded == [b'{"message": "ok", "carriers": []}']
+
+@pytest.mark.asyncio
+async def test_client_error_without_json(aresponses):
+    """Test error responses without a JSON body still raise the matching exception."""
+    aresponses.add(
+        MATCH_HOST,
+        "/carriers",
+        "GET",
+        aresponses.Response(
+            status=404,
+            headers={"Content-Type": "text/plain"},
+            text='404 page not found',
+        ),
+    )
+
+    async with ClientSession() as session:
+        client = Client(session=session, json_codec="json")
+        with pytest.raises(OneTrackerClientError):
+            await client._request("/carriers")
@@ -0,0 +1,102 @@
+"""Tests for OneTracker-API Instrumentation."""
+import json
+
+import pytest
+from aiohttp import ClientSession
+from yarl import URL
+
+from onetracker_api import Histogram, Instrumentation, OneTracker, OneTrackerClientError, RequestTiming
+from onetracker_api.instrumentation import get_endpoint
+
+from . import load_fixture, make_session_object
+
+MATCH_HOST = "api.onetracker.app"
+
+def test_get_endpoint() -> None:
+    """Test endpoints drop the query and numeric IDs."""
+    assert get_endpoint(URL("https://api.onetracker.app/parcels?archived=false")) == "/parcels"
+    assert get_endpoint(URL("https://api.onetracker.app/parcels/938")) == "/parcels/{id}"
+    assert get_endpoint(URL("https://api.onetracker.app/carriers?trackingID=123")) == "/carriers"
+
+def test_histogram() -> None:
+    """Test observations are bucketed cumulatively."""
+    histogram = Histogram(buckets=(0.1, 1.0))
+    assert histogram.quantile("a", 0.5) is None
+    for seconds in (0.05, 0.05, 0.5, 2.0):
+        histogram.observe("a", seconds)
+    snapshot = histogram.snapshot()["a"]
+    assert snapshot["buckets"] == [(0.1, 2), (1.0, 3), (float("inf"), 4)]
+    assert snapshot["count"] == 4
+    assert snapshot["sum"] == pytest.approx(2.6)
+    assert histogram.quantile("a", 0.5) == pytest.approx(0.1)
+    assert histogram.quantile("a", 0.75) == pytest.approx(1.0)
+    assert histogram.quantile("a", 1.0) == 1.0
+    histogram.clear()
+    assert histogram.snapshot() == {}
+
+@pytest.mark.asyncio
+async def test_request_phases(aresponses):
+    """Test phases of requests are recorded, building the returned objects included."""
+    aresponses.add(
+        MATCH_HOST,
+        "/parcels",
+        "GET",
+        aresponses.Response(
+            status=200,
+            headers={"Content-Type": "application/json"},
+            text=load_fixture("list_parcels.json"),
+        ),
+    )
+    aresponses.add(
+        MATCH_HOST,
+        "/parcels/938",
+        "GET",
+        aresponses.Response(
+            status=404,
+            headers={"Content-Type": "application/json"},
+            text=json.dumps({"message": "Parcel not found"}),
+        ),
+    )
+
+    timings = []
+    instrumentation = Instrumentation(hooks=[timings.append])
+    async with OneTracker(session_object=make_session_object(), instrumentation=instrumentation) as onetracker:
+        await onetracker.list_parcels()
+        with pytest.raises(OneTrackerClientError):
+            await onetracker.get_parcel(938)
+
+    listed, failed = timings
+    assert isinstance(listed, RequestTiming)
+    assert (listed.method, listed.endpoint, listed.status, listed.error) == ("GET", "/parcels", 200, None)
+    assert {"connect", "first_byte", "read", "decode", "build"} <= set(listed.phases)
+    assert listed.total >= listed.phases["first_byte"]
+    assert (failed.endpoint, failed.status, failed.error) == ("/parcels/{id}", 404, "OneTrackerClientError")
+    assert "build" not in failed.phases
+
+    snapshot = instrumentation.histogram.snapshot()
+    assert snapshot[("/parcels", "total")]["count"] == 1
+    assert snapshot[("/parcels", "build")]["count"] == 1
+    assert snapshot[("/parcels/{id}", "total")]["count"] == 1
+    aresponses.assert_all_requests_matched()
+
+@pytest.mark.asyncio
+async def test_passed_session(aresponses):
+    """Test requests sent with a session passed to the client are timed from the response on."""
+    aresponses.add(
+        MATCH_HOST,
+        "/parcels",
+        "GET",
+        aresponses.Response(
+            status=200,
+            headers={"Content-Type": "application/json"},
+            text=load_fixture("list_parcels.json"),
+        ),
+    )
+
+    timings = []
+    async with ClientSession() as session:
+        onetracker = OneTracker(session=session, session_object=make_session_object(), instrumentation=Instrumentation(hooks=[timings.append], histogram=None))
+        await onetracker._request("/parcels", headers={"x-api-token": "token"})
+    assert len(timings) == 1
+    assert set(timings[0].phases) == {"read", "decode"}
+    aresponses.assert_all_requests_matched()
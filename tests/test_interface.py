@@ -1,12 +1,14 @@
 """Tests for OneTracker Interface."""
+import json
 import pytest
 import datetime
 from datetime import timedelta
 from aiohttp import ClientSession
-from onetracker_api import OneTracker, OneTrackerError
+from onetracker_api import OneTracker, OneTrackerError, ParcelStore, SessionManager, TTLCache
 
 from onetracker_api import (
     OneTrackerError,
+    OneTrackerClientError,
     OneTrackerAuthenticationError,
     OneTrackerAuthenticationSessionError,
     OneTrackerAuthenticationSessionExpiredError,
@@ -18,6 +20,7 @@ from onetracker_api.models import  (
     Parcel,
     ListParcelsResponse,
     GetParcelResponse,
+    GetParcelsResponse,
     DeleteParcelResponse,
     ListCarriersResponse,
 )
@@ -550,3 +553,348 @@ async def test_list_carriers_tracking_id_int(aresponses):
         onetracker = OneTracker(session=session, session_object=session_object)
         with pytest.raises(OneTrackerError):
             await onetracker.list_carriers(tracking_id=1)
+
+@pytest.mark.asyncio
+async def test_get_parcels(aresponses):
+    """Test get parcels with partial failures."""
+    aresponses.add(
+        MATCH_HOST,
+        "/parcels/174",
+        "GET",
+        aresponses.Response(
+            status=200,
+            headers={"Content-Type": "application/json"},
+            text=load_fixture("get_parcel.json"),
+        ),
+    )
+    aresponses.add(
+        MATCH_HOST,
+        "/parcels/175",
+        "GET",
+        aresponses.Response(
+            status=404,
+            headers={"Content-Type": "application/json"},
+            text='{"message":"Parcel not found for this user"}',
+        ),
+    )
+
+    async with ClientSession() as session:
+        session_object = SessionObject.from_dict({"user_id": 156, "token": "eP0FUZhN76Wu7igUkCPigR2wEMBDtzaW", "expiration": (datetime.date.today() + timedelta(days=30)).strftime('%Y-%m-%dT%H:%M:%S.%f%z')})
+        onetracker = OneTracker(session=session, session_object=session_object)
+        response = await onetracker.get_parcels([174, 175, 174], concurrency=2)
+        assert type(response) == GetParcelsResponse
+        assert list(response.parcels) == [174]
+        assert type(response.parcels[174]) == Parcel
+        assert response.parcels[174].id == 938
+        assert list(response.errors) == [175]
+        assert isinstance(response.errors[175], OneTrackerClientError)
+
+@pytest.mark.asyncio
+async def test_get_parcels_invalid_concurrency():
+    """Test get parcels with an invalid concurrency."""
+    async with ClientSession() as session:
+        session_object = SessionObject.from_dict({"user_id": 156, "token": "eP0FUZhN76Wu7igUkCPigR2wEMBDtzaW", "expiration": (datetime.date.today() + timedelta(days=30)).strftime('%Y-%m-%dT%H:%M:%S.%f%z')})
+        onetracker = OneTracker(session=session, session_object=session_object)
+        with pytest.raises(OneTrackerError):
+            await onetracker.get_parcels([174], concurrency=0)
+        with pytest.raises(OneTrackerError):
+            await onetracker.get_parcels(["174"])
+        with pytest.raises(OneTrackerError):
+            await onetracker.get_parcels([[174]])
+
+@pytest.mark.asyncio
+async def test_get_parcels_checks_before_login(aresponses):
+    """Test get parcels rejects invalid arguments without logging in."""
+    async with ClientSession() as session:
+        onetracker = OneTracker(session=session, session_manager=SessionManager("email", "password", background=False))
+        with pytest.raises(OneTrackerError, match="concurrency"):
+            await onetracker.get_parcels([174], concurrency=0)
+        with pytest.raises(OneTrackerError, match="id must be an int"):
+            await onetracker.get_parcels([{"id": 174}])
+        assert onetracker.session_object is None
+    assert len(aresponses.history) == 0
+
+@pytest.mark.asyncio
+async def test_get_parcels_malformed_response(aresponses):
+    """Test a malformed parcel response only fails its own parcel."""
+    aresponses.add(
+        MATCH_HOST,
+        "/parcels/174",
+        "GET",
+        aresponses.Response(
+            status=200,
+            headers={"Content-Type": "application/json"},
+            text=load_fixture("get_parcel.json"),
+        ),
+    )
+    aresponses.add(
+        MATCH_HOST,
+        "/parcels/175",
+        "GET",
+        aresponses.Response(
+            status=200,
+            headers={"Content-Type": "application/json"},
+            text='{"message": "ok", "parcel": null}',
+        ),
+    )
+
+    async with ClientSession() as session:
+        session_object = SessionObject.from_dict({"user_id": 156, "token": "eP0FUZhN76Wu7igUkCPigR2wEMBDtzaW", "expiration": (datetime.date.today() + timedelta(days=30)).strftime('%Y-%m-%dT%H:%M:%S.%f%z')})
+        onetracker = OneTracker(session=session, session_object=session_object)
+        response = await onetracker.get_parcels([174, 175])
+        assert list(response.parcels) == [174]
+        assert list(response.errors) == [175]
+        assert isinstance(response.errors[175], OneTrackerError)
+        aresponses.assert_all_requests_matched()
+
+@pytest.mark.asyncio
+async def test_list_carriers_cached(aresponses):
+    """Test list carriers responses are cached per tracking ID until invalidated."""
+    for _ in range(3):
+        aresponses.add(
+            MATCH_HOST,
+            "/carriers",
+            "GET",
+            aresponses.Response(
+                status=200,
+                headers={"Content-Type": "application/json"},
+                text=load_fixture("carriers.json"),
+            ),
+        )
+
+    async with ClientSession() as session:
+        session_object = SessionObject.from_dict({"user_id": 156, "token": "eP0FUZhN76Wu7igUkCPigR2wEMBDtzaW", "expiration": (datetime.date.today() + timedelta(days=30)).strftime('%Y-%m-%dT%H:%M:%S.%f%z')})
+        onetracker = OneTracker(session=session, session_object=session_object)
+        carriers = await onetracker.list_carriers(tracking_id="abc")
+        assert await onetracker.list_carriers(tracking_id="abc") is carriers
+        tracking_id_carriers = await onetracker.list_carriers()
+        assert tracking_id_carriers is not carriers
+        assert await onetracker.list_carriers() is tracking_id_carriers
+
+        onetracker.invalidate_carriers("abc")
+        refreshed = await onetracker.list_carriers(tracking_id="abc")
+        assert refreshed is not carriers
+        assert refreshed == carriers
+        aresponses.assert_all_requests_matched()
+
+        onetracker.clear_carrier_cache()
+        assert len(onetracker.carrier_cache) == 0
+
+@pytest.mark.asyncio
+async def test_raw_mode(aresponses):
+    """Test raw mode returns the validated JSON payloads."""
+    aresponses.add(
+        MATCH_HOST,
+        "/parcels",
+        "GET",
+        aresponses.Response(
+            status=200,
+            headers={"Content-Type": "application/json"},
+            text=load_fixture("list_parcels.json"),
+        ),
+    )
+    aresponses.add(
+        MATCH_HOST,
+        "/parcels/174",
+        "GET",
+        aresponses.Response(
+            status=200,
+            headers={"Content-Type": "application/json"},
+            text=load_fixture("get_parcel.json"),
+        ),
+    )
+    for _ in range(2):
+        aresponses.add(
+            MATCH_HOST,
+            "/carriers",
+            "GET",
+            aresponses.Response(
+                status=200,
+                headers={"Content-Type": "application/json"},
+                text=load_fixture("carriers.json"),
+            ),
+        )
+
+    async with ClientSession() as session:
+        session_object = SessionObject.from_dict({"user_id": 156, "token": "eP0FUZhN76Wu7igUkCPigR2wEMBDtzaW", "expiration": (datetime.date.today() + timedelta(days=30)).strftime('%Y-%m-%dT%H:%M:%S.%f%z')})
+        onetracker = OneTracker(session=session, session_object=session_object, raw=True)
+        parcels = await onetracker.list_parcels()
+        assert type(parcels) == dict
+        assert parcels["parcels"][0]["id"] == 174
+
+        parcel = await onetracker.get_parcel(174)
+        assert type(parcel) == dict
+        assert parcel["parcel"]["tracking_events"][0]["id"] == 5699
+
+        carriers = await onetracker.list_carriers()
+        assert type(carriers) == dict
+        assert len(carriers["carriers"]) == 141
+        assert await onetracker.list_carriers() is carriers
+        assert type(await onetracker.list_carriers(raw=False)) == ListCarriersResponse
+
+@pytest.mark.asyncio
+async def test_raw_mode_per_call_error(aresponses):
+    """Test a per-call raw mode still validates the payload."""
+    aresponses.add(
+        MATCH_HOST,
+        "/parcels",
+        "GET",
+        aresponses.Response(
+            status=200,
+            headers={"Content-Type": "application/json"},
+            text='{"message": "Parcel list unavailable"}',
+        ),
+    )
+
+    async with ClientSession() as session:
+        session_object = SessionObject.from_dict({"user_id": 156, "token": "eP0FUZhN76Wu7igUkCPigR2wEMBDtzaW", "expiration": (datetime.date.today() + timedelta(days=30)).strftime('%Y-%m-%dT%H:%M:%S.%f%z')})
+        onetracker = OneTracker(session=session, session_object=session_object)
+        with pytest.raises(OneTrackerError, match="Parcel list unavailable"):
+            await onetracker.list_parcels(raw=True)
+
+@pytest.mark.asyncio
+async def test_iter_parcels(aresponses):
+    """Test iterating over parcels."""
+    aresponses.add(
+        MATCH_HOST,
+        "/parcels",
+        "GET",
+        aresponses.Response(
+            status=200,
+            headers={"Content-Type": "application/json"},
+            text=load_fixture("list_parcels.json"),
+        ),
+    )
+
+    async with ClientSession() as session:
+        session_object = SessionObject.from_dict({"user_id": 156, "token": "eP0FUZhN76Wu7igUkCPigR2wEMBDtzaW", "expiration": (datetime.date.today() + timedelta(days=30)).strftime('%Y-%m-%dT%H:%M:%S.%f%z')})
+        onetracker = OneTracker(session=session, session_object=session_object)
+        parcels = [parcel async for parcel in onetracker.iter_parcels(archived=True)]
+        assert len(parcels) == 1
+        assert type(parcels[0]) == Parcel
+        assert parcels[0].id == 174
+        assert parcels[0].time_updated == datetime.datetime(2018, 8, 18, 20, 1, 23)
+        assert parcels[0].tracking_events == []
+
+@pytest.mark.asyncio
+async def test_iter_parcels_errors(aresponses):
+    """Test iterating over parcels with error responses."""
+    aresponses.add(
+        MATCH_HOST,
+        "/parcels",
+        "GET",
+        aresponses.Response(
+            status=200,
+            headers={"Content-Type": "application/json"},
+            text='{"message": "Parcel list unavailable"}',
+        ),
+    )
+    aresponses.add(
+        MATCH_HOST,
+        "/parcels",
+        "GET",
+        aresponses.Response(
+            status=401,
+            headers={"Content-Type": "application/json"},
+            text='{"message":"Invalid API token"}',
+        ),
+    )
+
+    async with ClientSession() as session:
+        session_object = SessionObject.from_dict({"user_id": 156, "token": "eP0FUZhN76Wu7igUkCPigR2wEMBDtzaW", "expiration": (datetime.date.today() + timedelta(days=30)).strftime('%Y-%m-%dT%H:%M:%S.%f%z')})
+        onetracker = OneTracker(session=session, session_object=session_object)
+        with pytest.raises(OneTrackerError, match="Parcel list unavailable"):
+            [parcel async for parcel in onetracker.iter_parcels()]
+        with pytest.raises(OneTrackerAuthenticationError):
+            [parcel async for parcel in onetracker.iter_parcels()]
+
+@pytest.mark.asyncio
+async def test_get_parcel_not_modified(aresponses):
+    """Test an unchanged parcel is returned from the previous response without decoding."""
+    async def response_handler(request):
+        if request.headers.get("If-None-Match") == '"938-1"':
+            return aresponses.Response(status=304)
+        return aresponses.Response(
+            status=200,
+            headers={"Content-Type": "application/json", "ETag": '"938-1"'},
+            text=load_fixture("get_parcel.json"),
+        )
+
+    aresponses.add(MATCH_HOST, "/parcels/938", "GET", response_handler, repeat=3)
+
+    async with ClientSession() as session:
+        session_object = SessionObject.from_dict({"user_id": 156, "token": "eP0FUZhN76Wu7igUkCPigR2wEMBDtzaW", "expiration": (datetime.date.today() + timedelta(days=30)).strftime('%Y-%m-%dT%H:%M:%S.%f%z')})
+        onetracker = OneTracker(session=session, session_object=session_object, validator_cache=TTLCache(maxsize=16))
+        first = await onetracker.get_parcel(938)
+        second = await onetracker.get_parcel(938)
+        assert second is first
+        assert type(await onetracker.get_parcel(938, raw=True)) == dict
+        aresponses.assert_all_requests_matched()
+
+@pytest.mark.asyncio
+async def test_parcel_store(aresponses):
+    """Test parcels are written behind to the parcel store and read through from it."""
+    # The full payload of the listed parcel, with tracking events and the same time_updated.
+    listed_parcel = json.loads(load_fixture("list_parcels.json"))["parcels"][0]
+    full_parcel = json.loads(load_fixture("get_parcel.json"))
+    full_parcel["parcel"].update(id=listed_parcel["id"], time_updated=listed_parcel["time_updated"])
+    aresponses.add(
+        MATCH_HOST,
+        "/parcels",
+        "GET",
+        aresponses.Response(
+            status=200,
+            headers={"Content-Type": "application/json"},
+            text=load_fixture("list_parcels.json"),
+        ),
+    )
+    aresponses.add(
+        MATCH_HOST,
+        "/parcels/174",
+        "GET",
+        aresponses.Response(
+            status=200,
+            headers={"Content-Type": "application/json"},
+            text=json.dumps(full_parcel),
+        ),
+    )
+    aresponses.add(
+        MATCH_HOST,
+        "/parcels/174",
+        "DELETE",
+        aresponses.Response(
+            status=200,
+            headers={"Content-Type": "application/json"},
+            text=load_fixture("delete_parcel.json"),
+        ),
+    )
+
+    store = ParcelStore()
+    async with ClientSession() as session:
+        session_object = SessionObject.from_dict({"user_id": 156, "token": "eP0FUZhN76Wu7igUkCPigR2wEMBDtzaW", "expiration": (datetime.date.today() + timedelta(days=30)).strftime('%Y-%m-%dT%H:%M:%S.%f%z')})
+        onetracker = OneTracker(session=session, session_object=session_object, parcel_store=store)
+        listed = await onetracker.list_parcels()
+        await onetracker.flush_store()
+        assert (await onetracker.list_stored_parcels()).parcels == listed.parcels
+
+        # Listed parcels lack tracking events, so they are requested once, then served from the store.
+        fetched = await onetracker.get_parcel(174)
+        assert fetched.parcel.tracking_events
+        await onetracker.flush_store()
+        stored = await onetracker.get_parcel(174)
+        assert isinstance(stored, GetParcelResponse)
+        assert stored.parcel == fetched.parcel
+        assert (await onetracker.get_parcel(174, raw=True))["parcel"]["id"] == 174
+        stored = await onetracker.list_stored_parcels()
+        assert stored.parcels[0].tracking_events == fetched.parcel.tracking_events
+        await onetracker.delete_parcel(174)
+        assert (await onetracker.list_stored_parcels()).parcels == []
+        aresponses.assert_all_requests_matched()
+    store.close()
+
+@pytest.mark.asyncio
+async def test_list_stored_parcels_without_store():
+    """Test listing stored parcels requires a parcel store."""
+    onetracker = OneTracker()
+    with pytest.raises(OneTrackerError, match="no parcel store"):
+        await onetracker.list_stored_parcels()
@@ -0,0 +1,117 @@
+"""Tests for OneTracker-API Metrics."""
+import asyncio
+import json
+
+import pytest
+
+from onetracker_api import Metrics, OneTracker, OneTrackerClientError, OneTrackerConnectionError
+from onetracker_api.metrics import CONTENT_TYPE
+
+from . import load_fixture, make_session_object
+
+MATCH_HOST = "api.onetracker.app"
+
+def samples(text):
+    """Parse the samples of rendered metrics."""
+    values = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            values[name] = float(value)
+    return values
+
+@pytest.mark.asyncio
+async def test_render(aresponses):
+    """Test requests, errors, latency and connections are rendered."""
+    aresponses.add(
+        MATCH_HOST,
+        "/parcels",
+        "GET",
+        aresponses.Response(
+            status=200,
+            headers={"Content-Type": "application/json"},
+            text=load_fixture("list_parcels.json"),
+        ),
+        repeat=2,
+    )
+    aresponses.add(
+        MATCH_HOST,
+        "/parcels/938",
+        "GET",
+        aresponses.Response(
+            status=404,
+            headers={"Content-Type": "application/json"},
+            text=json.dumps({"message": "Parcel not found"}),
+        ),
+    )
+
+    metrics = Metrics(buckets=(0.5, 5.0))
+    async with OneTracker(session_object=make_session_object(), instrumentation=metrics) as onetracker:
+        await onetracker.list_parcels()
+        await onetracker.list_parcels()
+        with pytest.raises(OneTrackerClientError):
+            await onetracker.get_parcel(938)
+
+    text = metrics.render()
+    values = samples(text)
+    assert "# TYPE onetracker_requests_total counter" in text
+    assert values['onetracker_requests_total{endpoint="/parcels",method="GET",status_class="2xx"}'] == 2
+    assert values['onetracker_requests_total{endpoint="/parcels/{id}",method="GET",status_class="4xx"}'] == 1
+    assert values['onetracker_request_errors_total{endpoint="/parcels/{id}",error="OneTrackerClientError"}'] == 1
+    assert values['onetracker_requests_in_flight{endpoint="/parcels"}'] == 0
+    assert values['onetracker_request_duration_seconds_bucket{endpoint="/parcels",le="+Inf"}'] == 2
+    assert values['onetracker_request_duration_seconds_count{endpoint="/parcels"}'] == 2
+    assert values['onetracker_request_phase_seconds_count{endpoint="/parcels",phase="build"}'] == 2
+    assert values['onetracker_connections_waiting'] == 0
+    assert values['onetracker_connections_total{reused="false"}'] + values['onetracker_connections_total{reused="true"}'] == 3
+    assert CONTENT_TYPE.startswith("text/plain")
+    aresponses.assert_all_requests_matched()
+
+@pytest.mark.asyncio
+async def test_in_flight_and_connection_errors(aresponses):
+    """Test in-flight requests are counted until they fail without status."""
+    async def response_handler(request):
+        await asyncio.sleep(1)
+        return aresponses.Response(status=200, text="{}")
+
+    aresponses.add(MATCH_HOST, "/carriers", "GET", response_handler)
+
+    metrics = Metrics(namespace="test")
+    async with OneTracker(session_object=make_session_object(), instrumentation=metrics, request_timeout=0.2) as onetracker:
+        request = asyncio.ensure_future(onetracker.list_carriers())
+        await asyncio.sleep(0.1)
+        assert samples(metrics.render())['test_requests_in_flight{endpoint="/carriers"}'] == 1
+        with pytest.raises(OneTrackerConnectionError):
+            await request
+
+    values = samples(metrics.render())
+    assert values['test_requests_in_flight{endpoint="/carriers"}'] == 0
+    assert values['test_requests_total{endpoint="/carriers",method="GET",status_class="none"}'] == 1
+    assert values['test_request_errors_total{endpoint="/carriers",error="OneTrackerConnectionError"}'] == 1
+
+@pytest.mark.asyncio
+async def test_coalesced_requests(aresponses):
+    """Test requests joining an identical in-flight request are counted as coalesced, not as sent."""
+    async def response_handler(request):
+        await asyncio.sleep(0.1)
+        return aresponses.Response(status=200, headers={"Content-Type": "application/json"}, text=load_fixture("carriers.json"))
+
+    aresponses.add(MATCH_HOST, "/carriers", "GET", response_handler)
+
+    timings = []
+    metrics = Metrics(hooks=[timings.append])
+    async with OneTracker(session_object=make_session_object(), instrumentation=metrics) as onetracker:
+        await asyncio.gather(*(onetracker.list_carriers(use_cache=False) for _ in range(3)))
+
+    values = samples(metrics.render())
+    assert values['onetracker_requests_total{endpoint="/carriers",method="GET",status_class="2xx"}'] == 1
+    assert 'onetracker_requests_total{endpoint="/carriers",method="GET",status_class="none"}' not in values
+    assert values['onetracker_requests_coalesced_total{endpoint="/carriers"}'] == 2
+    assert [(timing.status, timing.coalesced) for timing in timings] == [(200, False), (200, True), (200, True)]
+    aresponses.assert_all_requests_matched()
+
+def test_label_escaping() -> None:
+    """Test label values are escaped."""
+    metrics = Metrics()
+    metrics.errors[('/a"b\\c', "Error\n")] = 1
+    assert 'onetracker_request_errors_total{endpoint="/a\\"b\\\\c",error="Error\\n"} 1' in metrics.render()
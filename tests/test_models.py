@@ -1,11 +1,17 @@
 """Tests for OneTracker-API Models."""
 import json
 import datetime
+import pickle
+import dataclasses
 import pytest
+from typing import List, Optional
 
 from onetracker_api.exceptions import OneTrackerError
 
 from onetracker_api.models import  (
+    _compile_decoder,
+    _parse_timestamp,
+    _SlottedModel,
     SessionObject,
     TrackingEvent,
     AuthenticationTokenResponse,
@@ -13,6 +19,7 @@ from onetracker_api.models import  (
     ListParcelsResponse,
     GetParcelResponse,
     DeleteParcelResponse,
+    ListCarriersResponse,
 )
 
 from . import load_fixture
@@ -249,4 +256,106 @@ def test_delete_parcel_response() -> None:
 def test_delete_parcel_error_response() -> None:
     """Test the DeleteParcelResponse model with error message"""
     with pytest.raises(OneTrackerError):
-        DeleteParcelResponse.from_dict({'message': 'error'})
\ No newline at end of file
+        DeleteParcelResponse.from_dict({'message': 'error'})
+
+def test_slotted_models() -> None:
+    """Test the models keep their attributes in slots and stay immutable"""
+    parcel = Parcel.from_dict(GET_PARCEL_RESPONSE["parcel"])
+    tracking_event = parcel.tracking_events[0]
+
+    for model in (parcel, tracking_event):
+        assert not hasattr(model, "__dict__")
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            model.id = 1
+        with pytest.raises((AttributeError, TypeError)):
+            model.unknown = 1
+
+def test_pickle_models() -> None:
+    """Test the slotted models can be pickled"""
+    get_parcel_response = GetParcelResponse.from_dict(GET_PARCEL_RESPONSE)
+
+    restored = pickle.loads(pickle.dumps(get_parcel_response))
+    assert restored == get_parcel_response
+    assert restored.parcel.tracking_events[0] == get_parcel_response.parcel.tracking_events[0]
+
+def test_parse_timestamp() -> None:
+    """Test parsing API timestamps"""
+    assert _parse_timestamp(None) is None
+    assert _parse_timestamp("2018-08-08T20:00:00Z") == datetime.datetime(2018, 8, 8, 20, 0, 0)
+    assert _parse_timestamp("2018-08-08T20:00:00") == datetime.datetime(2018, 8, 8, 20, 0, 0)
+    assert _parse_timestamp("2020-08-03T03:15:54.677770006Z") == datetime.datetime(2020, 8, 3, 3, 15, 54, 677770)
+    assert _parse_timestamp("2020-08-03T03:15:54.5Z") == datetime.datetime(2020, 8, 3, 3, 15, 54, 500000)
+    assert _parse_timestamp("2020-08-03T03:15:54.123456Z") == datetime.datetime(2020, 8, 3, 3, 15, 54, 123456)
+    assert _parse_timestamp("2020-08-03T03:15:54.1234+02:00") == datetime.datetime(
+        2020, 8, 3, 3, 15, 54, 123400, tzinfo=datetime.timezone(datetime.timedelta(hours=2))
+    )
+    assert _parse_timestamp("2020-08-03T03:15:54-05:00").utcoffset() == datetime.timedelta(hours=-5)
+
+def test_parse_timestamp_memoized() -> None:
+    """Test repeated timestamps are parsed once"""
+    value = "2020-05-05T05:47:56Z"
+    assert _parse_timestamp(value) is _parse_timestamp("".join(value))
+
+def test_parcel_lazy_tracking_events() -> None:
+    """Test tracking events are only decoded on first access"""
+    data = GET_PARCEL_RESPONSE["parcel"]
+    parcel = Parcel.from_dict(data)
+
+    assert parcel._tracking_events is None
+    assert parcel._raw_tracking_events is data["tracking_events"]
+    tracking_events = parcel.tracking_events
+    assert type(tracking_events) == list
+    assert [tracking_event.id for tracking_event in tracking_events] == [5699, 5697]
+    assert parcel.tracking_events is tracking_events
+    assert parcel._raw_tracking_events is None
+
+    assert Parcel.from_dict(data) == parcel
+    assert Parcel.from_dict(dict(data, tracking_events=None)).tracking_events == []
+    assert dataclasses.replace(parcel, id=1).tracking_events == tracking_events
+
+def test_generated_decoders() -> None:
+    """Test from_dict builds the same objects as the dataclass constructor"""
+    data = GET_PARCEL_RESPONSE["parcel"]["tracking_events"][0]
+    assert TrackingEvent.from_dict(data) == TrackingEvent(**{
+        field.name: _parse_timestamp(data[field.name]) if field.type is datetime.datetime else data[field.name]
+        for field in dataclasses.fields(TrackingEvent)
+    })
+    assert TrackingEvent.from_dict.__name__ == "decode_TrackingEvent"
+    assert TrackingEvent.from_dict({}) == TrackingEvent(*[None] * len(dataclasses.fields(TrackingEvent)))
+
+    parcel = Parcel.from_dict(dict(GET_PARCEL_RESPONSE["parcel"], is_archived=1, tracking_lock=None))
+    assert parcel.is_archived is True
+    assert parcel.tracker_cached is False
+    assert parcel.tracking_lock is None
+    assert Parcel.from_dict(GET_PARCEL_RESPONSE["parcel"]).is_archived is False
+
+    carriers = ListCarriersResponse.from_dict(json.loads(load_fixture("carriers.json"))).carriers
+    assert carriers[0].id == "USPS"
+    assert carriers[0].frequently_used is True
+
+def test_compile_decoder() -> None:
+    """Test decoders are specialized from the annotations"""
+    @dataclasses.dataclass(frozen=True)
+    class Model(_SlottedModel):
+        __slots__ = ("time", "flag", "event", "events", "name")
+
+        time: Optional[datetime.datetime]
+        flag: Optional[bool]
+        event: TrackingEvent
+        events: List[TrackingEvent]
+        name: str
+
+    decode = _compile_decoder(Model, converters={"name": str.upper})
+    event = GET_PARCEL_RESPONSE["parcel"]["tracking_events"][0]
+    model = decode({"time": "2020-05-05T05:47:56Z", "flag": 0, "event": event, "events": [event, event], "name": "a"})
+    assert model == Model(
+        time=datetime.datetime(2020, 5, 5, 5, 47, 56),
+        flag=False,
+        event=TrackingEvent.from_dict(event),
+        events=[TrackingEvent.from_dict(event)] * 2,
+        name="A",
+    )
+    model = decode({"event": event, "name": "b"})
+    assert model.time is None
+    assert model.flag is None
+    assert model.events == []
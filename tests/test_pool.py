@@ -0,0 +1,92 @@
+"""Tests for OneTracker-API Account Pool."""
+import asyncio
+import json
+
+import pytest
+
+from onetracker_api import AccountPool, OneTracker, OneTrackerError
+from onetracker_api.models import ListAccountParcelsResponse
+
+from . import load_fixture, make_session_object
+
+MATCH_HOST = "api.onetracker.app"
+
+@pytest.mark.asyncio
+async def test_list_parcels(aresponses):
+    """Test parcels are listed for every account, failures being reported per account."""
+    async def response_handler(request):
+        if request.headers.get("x-api-token") == "BadToken":
+            return aresponses.Response(
+                status=401,
+                headers={"Content-Type": "application/json"},
+                text=json.dumps({"message": "Invalid API token"}),
+            )
+        return aresponses.Response(
+            status=200,
+            headers={"Content-Type": "application/json"},
+            text=load_fixture("list_parcels.json"),
+        )
+
+    aresponses.add(MATCH_HOST, "/parcels", "GET", response_handler, repeat=3)
+
+    async with AccountPool() as pool:
+        for name in ("alice", "bob", "carol"):
+            onetracker = pool.add_account(name, session_object=make_session_object("BadToken" if name == "carol" else f"{name}Token"))
+            assert isinstance(onetracker, OneTracker)
+        assert list(pool) == ["alice", "bob", "carol"]
+        assert pool["bob"]._connector is pool.connector
+
+        response = await pool.list_parcels()
+        assert isinstance(response, ListAccountParcelsResponse)
+        assert {name: [parcel.id for parcel in parcels] for name, parcels in response.parcels.items()} == {"alice": [174], "bob": [174]}
+        assert list(response.errors) == ["carol"]
+        aresponses.assert_all_requests_matched()
+    assert pool.connector.closed
+
+@pytest.mark.asyncio
+async def test_fair_turns():
+    """Test waiting accounts take turns round-robin."""
+    async with AccountPool(concurrency=1) as pool:
+        order = []
+
+        async def work(name):
+            async with pool.turn(name):
+                order.append(name)
+                await asyncio.sleep(0)
+
+        tasks = [asyncio.ensure_future(work("big")) for _ in range(4)]
+        tasks += [asyncio.ensure_future(work("small")) for _ in range(2)]
+        await asyncio.gather(*tasks)
+        assert order == ["big", "big", "small", "big", "small", "big"]
+
+@pytest.mark.asyncio
+async def test_turn_cancelled():
+    """Test a cancelled waiter does not leak its turn."""
+    async with AccountPool(concurrency=1) as pool:
+        async with pool.turn("a"):
+            waiter = asyncio.ensure_future(pool.turn("b").__aenter__())
+            await asyncio.sleep(0)
+            waiter.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiter
+        async with pool.turn("c"):
+            pass
+        assert pool._queue.free == 1
+
+@pytest.mark.asyncio
+async def test_accounts():
+    """Test adding, calling and removing accounts."""
+    async with AccountPool() as pool:
+        onetracker = pool.add_account("alice", email="email", password="password")
+        assert onetracker.session_manager is not None
+        with pytest.raises(OneTrackerError):
+            pool.add_account("alice")
+        with pytest.raises(OneTrackerError):
+            await pool.call("bob", "list_parcels")
+        await pool.remove_account("alice")
+        assert len(pool) == 0
+
+def test_invalid_concurrency() -> None:
+    """Test invalid parameters are rejected."""
+    with pytest.raises(OneTrackerError):
+        AccountPool(concurrency=0)
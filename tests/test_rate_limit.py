@@ -0,0 +1,100 @@
+"""Tests for OneTracker-API Rate Limiter."""
+import asyncio
+import pytest
+
+from aiohttp import ClientSession
+
+from onetracker_api import (
+    Client,
+    RateLimiter,
+    OneTrackerError,
+)
+
+MATCH_HOST = "api.onetracker.app"
+
+class FakeClock:
+    """Clock advanced by the sleeps of the rate limiter, recording their delays. Rates are powers of two, so times add up exactly."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.delays = []
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, delay):
+        self.delays.append(delay)
+        self.now += delay
+
+@pytest.mark.asyncio
+async def test_burst_then_rate(monkeypatch):
+    """Test the burst is served at once and the rest at the sustained rate."""
+    clock = FakeClock()
+    monkeypatch.setattr("onetracker_api.rate_limit.asyncio.sleep", clock.sleep)
+    limiter = RateLimiter(rate=32, burst=3, timer=clock)
+
+    for _ in range(3):
+        await limiter.acquire()
+    assert clock.delays == []
+
+    for _ in range(2):
+        await limiter.acquire()
+    assert clock.delays == [1 / 32, 1 / 32]
+
+    # Tokens earned while idle are spent without waiting, up to the burst.
+    clock.now += 10
+    for _ in range(3):
+        await limiter.acquire()
+    assert len(clock.delays) == 2
+
+@pytest.mark.asyncio
+async def test_concurrent_acquire(monkeypatch):
+    """Test concurrent waiters together never exceed the rate."""
+    clock = FakeClock()
+    monkeypatch.setattr("onetracker_api.rate_limit.asyncio.sleep", clock.sleep)
+    limiter = RateLimiter(rate=64, burst=1, timer=clock)
+    times = []
+
+    async def acquire():
+        await limiter.acquire()
+        times.append(clock.now)
+
+    await asyncio.gather(*(acquire() for _ in range(6)))
+    assert times == [number / 64 for number in range(6)]
+
+def test_invalid_rate_limiter():
+    """Test invalid rate limiter arguments."""
+    with pytest.raises(OneTrackerError):
+        RateLimiter(rate=0)
+    with pytest.raises(OneTrackerError):
+        RateLimiter(rate=1, burst=0)
+
+@pytest.mark.asyncio
+async def test_shared_rate_limiter(aresponses):
+    """Test clients sharing a rate limiter consult it before every request."""
+    class CountingRateLimiter(RateLimiter):
+        acquired = 0
+
+        async def acquire(self):
+            CountingRateLimiter.acquired += 1
+            await super().acquire()
+
+    for _ in range(2):
+        aresponses.add(
+            MATCH_HOST,
+            "/carriers",
+            "GET",
+            aresponses.Response(
+                status=200,
+                headers={"Content-Type": "application/json"},
+                text='{"message": "ok", "carriers": []}',
+            ),
+        )
+
+    limiter = CountingRateLimiter(rate=100, burst=2)
+    async with ClientSession() as session:
+        first = Client(session=session, rate_limiter=limiter)
+        second = Client(session=session, rate_limiter=limiter)
+        await first._request("/carriers")
+        await second._request("/carriers")
+    assert CountingRateLimiter.acquired == 2
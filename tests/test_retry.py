@@ -0,0 +1,175 @@
+"""Tests for OneTracker-API Retry Policies."""
+import asyncio
+import datetime
+from email.utils import format_datetime
+import pytest
+
+from aiohttp import ClientSession
+
+from onetracker_api import (
+    Client,
+    OneTracker,
+    RetryPolicy,
+    OneTrackerError,
+    OneTrackerConnectionError,
+    OneTrackerInternalServerError,
+)
+from onetracker_api.models import SessionObject
+
+from . import load_fixture
+
+MATCH_HOST = "api.onetracker.app"
+
+def test_is_retryable() -> None:
+    """Test which attempts are retried."""
+    policy = RetryPolicy(max_attempts=3)
+    assert policy.is_retryable("GET", 1)
+    assert policy.is_retryable("get", 2, 503)
+    assert not policy.is_retryable("GET", 3, 503)
+    assert not policy.is_retryable("GET", 1, 404)
+    assert not policy.is_retryable("POST", 1, 503)
+    assert RetryPolicy(retry_methods=["POST"]).is_retryable("POST", 1, 500)
+
+def test_get_delay() -> None:
+    """Test capped exponential backoff."""
+    policy = RetryPolicy(backoff_factor=1, backoff_max=5, jitter=False)
+    assert [policy.get_delay(attempt) for attempt in range(1, 6)] == [1, 2, 4, 5, 5]
+
+    jittered = RetryPolicy(backoff_factor=1, backoff_max=5)
+    for attempt in range(1, 6):
+        assert 0 <= jittered.get_delay(attempt) <= min(5, 2 ** (attempt - 1))
+
+def test_get_delay_retry_after() -> None:
+    """Test Retry-After is honored on 429 and 503 only."""
+    policy = RetryPolicy(backoff_factor=1, backoff_max=10, jitter=False)
+    assert policy.get_delay(1, 429, "3") == 3
+    assert policy.get_delay(1, 503, "60") == 10
+    assert policy.get_delay(1, 500, "3") == 1
+    assert policy.get_delay(1, 429, "soon") == 1
+    assert RetryPolicy(backoff_factor=1, jitter=False, respect_retry_after=False).get_delay(1, 429, "3") == 1
+
+def test_parse_retry_after() -> None:
+    """Test parsing Retry-After header values."""
+    assert RetryPolicy.parse_retry_after(None) is None
+    assert RetryPolicy.parse_retry_after("120") == 120
+    assert RetryPolicy.parse_retry_after("invalid") is None
+    future = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=30)
+    assert 25 <= RetryPolicy.parse_retry_after(format_datetime(future, usegmt=True)) <= 30
+    past = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=30)
+    assert RetryPolicy.parse_retry_after(format_datetime(past, usegmt=True)) == 0
+
+def test_invalid_policy() -> None:
+    """Test invalid retry policy arguments."""
+    with pytest.raises(OneTrackerError):
+        RetryPolicy(max_attempts=0)
+    with pytest.raises(OneTrackerError):
+        RetryPolicy(backoff_factor=-1)
+
+@pytest.mark.asyncio
+async def test_retry_server_error(aresponses):
+    """Test a transient server error is retried."""
+    aresponses.add(
+        MATCH_HOST,
+        "/carriers",
+        "GET",
+        aresponses.Response(
+            status=503,
+            headers={"Content-Type": "application/json", "Retry-After": "0"},
+            text='{"message":"Service unavailable."}',
+        ),
+    )
+    aresponses.add(
+        MATCH_HOST,
+        "/carriers",
+        "GET",
+        aresponses.Response(
+            status=200,
+            headers={"Content-Type": "application/json"},
+            text='{"message": "ok", "carriers": []}',
+        ),
+    )
+
+    async with ClientSession() as session:
+        client = Client(session=session, retry_policy=RetryPolicy(backoff_factor=0))
+        response = await client._request("/carriers")
+        assert response.get("message") == "ok"
+
+@pytest.mark.asyncio
+async def test_retry_exhausted(aresponses):
+    """Test the last error is raised once every attempt failed."""
+    for _ in range(2):
+        aresponses.add(
+            MATCH_HOST,
+            "/carriers",
+            "GET",
+            aresponses.Response(
+                status=500,
+                headers={"Content-Type": "application/json"},
+                text='{"message":"Internal server error."}',
+            ),
+        )
+
+    async with ClientSession() as session:
+        client = Client(session=session, retry_policy=RetryPolicy(max_attempts=2, backoff_factor=0))
+        with pytest.raises(OneTrackerInternalServerError):
+            await client._request("/carriers")
+
+@pytest.mark.asyncio
+async def test_retry_timeout(aresponses):
+    """Test a timeout is retried."""
+    async def response_handler(_):
+        await asyncio.sleep(2)
+        return aresponses.Response(body="Timeout!")
+
+    aresponses.add(MATCH_HOST, "/carriers", "GET", response_handler)
+    aresponses.add(
+        MATCH_HOST,
+        "/carriers",
+        "GET",
+        aresponses.Response(
+            status=200,
+            headers={"Content-Type": "application/json"},
+            text='{"message": "ok", "carriers": []}',
+        ),
+    )
+
+    async with ClientSession() as session:
+        client = Client(session=session, request_timeout=0.5, retry_policy=RetryPolicy(backoff_factor=0))
+        response = await client._request("/carriers")
+        assert response.get("message") == "ok"
+
+    async with ClientSession() as session:
+        client = Client(session=session, request_timeout=0.5)
+        aresponses.add(MATCH_HOST, "/carriers", "GET", response_handler)
+        with pytest.raises(OneTrackerConnectionError):
+            await client._request("/carriers")
+
+@pytest.mark.asyncio
+async def test_retry_per_call_override(aresponses):
+    """Test a per-call retry policy overrides the client's."""
+    aresponses.add(
+        MATCH_HOST,
+        "/parcels/174",
+        "GET",
+        aresponses.Response(
+            status=502,
+            headers={"Content-Type": "application/json"},
+            text='{"message":"Bad gateway."}',
+        ),
+    )
+    aresponses.add(
+        MATCH_HOST,
+        "/parcels/174",
+        "GET",
+        aresponses.Response(
+            status=200,
+            headers={"Content-Type": "application/json"},
+            text=load_fixture("get_parcel.json"),
+        ),
+    )
+
+    async with ClientSession() as session:
+        session_object = SessionObject.from_dict({"user_id": 156, "token": "eP0FUZhN76Wu7igUkCPigR2wEMBDtzaW", "expiration": (datetime.date.today() + datetime.timedelta(days=30)).strftime('%Y-%m-%dT%H:%M:%S.%f%z')})
+        onetracker = OneTracker(session=session, session_object=session_object, retry_policy=RetryPolicy(max_attempts=1))
+        response = await onetracker.get_parcel(174, retry_policy=RetryPolicy(backoff_factor=0))
+        assert response.parcel.id == 938
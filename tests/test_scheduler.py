@@ -0,0 +1,164 @@
+"""Tests for OneTracker-API Poll Scheduler."""
+import asyncio
+import datetime
+import json
+
+import pytest
+from aiohttp import ClientSession, web
+
+from onetracker_api import OneTracker, OneTrackerError, PollScheduler, RateLimiter
+from onetracker_api.models import Parcel
+
+from . import load_fixture, make_session_object
+
+MATCH_HOST = "api.onetracker.app"
+
+NOW = datetime.datetime(2020, 5, 5, 12, 0, 0)
+
+class FakeTimer:
+    """Manually advanced clock."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def make_parcel(**changes):
+    """Build an undelivered parcel payload from the get_parcel fixture."""
+    parcel = json.loads(load_fixture("get_parcel.json"))["parcel"]
+    parcel.update(tracking_status="in_transit", tracking_time_delivered="1001-01-01T00:00:00Z", time_updated="2020-05-05T10:00:00Z")
+    parcel.update(changes)
+    return parcel
+
+def test_get_interval() -> None:
+    """Test refresh intervals follow the tracking status and ETA."""
+    scheduler = PollScheduler(OneTracker(), near_eta_interval=60, near_eta_window=3600, interval=600, dormant_after=86400, dormant_interval=6000)
+    assert scheduler.get_interval(Parcel.from_dict(make_parcel()), NOW) == 600
+    assert scheduler.get_interval(Parcel.from_dict(make_parcel(tracking_time_estimated="2020-05-05T12:30:00Z")), NOW) == 60
+    assert scheduler.get_interval(Parcel.from_dict(make_parcel(tracking_time_estimated="2020-05-04T12:00:00Z")), NOW) == 60
+    assert scheduler.get_interval(Parcel.from_dict(make_parcel(tracking_time_estimated="2020-05-08T12:00:00Z")), NOW) == 600
+    assert scheduler.get_interval(Parcel.from_dict(make_parcel(time_updated="2020-05-01T12:00:00Z")), NOW) == 6000
+    assert scheduler.get_interval(Parcel.from_dict(make_parcel(tracking_status="delivered")), NOW) is None
+    assert scheduler.get_interval(Parcel.from_dict(make_parcel(tracking_time_delivered="2020-05-05T11:00:00Z")), NOW) is None
+    assert scheduler.get_interval(Parcel.from_dict(make_parcel(is_archived=1)), NOW) is None
+
+def test_schedule_order() -> None:
+    """Test parcels are due earliest first and rescheduling replaces the previous entry."""
+    timer = FakeTimer()
+    scheduler = PollScheduler(OneTracker(), concurrency=10, timer=timer)
+    assert scheduler.next_due() is None
+    assert scheduler.add(Parcel.from_dict(make_parcel(id=1)), delay=30)
+    assert scheduler.add(Parcel.from_dict(make_parcel(id=2)), delay=10)
+    assert scheduler.add(Parcel.from_dict(make_parcel(id=3)), delay=20)
+    assert not scheduler.add(Parcel.from_dict(make_parcel(id=4, tracking_status="delivered")))
+    scheduler.add(Parcel.from_dict(make_parcel(id=1)), delay=5)
+    scheduler.remove(3)
+    assert len(scheduler) == 2
+    assert scheduler.next_due() == 5
+
+    timer.now = 10
+    assert scheduler.next_due() == 0
+    assert scheduler.__pop_due__(timer()) == [1, 2]
+    assert scheduler.next_due() is None
+
+@pytest.mark.asyncio
+async def test_run(aresponses):
+    """Test due parcels are refreshed until delivered, failures being retried."""
+    aresponses.add(
+        MATCH_HOST,
+        "/parcels/938",
+        "GET",
+        aresponses.Response(
+            status=404,
+            headers={"Content-Type": "application/json"},
+            text=json.dumps({"message": "Parcel not found"}),
+        ),
+    )
+    aresponses.add(
+        MATCH_HOST,
+        "/parcels/938",
+        "GET",
+        aresponses.Response(
+            status=200,
+            headers={"Content-Type": "application/json"},
+            text=json.dumps({"message": "ok", "parcel": make_parcel(tracking_time_estimated="2000-01-01T00:00:00Z")}),
+        ),
+    )
+    aresponses.add(
+        MATCH_HOST,
+        "/parcels/938",
+        "GET",
+        aresponses.Response(
+            status=200,
+            headers={"Content-Type": "application/json"},
+            text=load_fixture("get_parcel.json"),
+        ),
+    )
+
+    async with ClientSession() as session:
+        onetracker = OneTracker(session=session, session_object=make_session_object())
+        scheduler = PollScheduler(onetracker, budget=RateLimiter(1000, burst=10), near_eta_interval=0, error_interval=0)
+        scheduler.add(Parcel.from_dict(make_parcel()), delay=0)
+
+        statuses = []
+        async for parcel in scheduler.run():
+            statuses.append(parcel.tracking_status)
+        assert statuses == ["in_transit", "delivered"]
+        assert scheduler.errors == {}
+        assert len(scheduler) == 0
+        aresponses.assert_all_requests_matched()
+
+def delivered_response(id, delay=0):
+    """Build a handler answering get_parcel with a delivered parcel after delay seconds."""
+    async def response_handler(request):
+        await asyncio.sleep(delay)
+        parcel = json.loads(load_fixture("get_parcel.json"))
+        parcel["parcel"]["id"] = id
+        return web.Response(status=200, headers={"Content-Type": "application/json"}, text=json.dumps(parcel))
+    return response_handler
+
+@pytest.mark.asyncio
+async def test_run_refreshes_independently(aresponses):
+    """Test a slow refresh does not hold back the due parcels after it."""
+    aresponses.add(MATCH_HOST, "/parcels/1", "GET", delivered_response(1, delay=0.3))
+    aresponses.add(MATCH_HOST, "/parcels/2", "GET", delivered_response(2))
+    aresponses.add(MATCH_HOST, "/parcels/3", "GET", delivered_response(3))
+
+    async with OneTracker(session_object=make_session_object()) as onetracker:
+        scheduler = PollScheduler(onetracker, concurrency=2)
+        for id in (1, 2, 3):
+            scheduler.add(Parcel.from_dict(make_parcel(id=id)), delay=0)
+        ids = [parcel.id async for parcel in scheduler.run()]
+    assert ids == [2, 3, 1]
+    aresponses.assert_all_requests_matched()
+
+@pytest.mark.asyncio
+async def test_run_wakes_up(aresponses):
+    """Test parcels added or removed while waiting are picked up right away."""
+    aresponses.add(MATCH_HOST, "/parcels/2", "GET", delivered_response(2))
+
+    async with OneTracker(session_object=make_session_object()) as onetracker:
+        scheduler = PollScheduler(onetracker)
+        scheduler.add(Parcel.from_dict(make_parcel(id=1)), delay=3600)
+        refreshed = asyncio.Queue()
+
+        async def run():
+            async for parcel in scheduler.run():
+                await refreshed.put(parcel.id)
+
+        task = asyncio.ensure_future(run())
+        await asyncio.sleep(0.05)
+        scheduler.add(Parcel.from_dict(make_parcel(id=2)), delay=0)
+        assert await asyncio.wait_for(refreshed.get(), 5) == 2
+        scheduler.remove(1)
+        await asyncio.wait_for(task, 5)
+    assert len(scheduler) == 0
+    aresponses.assert_all_requests_matched()
+
+def test_invalid_parameters() -> None:
+    """Test invalid parameters are rejected."""
+    with pytest.raises(OneTrackerError):
+        PollScheduler(OneTracker(), concurrency=0)
+    with pytest.raises(OneTrackerError):
+        PollScheduler(OneTracker(), interval=-1)
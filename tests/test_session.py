@@ -0,0 +1,162 @@
+"""Tests for OneTracker-API Session Manager."""
+import asyncio
+import datetime
+import json
+from datetime import timedelta
+
+import pytest
+from aiohttp import ClientSession
+
+from onetracker_api import MemorySessionStore, OneTracker, OneTrackerError, OneTrackerAuthenticationError, SessionManager
+
+from . import load_fixture, make_session_object
+
+MATCH_HOST = "api.onetracker.app"
+
+def add_login(aresponses, token="NewToken", repeat=1):
+    """Answer login requests with a session valid for 30 days."""
+    expiration = (datetime.datetime.now() + timedelta(days=30)).strftime('%Y-%m-%dT%H:%M:%S.%f%z')
+    aresponses.add(
+        MATCH_HOST,
+        "/auth/token",
+        "POST",
+        aresponses.Response(
+            status=200,
+            headers={"Content-Type": "application/json"},
+            text=json.dumps({"message": "ok", "session": {"user_id": 156, "token": token, "expiration": expiration}}),
+        ),
+        repeat=repeat,
+    )
+
+def add_list_parcels(aresponses, token="NewToken", repeat=1):
+    """Answer list parcels requests, rejecting other tokens with 401."""
+    async def response_handler(request):
+        if request.headers.get("x-api-token") != token:
+            return aresponses.Response(
+                status=401,
+                headers={"Content-Type": "application/json"},
+                text=json.dumps({"message": "Invalid API token"}),
+            )
+        return aresponses.Response(
+            status=200,
+            headers={"Content-Type": "application/json"},
+            text=load_fixture("list_parcels.json"),
+        )
+
+    aresponses.add(MATCH_HOST, "/parcels", "GET", response_handler, repeat=repeat)
+
+@pytest.mark.asyncio
+async def test_login_without_session(aresponses):
+    """Test a burst of requests without session only logs in once."""
+    add_login(aresponses)
+    add_list_parcels(aresponses, repeat=5)
+
+    async with ClientSession() as session:
+        onetracker = OneTracker(session=session, coalesce_requests=False, session_manager=SessionManager("email", "password", background=False))
+        responses = await asyncio.gather(*(onetracker.list_parcels() for _ in range(5)))
+        assert all(len(response.parcels) == 1 for response in responses)
+        assert onetracker.session_object.token == "NewToken"
+        aresponses.assert_all_requests_matched()
+
+@pytest.mark.asyncio
+async def test_refresh_before_expiry(aresponses):
+    """Test a session about to expire is refreshed before the request."""
+    add_login(aresponses)
+    add_list_parcels(aresponses)
+
+    async with ClientSession() as session:
+        manager = SessionManager("email", "password", refresh_margin=3600, background=False)
+        onetracker = OneTracker(session=session, session_object=make_session_object("OldToken", timedelta(minutes=30)), session_manager=manager)
+        await onetracker.list_parcels()
+        assert onetracker.session_object.token == "NewToken"
+        aresponses.assert_all_requests_matched()
+
+@pytest.mark.asyncio
+async def test_retry_invalid_token(aresponses):
+    """Test a request rejected with Invalid API token is retried once with a new session."""
+    add_list_parcels(aresponses, repeat=4)
+    add_login(aresponses)
+
+    async with ClientSession() as session:
+        manager = SessionManager("email", "password", background=False)
+        onetracker = OneTracker(session=session, session_object=make_session_object("RevokedToken"), session_manager=manager)
+        assert len((await onetracker.list_parcels()).parcels) == 1
+        assert onetracker.session_object.token == "NewToken"
+
+        onetracker.session_object = make_session_object("RevokedToken")
+        add_login(aresponses)
+        assert [parcel.id async for parcel in onetracker.iter_parcels()] == [174]
+
+@pytest.mark.asyncio
+async def test_retry_invalid_token_once(aresponses):
+    """Test a request rejected again after logging in fails."""
+    add_list_parcels(aresponses, token="OtherToken", repeat=2)
+    add_login(aresponses)
+
+    async with ClientSession() as session:
+        manager = SessionManager("email", "password", background=False)
+        onetracker = OneTracker(session=session, session_object=make_session_object("RevokedToken"), session_manager=manager)
+        with pytest.raises(OneTrackerAuthenticationError):
+            await onetracker.list_parcels()
+        aresponses.assert_all_requests_matched()
+
+@pytest.mark.asyncio
+async def test_background_refresh(aresponses):
+    """Test the background task refreshes the session ahead of expiry."""
+    add_login(aresponses)
+
+    async with ClientSession() as session:
+        manager = SessionManager("email", "password", refresh_margin=3600, retry_interval=0.01)
+        onetracker = OneTracker(session=session, session_object=make_session_object("OldToken", timedelta(seconds=3600.05)), session_manager=manager)
+        manager.start(onetracker)
+        for _ in range(100):
+            if onetracker.session_object.token == "NewToken":
+                break
+            await asyncio.sleep(0.01)
+        assert onetracker.session_object.token == "NewToken"
+        await manager.close()
+        aresponses.assert_all_requests_matched()
+
+@pytest.mark.asyncio
+async def test_background_refresh_survives_store_errors(aresponses, caplog):
+    """Test the background task keeps running, and is restarted if it stopped, when the session store fails."""
+    add_login(aresponses)
+
+    class FailingStore(MemorySessionStore):
+        def __init__(self):
+            super().__init__()
+            self.failures = 2
+
+        def load(self, key):
+            if self.failures:
+                self.failures -= 1
+                raise OSError("disk unavailable")
+            return super().load(key)
+
+    async with ClientSession() as session:
+        manager = SessionManager("email", "password", refresh_margin=3600, retry_interval=0.01, session_store=FailingStore())
+        onetracker = OneTracker(session=session, session_object=make_session_object("OldToken", timedelta(seconds=3600.05)), session_manager=manager)
+        manager.start(onetracker)
+        for _ in range(100):
+            if onetracker.session_object.token == "NewToken":
+                break
+            await asyncio.sleep(0.01)
+        assert onetracker.session_object.token == "NewToken"
+        assert not manager._task.done()
+        assert "disk unavailable" in caplog.text
+
+        # A task that stopped anyway is started again by the next request.
+        await manager.close()
+        manager._task = asyncio.ensure_future(asyncio.sleep(0))
+        await manager._task
+        await manager.ensure_session(onetracker)
+        assert not manager._task.done()
+        await manager.close()
+        aresponses.assert_all_requests_matched()
+
+def test_invalid_parameters() -> None:
+    """Test invalid parameters are rejected."""
+    with pytest.raises(OneTrackerError):
+        SessionManager("email", "password", refresh_margin=-1)
+    with pytest.raises(OneTrackerError):
+        SessionManager("email", "password", retry_interval=0)
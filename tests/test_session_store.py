@@ -0,0 +1,145 @@
+"""Tests for OneTracker-API Session Stores."""
+import asyncio
+import concurrent.futures
+import datetime
+import json
+import os
+import threading
+from datetime import timedelta
+
+import pytest
+from aiohttp import ClientSession
+
+from onetracker_api import FileSessionStore, MemorySessionStore, OneTracker, SessionManager, SessionStore
+
+from . import load_fixture, make_session_object
+
+MATCH_HOST = "api.onetracker.app"
+
+def test_incomplete_store() -> None:
+    """Test stores must implement load and save to be created."""
+    class LoadOnlyStore(SessionStore):
+        def load(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        LoadOnlyStore()
+
+def test_file_store(tmp_path) -> None:
+    """Test saving and loading sessions."""
+    store = FileSessionStore(str(tmp_path / "sessions.json"))
+    assert store.load("email") is None
+    session_object = make_session_object()
+    store.acquire("email")
+    store.save("email", session_object)
+    store.save("other", make_session_object("OtherToken"))
+    store.release("email")
+    assert store.load("email") == session_object
+    assert store.load("other").token == "OtherToken"
+    assert os.stat(store.path).st_mode & 0o777 == 0o600
+    assert FileSessionStore(store.path).load("email") == session_object
+
+def test_file_store_corrupt(tmp_path) -> None:
+    """Test unreadable sessions are ignored."""
+    path = tmp_path / "sessions.json"
+    path.write_text("not json")
+    assert FileSessionStore(str(path)).load("email") is None
+    path.write_text(json.dumps({"email": {"token": "eP0FUZhN76Wu7igUkCPigR2wEMBDtzaW"}}))
+    assert FileSessionStore(str(path)).load("email") is None
+
+@pytest.mark.parametrize("store_factory", [MemorySessionStore, lambda: FileSessionStore("sessions.json")])
+def test_lock(tmp_path, monkeypatch, store_factory) -> None:
+    """Test the login lock is exclusive."""
+    monkeypatch.chdir(tmp_path)
+    store = store_factory()
+    acquired = threading.Event()
+
+    def acquire():
+        store.acquire("email")
+        acquired.set()
+        store.release("email")
+
+    store.acquire("email")
+    thread = threading.Thread(target=acquire)
+    thread.start()
+    assert not acquired.wait(0.05)
+    store.release("email")
+    assert acquired.wait(1)
+    thread.join()
+
+@pytest.mark.asyncio
+async def test_shared_login(aresponses, tmp_path):
+    """Test clients sharing a session store only log in once."""
+    aresponses.add(
+        MATCH_HOST,
+        "/auth/token",
+        "POST",
+        aresponses.Response(
+            status=200,
+            headers={"Content-Type": "application/json"},
+            text=json.dumps({"message": "ok", "session": {"user_id": 156, "token": "NewToken", "expiration": (datetime.datetime.now() + timedelta(days=30)).strftime('%Y-%m-%dT%H:%M:%S.%f%z')}}),
+        ),
+    )
+    aresponses.add(
+        MATCH_HOST,
+        "/parcels",
+        "GET",
+        aresponses.Response(
+            status=200,
+            headers={"Content-Type": "application/json"},
+            text=load_fixture("list_parcels.json"),
+        ),
+        repeat=3,
+    )
+
+    path = str(tmp_path / "sessions.json")
+    async with ClientSession() as session:
+        clients = [
+            OneTracker(session=session, coalesce_requests=False, session_manager=SessionManager("email", "password", background=False, session_store=FileSessionStore(path)))
+            for _ in range(3)
+        ]
+        await asyncio.gather(*(onetracker.list_parcels() for onetracker in clients))
+        assert [onetracker.session_object.token for onetracker in clients] == ["NewToken"] * 3
+        assert FileSessionStore(path).load("email").token == "NewToken"
+        aresponses.assert_all_requests_matched()
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("stores", ["memory", "file", "files"])
+async def test_shared_login_more_clients_than_threads(aresponses, tmp_path, stores):
+    """Test logins waiting for the lock do not tie up every worker thread."""
+    aresponses.add(
+        MATCH_HOST,
+        "/auth/token",
+        "POST",
+        aresponses.Response(
+            status=200,
+            headers={"Content-Type": "application/json"},
+            text=json.dumps({"message": "ok", "session": {"user_id": 156, "token": "NewToken", "expiration": (datetime.datetime.now() + timedelta(days=30)).strftime('%Y-%m-%dT%H:%M:%S.%f%z')}}),
+        ),
+    )
+    aresponses.add(
+        MATCH_HOST,
+        "/parcels",
+        "GET",
+        aresponses.Response(status=200, headers={"Content-Type": "application/json"}, text=load_fixture("list_parcels.json")),
+        repeat=10,
+    )
+
+    path = str(tmp_path / "sessions.json")
+    if stores == "memory":
+        stores = [MemorySessionStore()] * 10
+    elif stores == "file":
+        stores = [FileSessionStore(path)] * 10
+    else:
+        # Stores of the same file share its lock.
+        stores = [FileSessionStore(path) for _ in range(10)]
+    # Fewer worker threads than clients waiting for the login lock.
+    asyncio.get_running_loop().set_default_executor(concurrent.futures.ThreadPoolExecutor(max_workers=2))
+    async with ClientSession() as session:
+        clients = [
+            OneTracker(session=session, coalesce_requests=False, session_manager=SessionManager("email", "password", background=False, session_store=store))
+            for store in stores
+        ]
+        await asyncio.wait_for(asyncio.gather(*(onetracker.list_parcels() for onetracker in clients)), 5)
+        assert [onetracker.session_object.token for onetracker in clients] == ["NewToken"] * 10
+        aresponses.assert_all_requests_matched()
@@ -0,0 +1,88 @@
+"""Tests for OneTracker-API Parcel Store."""
+import json
+
+import pytest
+
+from onetracker_api import ParcelStore, OneTrackerError
+
+from . import load_fixture
+
+def make_parcel(id, time_updated="2018-08-18T20:01:23Z", is_archived=0):
+    """Build a parcel payload from the get_parcel fixture."""
+    parcel = json.loads(load_fixture("get_parcel.json"))["parcel"]
+    parcel.update(id=id, time_updated=time_updated, is_archived=is_archived)
+    return parcel
+
+def test_put_get() -> None:
+    """Test storing and reading parcels."""
+    store = ParcelStore()
+    assert store.get(1) is None
+    assert store.put([make_parcel(1), make_parcel(2)]) == 2
+    assert store.get(1) == make_parcel(1)
+    assert store.get(3) is None
+    store.close()
+
+def test_put_only_writes_changes() -> None:
+    """Test unchanged parcels are not rewritten."""
+    store = ParcelStore()
+    store.put([make_parcel(1), make_parcel(2)])
+    assert store.put([make_parcel(1), make_parcel(2)]) == 0
+    assert store.put([make_parcel(1), make_parcel(2, time_updated="2018-08-19T20:01:23Z")]) == 1
+    assert store.get(2)["time_updated"] == "2018-08-19T20:01:23Z"
+    store.close()
+
+def test_put_adds_tracking_events() -> None:
+    """Test a parcel stored without tracking events is rewritten with them, time_updated unchanged."""
+    store = ParcelStore()
+    listed = make_parcel(1)
+    listed["tracking_events"] = None
+    store.put([listed])
+    assert store.put([make_parcel(1)]) == 1
+    assert store.get(1)["tracking_events"] == make_parcel(1)["tracking_events"]
+    # A listed payload never replaces a full one.
+    assert store.put([listed]) == 0
+    assert store.get(1)["tracking_events"] == make_parcel(1)["tracking_events"]
+    store.close()
+
+def test_list_and_delete() -> None:
+    """Test listing parcels by archived state and deleting them."""
+    store = ParcelStore()
+    store.put([make_parcel(3), make_parcel(1), make_parcel(2, is_archived=1)])
+    assert [parcel["id"] for parcel in store.list()] == [1, 2, 3]
+    assert [parcel["id"] for parcel in store.list(archived=False)] == [1, 3]
+    assert [parcel["id"] for parcel in store.list(archived=True)] == [2]
+    store.delete(1)
+    store.delete(4)
+    assert [parcel["id"] for parcel in store.list()] == [2, 3]
+    store.close()
+
+def test_max_age(monkeypatch) -> None:
+    """Test parcels older than max_age are ignored."""
+    now = [1000.0]
+    monkeypatch.setattr("onetracker_api.store.time.time", lambda: now[0])
+    store = ParcelStore()
+    store.put([make_parcel(1)])
+    now[0] = 1060.0
+    assert store.get(1, max_age=60) is not None
+    now[0] = 1061.0
+    assert store.get(1, max_age=60) is None
+    assert store.get(1) is not None
+    # Refreshing an unchanged parcel makes it fresh again.
+    store.put([make_parcel(1)])
+    assert store.get(1, max_age=60) is not None
+    store.close()
+
+def test_persistence(tmp_path) -> None:
+    """Test parcels survive reopening the database."""
+    path = str(tmp_path / "parcels.sqlite")
+    store = ParcelStore(path)
+    store.put([make_parcel(1)])
+    store.close()
+    store = ParcelStore(path)
+    assert store.get(1) == make_parcel(1)
+    store.close()
+
+def test_invalid_max_age() -> None:
+    """Test invalid parameters are rejected."""
+    with pytest.raises(OneTrackerError):
+        ParcelStore(max_age=-1)
@@ -0,0 +1,50 @@
+"""Tests for OneTracker-API Streaming Parser."""
+import json
+import pytest
+
+from onetracker_api import OneTrackerError
+from onetracker_api.streaming import iter_json_array
+
+from . import load_fixture
+
+async def chunked(body, size):
+    """Stream body in chunks of size bytes."""
+    body = body.encode()
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+async def collect(body, size=1, key="parcels"):
+    members = {}
+    items = [item async for item in iter_json_array(chunked(body, size), key, members)]
+    return items, members
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("size", [1, 7, 4096])
+async def test_iter_json_array(size):
+    """Test items are decoded whatever the chunk boundaries."""
+    payload = json.loads(load_fixture("get_parcel.json"))
+    body = json.dumps({"message": "ok", "parcels": [payload["parcel"]] * 3, "count": 1234567, "archived": False})
+    items, members = await collect(body, size)
+    assert items == [payload["parcel"]] * 3
+    assert members == {"message": "ok", "count": 1234567, "archived": False}
+
+@pytest.mark.asyncio
+async def test_iter_json_array_unicode():
+    """Test multi-byte characters split across chunks."""
+    items, members = await collect('{"parcels": [{"description": "Colis Privé ✓"}], "message": "ok"}', 1)
+    assert items == [{"description": "Colis Privé ✓"}]
+    assert members == {"message": "ok"}
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("body", ['{}', '{"message": "ok", "parcels": []}', ' { "parcels" : null , "message" : "ok" } '])
+async def test_iter_json_array_empty(body):
+    """Test empty, null and missing arrays."""
+    items, _ = await collect(body)
+    assert items == []
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("body", ['not_json', '[]', '{"parcels": [{"id": 1}', '{"parcels": [{"id": 1} {"id": 2}]}', '{"message": "ok"'])
+async def test_iter_json_array_malformed(body):
+    """Test malformed or truncated bodies raise OneTrackerError."""
+    with pytest.raises(OneTrackerError):
+        await collect(body, 3)
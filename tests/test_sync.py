@@ -0,0 +1,171 @@
+"""Tests for OneTracker-API Parcel Sync."""
+import datetime
+import json
+
+import pytest
+from aiohttp import ClientSession
+
+from onetracker_api import OneTracker, OneTrackerError, ParcelSync
+from onetracker_api.models import Parcel, SyncDelta
+
+from . import load_fixture, make_session_object
+
+MATCH_HOST = "api.onetracker.app"
+
+def make_parcel(id, time_updated, events=None):
+    """Build a parcel payload from the get_parcel fixture, with the given tracking event IDs."""
+    parcel = json.loads(load_fixture("get_parcel.json"))["parcel"]
+    event = parcel["tracking_events"][0]
+    parcel.update(id=id, time_updated=time_updated)
+    parcel["tracking_events"] = None if events is None else [dict(event, id=event_id, parcel_id=id) for event_id in events]
+    return parcel
+
+def add_list_parcels(aresponses, *parcels):
+    """Answer the next list parcels request with parcels."""
+    aresponses.add(
+        MATCH_HOST,
+        "/parcels",
+        "GET",
+        aresponses.Response(
+            status=200,
+            headers={"Content-Type": "application/json"},
+            text=json.dumps({"message": "ok", "parcels": list(parcels)}),
+        ),
+    )
+
+def spy_on_listed_decodes(monkeypatch):
+    """Record the ids of the parcels ParcelSync decodes from the listing."""
+    decoded = []
+    from_dict = Parcel.from_dict
+
+    def spy(data):
+        decoded.append(data.get("id"))
+        return from_dict(data)
+
+    monkeypatch.setattr(Parcel, "from_dict", staticmethod(spy))
+    return decoded
+
+@pytest.mark.asyncio
+async def test_sync_listed_events(aresponses, monkeypatch):
+    """Test added, changed and removed parcels and new tracking events are reported."""
+    add_list_parcels(aresponses, make_parcel(174, "2020-05-05T05:47:56Z"), make_parcel(175, "2020-05-05T05:47:56Z", [1]))
+    add_list_parcels(aresponses, make_parcel(175, "2020-05-06T05:47:56Z", [1, 2]), make_parcel(176, "2020-05-04T05:47:56Z"))
+    add_list_parcels(aresponses, make_parcel(175, "2020-05-06T05:47:56Z", [1, 2]), make_parcel(176, "2020-05-04T05:47:56Z"))
+
+    async with ClientSession() as session:
+        onetracker = OneTracker(session=session, session_object=make_session_object())
+        sync = ParcelSync(onetracker, fetch_events=False)
+        decoded = spy_on_listed_decodes(monkeypatch)
+        assert sync.watermark() is None
+
+        delta = await sync.sync()
+        assert isinstance(delta, SyncDelta)
+        assert [parcel.id for parcel in delta.added] == [174, 175]
+        assert delta.changed == [] and delta.removed == []
+        assert {id: [event.id for event in events] for id, events in delta.events.items()} == {175: [1]}
+        assert delta.watermark == datetime.datetime(2020, 5, 5, 5, 47, 56)
+
+        delta = await sync.sync()
+        assert [parcel.id for parcel in delta.added] == [176]
+        assert [parcel.id for parcel in delta.changed] == [175]
+        assert delta.removed == [174]
+        assert {id: [event.id for event in events] for id, events in delta.events.items()} == {175: [2]}
+        assert delta.watermark == sync.watermark() == datetime.datetime(2020, 5, 6, 5, 47, 56)
+
+        delta = await sync.sync()
+        assert delta == SyncDelta(added=[], changed=[], removed=[], events={}, errors={}, watermark=datetime.datetime(2020, 5, 6, 5, 47, 56))
+        # Only updated parcels are decoded.
+        assert decoded == [174, 175, 175, 176]
+        aresponses.assert_all_requests_matched()
+
+@pytest.mark.asyncio
+async def test_sync_fetch_events(aresponses, monkeypatch):
+    """Test tracking events are fetched for updated parcels and failures are retried by the next sync."""
+    decoded = spy_on_listed_decodes(monkeypatch)
+    for _ in range(2):
+        add_list_parcels(aresponses, make_parcel(938, "2020-05-05T05:47:56Z"))
+    aresponses.add(
+        MATCH_HOST,
+        "/parcels/938",
+        "GET",
+        aresponses.Response(
+            status=404,
+            headers={"Content-Type": "application/json"},
+            text=json.dumps({"message": "Parcel not found"}),
+        ),
+    )
+    aresponses.add(
+        MATCH_HOST,
+        "/parcels/938",
+        "GET",
+        aresponses.Response(
+            status=200,
+            headers={"Content-Type": "application/json"},
+            text=load_fixture("get_parcel.json"),
+        ),
+    )
+
+    async with ClientSession() as session:
+        onetracker = OneTracker(session=session, session_object=make_session_object())
+        sync = ParcelSync(onetracker)
+
+        delta = await sync.sync()
+        assert delta.added == []
+        assert isinstance(delta.errors[938], OneTrackerError)
+
+        delta = await sync.sync()
+        assert [parcel.id for parcel in delta.added] == [938]
+        assert [event.id for event in delta.events[938]] == [5699, 5697]
+        assert delta.errors == {}
+        # Listed parcels are replaced by fetched ones, so they are never decoded.
+        assert decoded == []
+        aresponses.assert_all_requests_matched()
+
+@pytest.mark.asyncio
+async def test_sync_per_account(aresponses):
+    """Test each account keeps its own state."""
+    for _ in range(3):
+        add_list_parcels(aresponses, make_parcel(174, "2020-05-05T05:47:56Z"))
+
+    async with ClientSession() as session:
+        onetracker = OneTracker(session=session, session_object=make_session_object(user_id=156))
+        sync = ParcelSync(onetracker, fetch_events=False)
+        assert len((await sync.sync()).added) == 1
+
+        onetracker.session_object = make_session_object(user_id=157)
+        assert len((await sync.sync()).added) == 1
+        assert sync.watermark(156) == sync.watermark(157)
+
+        sync.reset(156)
+        assert sync.watermark(156) is None
+        onetracker.session_object = make_session_object(user_id=156)
+        assert len((await sync.sync()).added) == 1
+        aresponses.assert_all_requests_matched()
+
+@pytest.mark.asyncio
+async def test_sync_failed_list_keeps_state(aresponses):
+    """Test a failed listing leaves the state untouched."""
+    add_list_parcels(aresponses, make_parcel(174, "2020-05-05T05:47:56Z"))
+    aresponses.add(
+        MATCH_HOST,
+        "/parcels",
+        "GET",
+        aresponses.Response(
+            status=200,
+            headers={"Content-Type": "application/json"},
+            text=json.dumps({"message": "Parcel list unavailable"}),
+        ),
+    )
+
+    async with ClientSession() as session:
+        onetracker = OneTracker(session=session, session_object=make_session_object())
+        sync = ParcelSync(onetracker, fetch_events=False)
+        await sync.sync()
+        with pytest.raises(OneTrackerError, match="Parcel list unavailable"):
+            await sync.sync()
+        assert sync.watermark() == datetime.datetime(2020, 5, 5, 5, 47, 56)
+
+def test_invalid_concurrency() -> None:
+    """Test invalid parameters are rejected."""
+    with pytest.raises(OneTrackerError):
+        ParcelSync(OneTracker(), concurrency=0)